@@ -0,0 +1,363 @@
+"""
+Бенчмарк CRUD-операций ядра на сгенерированных таблицах разного размера.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.crud run --sizes 1000,10000,100000 --output a.json
+    python -m benchmarks.crud compare a.json b.json
+
+Каждый размер замеряется в отдельном процессе во временном каталоге,
+поэтому пиковый RSS относится к одному размеру, а данные репозитория не
+затрагиваются. Результат — JSON, который можно сравнить между коммитами.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_SCHEMA = "name:str,age:int,active:bool"
+DEFAULT_OPS = 200
+DEFAULT_IO_REPEAT = 3
+# Записей в одной операции insert_many.
+DEFAULT_BATCH = 1_000
+TABLE_NAME = "bench"
+# Замедление операции в compare, начиная с которого она помечается.
+REGRESSION_THRESHOLD = 1.25
+
+
+def _random_value(rng: random.Random, column_type: str):
+    if column_type == "int":
+        return rng.randrange(1_000_000)
+    if column_type == "bool":
+        return rng.random() < 0.5
+    return "".join(rng.choices(string.ascii_lowercase, k=12))
+
+
+def _generate_rows(size: int, schema: list[tuple[str, str]], seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {"ID": row_id, **{name: _random_value(rng, kind) for name, kind in schema}}
+        for row_id in range(1, size + 1)
+    ]
+
+
+def _summary(latencies: list[float]) -> dict:
+    """ops/sec и перцентили по списку задержек в секундах."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    def percentile(share: float) -> float:
+        index = min(len(ordered) - 1, math.ceil(share * len(ordered)) - 1)
+        return round(ordered[max(index, 0)] * 1000, 4)
+
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": round(len(ordered) / total, 1) if total else None,
+        "mean_ms": round(total * 1000 / len(ordered), 4),
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def _measure(operation, arguments: list) -> dict:
+    """Вызывает operation для каждого набора аргументов и замеряет каждый вызов."""
+    latencies = []
+    for args in arguments:
+        start = time.perf_counter()
+        operation(*args)
+        latencies.append(time.perf_counter() - start)
+    return _summary(latencies)
+
+
+def _peak_rss_bytes() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_size(size: int, options: dict) -> dict:
+    """Замеряет все операции для одного размера таблицы (в дочернем процессе)."""
+    with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as workdir:
+        os.chdir(workdir)
+        try:
+            return _measure_table(size, options)
+        finally:
+            os.chdir(os.path.dirname(workdir))
+
+
+def _measure_table(size: int, options: dict) -> dict:
+    # Пакет импортируется после смены каталога: DATA_PATH относительный.
+    from src.constants import META_FILE, TABLE_SEQUENCE_KEY
+    from src.primitive_db import core, metrics
+    from src.primitive_db.buffer_pool import put_table
+    from src.primitive_db.scan import set_scan_threshold, set_scan_workers
+    from src.primitive_db.storage import (
+        segment_files,
+        set_fsync,
+        set_storage_engine,
+        table_files,
+    )
+    from src.primitive_db.utils import load_table_data, save_metadata, save_table_data
+
+    metrics.set_enabled(False)
+    set_fsync(options["fsync"])
+    set_storage_engine(options["storage"])
+    if options["scan_workers"] is not None:
+        set_scan_workers(options["scan_workers"])
+    if options["scan_threshold"] is not None:
+        set_scan_threshold(options["scan_threshold"])
+
+    schema = [tuple(column.split(":")) for column in options["schema"]]
+    rng = random.Random(options["seed"])
+    ops = options["ops"]
+
+    metadata = core.create_table({}, TABLE_NAME, options["schema"])
+    metadata[TABLE_NAME][TABLE_SEQUENCE_KEY] = size + 1
+    save_metadata(META_FILE, metadata)
+
+    start = time.perf_counter()
+    rows = _generate_rows(size, schema, options["seed"])
+    generate_seconds = time.perf_counter() - start
+    put_table(TABLE_NAME, rows)
+
+    first_column, first_type = schema[0]
+    results: dict[str, dict] = {}
+
+    def fresh_select(where) -> None:
+        # Кэш select сбрасывается: замеряется поиск, а не попадание в кэш.
+        core.clear_cache()
+        core.select(TABLE_NAME, where)
+
+    def random_ids() -> list[list]:
+        return [[{"ID": rng.randint(1, size)}] for _ in range(ops)]
+
+    results["insert"] = _measure(
+        lambda values: core.insert(metadata, TABLE_NAME, values, rows, []),
+        [[[_random_value(rng, kind) for _, kind in schema]] for _ in range(ops)],
+    )
+    batch = options["batch"]
+    results["insert_many"] = _measure(
+        lambda values: core.insert_many(metadata, TABLE_NAME, values, rows, []),
+        [
+            [[[_random_value(rng, kind) for _, kind in schema] for _ in range(batch)]]
+            for _ in range(max(1, ops // 10))
+        ],
+    )
+    results["select_pk"] = _measure(fresh_select, random_ids())
+    results["select_scan"] = _measure(
+        fresh_select,
+        [[{first_column: _random_value(rng, first_type)}] for _ in range(ops)],
+    )
+    results["update_pk"] = _measure(
+        lambda where: core.update(
+            metadata,
+            TABLE_NAME,
+            rows,
+            {first_column: _random_value(rng, first_type)},
+            where,
+            [],
+        ),
+        random_ids(),
+    )
+
+    def delete_pk(where) -> None:
+        nonlocal rows
+        rows, _ = core.delete(TABLE_NAME, rows, where, [])
+        put_table(TABLE_NAME, rows)
+
+    results["delete_pk"] = _measure(delete_pk, random_ids())
+
+    repeat = [[]] * options["io_repeat"]
+    results["save_table_data"] = _measure(
+        lambda: save_table_data(TABLE_NAME, rows),
+        repeat,
+    )
+    results["load_table_data"] = _measure(
+        lambda: len(load_table_data(TABLE_NAME)),
+        repeat,
+    )
+
+    paths = table_files(TABLE_NAME) + segment_files(TABLE_NAME)
+    paths = [path for path in paths if os.path.exists(path)]
+    file_size = sum(map(os.path.getsize, paths))
+    return {
+        "rows": size,
+        "generate_s": round(generate_seconds, 3),
+        "file_bytes": file_size,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "operations": results,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _exponents(runs: list[dict]) -> dict[str, float]:
+    """
+    Оценивает степень роста задержки от размера таблицы.
+
+    Для каждой операции берётся наклон log(mean) от log(rows) между
+    крайними размерами: около 0 — O(1), около 1 — O(N), около 2 — O(N²).
+    """
+    if len(runs) < 2:
+        return {}
+    first, last = runs[0], runs[-1]
+    scale = math.log(last["rows"] / first["rows"])
+    exponents = {}
+    for name, stats in last["operations"].items():
+        before = first["operations"][name]["mean_ms"]
+        if before and stats["mean_ms"]:
+            exponents[name] = round(math.log(stats["mean_ms"] / before) / scale, 2)
+    return exponents
+
+
+def run(args: argparse.Namespace) -> dict:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    options = {
+        "schema": args.schema.split(","),
+        "ops": args.ops,
+        "io_repeat": args.io_repeat,
+        "batch": args.batch,
+        "seed": args.seed,
+        "storage": args.storage,
+        "fsync": args.fsync,
+        "scan_workers": args.scan_workers,
+        "scan_threshold": args.scan_threshold,
+    }
+    runs = []
+    for size in sizes:
+        # Свежий процесс на размер: пиковый RSS и кэши не переходят дальше.
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(_run_size, size, options).result()
+        runs.append(result)
+        _print_run(result)
+    report = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "runs": runs,
+        "exponents": _exponents(runs),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+def _print_run(result: dict) -> None:
+    print(
+        f"rows={result['rows']} file={result['file_bytes']} B "
+        f"peak_rss={result['peak_rss_bytes'] // 1024} KiB",
+        file=sys.stderr,
+    )
+    for name, stats in result["operations"].items():
+        print(
+            f"  {name:<16} {stats['ops_per_sec'] or 0:>12.1f} op/s "
+            f"p50 {stats['p50_ms']:>10.4f} ms  p99 {stats['p99_ms']:>10.4f} ms",
+            file=sys.stderr,
+        )
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Сравнивает два отчёта; код возврата 1, если есть замедление."""
+    with open(args.before, encoding="utf-8") as file:
+        before = {run["rows"]: run for run in json.load(file)["runs"]}
+    with open(args.after, encoding="utf-8") as file:
+        after = {run["rows"]: run for run in json.load(file)["runs"]}
+
+    regressions = 0
+    for rows in sorted(before.keys() & after.keys()):
+        print(f"rows={rows}")
+        for name, stats in after[rows]["operations"].items():
+            old = before[rows]["operations"].get(name)
+            if not old or not old["mean_ms"]:
+                continue
+            ratio = stats["mean_ms"] / old["mean_ms"]
+            slower = ratio >= args.threshold
+            regressions += slower
+            mark = "  <-- медленнее" if slower else ""
+            print(
+                f"  {name:<16} {old['mean_ms']:>10.4f} -> "
+                f"{stats['mean_ms']:>10.4f} ms  x{ratio:.2f}{mark}"
+            )
+    return 1 if regressions else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.crud")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="замерить операции")
+    run_parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="размеры таблиц через запятую (например, 1000,10000,1000000)",
+    )
+    run_parser.add_argument(
+        "--schema",
+        default=DEFAULT_SCHEMA,
+        help="столбцы без ID: имя:тип через запятую",
+    )
+    run_parser.add_argument("--ops", type=int, default=DEFAULT_OPS)
+    run_parser.add_argument("--io-repeat", type=int, default=DEFAULT_IO_REPEAT)
+    run_parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--storage", default=None, help="json, log, binary или segments"
+    )
+    run_parser.add_argument("--fsync", action="store_true")
+    run_parser.add_argument(
+        "--scan-workers",
+        type=int,
+        help="процессов параллельного просмотра (0 — без пула)",
+    )
+    run_parser.add_argument(
+        "--scan-threshold",
+        type=int,
+        help="число записей, с которого просмотр идёт в пуле",
+    )
+    run_parser.add_argument("--output", help="файл для JSON-отчёта")
+
+    compare_parser = commands.add_parser("compare", help="сравнить два отчёта")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=REGRESSION_THRESHOLD
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return compare(args)
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
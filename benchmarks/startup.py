@@ -0,0 +1,108 @@
+"""
+Проверка времени запуска CLI: бюджет импорта и отсутствие побочных эффектов.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.startup --budget-ms 60
+
+Импорт src.primitive_db.main замеряется через python -X importtime в
+отдельных процессах во временном каталоге. Код возврата 1, если медиана
+превышает бюджет, импортируется модуль, который должен загружаться
+лениво, или после импорта в каталоге появились файлы. В проекте нет
+набора тестов, поэтому проверку запускает make check вместе с Ruff.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN_MODULE = "src.primitive_db.main"
+DEFAULT_RUNS = 7
+DEFAULT_BUDGET_MS = 60.0
+# Модули, которые обычный запуск CLI не должен импортировать.
+LAZY_MODULES = (
+    "prettytable",
+    "prompt",
+    "asyncio",
+    "concurrent.futures",
+    "multiprocessing",
+)
+
+
+def _import_times(root: str, workdir: str) -> dict[str, int]:
+    """Совокупное время импорта каждого модуля (мкс) в свежем процессе."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MAIN_MODULE}"],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": root},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def _command_seconds(root: str, workdir: str) -> float:
+    """Время выполнения команды help целиком (запуск интерпретатора включён)."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", MAIN_MODULE, "-c", "help"],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": root},
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="primitive_db_startup_") as workdir:
+        runs = [_import_times(root, workdir) for _ in range(args.runs)]
+        leftovers = sorted(os.listdir(workdir))
+        command = statistics.median(
+            _command_seconds(root, workdir) for _ in range(args.runs)
+        )
+
+    import_ms = statistics.median(times[MAIN_MODULE] for times in runs) / 1000
+    print(f"import {MAIN_MODULE}: {import_ms:.1f} ms (бюджет {args.budget_ms} ms)")
+    print(f"python -m {MAIN_MODULE} -c help: {command * 1000:.1f} ms")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in slowest[1:11]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f} ms")
+
+    if import_ms > args.budget_ms:
+        failures.append(f"импорт дольше бюджета: {import_ms:.1f} ms")
+    eager = sorted(
+        name
+        for name in runs[-1]
+        if any(name == lazy or name.startswith(f"{lazy}.") for lazy in LAZY_MODULES)
+    )
+    if eager:
+        failures.append("импортированы при запуске: " + ", ".join(eager))
+    if leftovers:
+        failures.append("импорт создал файлы: " + ", ".join(leftovers))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,10 +25,33 @@ COMMANDS = {
     "drop_table <имя>": "удалить таблицу",
     "insert into <имя> values (...)": "добавить запись",
     "select from <имя>": "вывести все записи",
-    "select from <имя> where поле = значение": "вывести записи по условию",
+    "select from <имя> where <условие>": (
+        "вывести записи по условию (=, !=, <, <=, >, >=, in, between, "
+        "and, or, not)"
+    ),
+    "select ... limit N [offset M]": "вывести не более N записей, пропустив M",
+    "select count(*), sum|min|max|avg(столбец) from <имя> [where ...] "
+    "[group by столбец, ...]": "посчитать агрегаты (по группам)",
     "update <имя> set поле = значение where ...": "обновить записи по условию",
     "delete from <имя> where поле = значение": "удалить записи по условию",
     "info <имя>": "показать схему и количество записей",
+    "create_index <имя> <столбец> [hash|sorted]": "построить индекс по столбцу",
+    "drop_index <имя> <столбец>": "удалить индекс",
+    "compact <имя>": "сжать журнал таблицы в JSON-снимок",
+    "convert <имя> <json|binary|segments>": "переписать файл таблицы в другом формате",
+    "import <имя> <файл.csv|файл.jsonl>": "загрузить записи из файла",
+    "export <имя> <файл.csv|файл.jsonl>": "выгрузить записи в файл",
+    "cache_stats": "показать статистику кэша select",
+    "explain select from <имя> [where ...]": "показать план выполнения select",
+    "prepare <название> as <команда с ?>": (
+        "подготовить insert/select/update/delete с параметрами ?"
+    ),
+    "execute <название> (значение, ...)": "выполнить подготовленную команду",
+    "profile <команда>": "выполнить команду и показать время по фазам",
+    "metrics [reset|on|off|<файл.json>]": "показать метрики в JSON и управлять ими",
+    "begin": "начать транзакцию",
+    "commit": "зафиксировать транзакцию",
+    "rollback": "отменить транзакцию",
     "help": "показать эту справку",
     "exit": "выйти из программы",
 }
@@ -56,6 +79,9 @@ MSG_TABLE_DROPPED = 'Таблица "{name}" успешно удалена.'
 MSG_RECORD_INSERTED = (
     'Запись с {id_name}={record_id} успешно добавлена в таблицу "{table}".'
 )
+MSG_RECORDS_INSERTED = (
+    'В таблицу "{table}" добавлено записей: {count} ({id_name}={first}..{last}).'
+)
 MSG_RECORD_UPDATED = (
     'Запись с {id_name}={record_id} в таблице "{table}" успешно обновлена.'
 )
@@ -77,6 +103,8 @@ MSG_VALUES_MISMATCH = (
 )
 MSG_TABLES_PREFIX = "- {name}"
 TABLE_INFO_KEY = "table_info"
+TABLE_INDEXES_KEY = "indexes"
+TABLE_SEQUENCE_KEY = "next_id"
 
 # Подсказки ввода и оформления
 PROMPT_CONFIRM_DROP = "удаление таблицы"
@@ -88,12 +116,19 @@ MSG_WELCOME = "БД запущена. Список доступных коман
 MSG_DB_ERROR = "Ошибка: Таблица или столбец {error} не найден."
 MSG_UNEXPECTED_ERROR = "Произошла непредвиденная ошибка: {error}"
 MSG_ACTION_CANCELLED = "Действие '{action}' отменено пользователем."
-MSG_FUNCTION_TIME = "Функция {func_name} выполнилась за {elapsed:.3f} секунд."
 MSG_PARSE_ERROR = "Не удалось разобрать команду ({error})."
 MSG_PARSE_HINT = "Проверьте синтаксис и кавычки."
 
 # Файлы таблиц и ошибки ввода/вывода
 TABLE_FILE_TEMPLATE = "{table}.json"
+TABLE_LOG_TEMPLATE = "{table}.log"
+TABLE_BINARY_TEMPLATE = "{table}.bin"
+TABLE_MANIFEST_TEMPLATE = "{table}.manifest.json"
+# Сегмент хранит записи с ID из одного диапазона; version — номер записи
+# манифеста, при которой сегмент переписан.
+TABLE_SEGMENT_TEMPLATE = "{table}.seg{segment}.{version}.json"
+INDEX_FILE_TEMPLATE = "{table}.{column}.idx.json"
+PK_FILE_TEMPLATE = "{table}.pk.json"
 MSG_META_SAVE_ERROR = "Ошибка сохранения метаданных в {filepath}: {error}"
 MSG_TABLE_SAVE_ERROR = (
     "Ошибка сохранения данных таблицы в {table_file}: {error}"
@@ -101,3 +136,228 @@ MSG_TABLE_SAVE_ERROR = (
 MSG_TABLE_DELETE_ERROR = (
     "Ошибка удаления файла таблицы {table_file}: {error}"
 )
+
+# Движки хранения
+STORAGE_JSON = "json"
+STORAGE_LOG = "log"
+STORAGE_BINARY = "binary"
+STORAGE_SEGMENTS = "segments"
+DEFAULT_STORAGE_ENGINE = STORAGE_SEGMENTS
+STORAGE_ENGINE_ENV = "PRIMITIVE_DB_STORAGE"
+# Журнал сжимается в снимок, когда становится больше снимка (но не раньше порога)
+LOG_COMPACT_MIN_BYTES = 64 * 1024
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+MSG_UNKNOWN_STORAGE = (
+    'Неизвестный движок хранения "{name}". Доступные: {available}.'
+)
+# Записей в сегменте: сегмент k хранит ID от k * N + 1 до (k + 1) * N.
+SEGMENT_ROWS = 10_000
+SEGMENT_ROWS_ENV = "PRIMITIVE_DB_SEGMENT_ROWS"
+MSG_TABLE_COMPACTED = 'Журнал таблицы "{name}" сжат в снимок.'
+MSG_TABLE_CONVERTED = 'Таблица "{name}" сохранена в формате {storage}.'
+
+# Двоичный формат таблиц
+BINARY_MAGIC = b"PDBT"
+BINARY_VERSION = 1
+MSG_BAD_BINARY = "Файл {path} не является двоичной таблицей версии {version}."
+
+# Индексы
+INDEX_HASH = "hash"
+INDEX_SORTED = "sorted"
+INDEX_KINDS = {INDEX_HASH, INDEX_SORTED}
+MSG_INDEX_CREATED = (
+    'Индекс {kind} по столбцу "{column}" таблицы "{name}" построен.'
+)
+MSG_INDEX_DROPPED = 'Индекс по столбцу "{column}" таблицы "{name}" удалён.'
+MSG_INDEX_EXISTS = 'Ошибка: Индекс по столбцу "{column}" уже существует.'
+MSG_INDEX_NOT_EXISTS = 'Ошибка: Индекса по столбцу "{column}" не существует.'
+MSG_INDEX_SAVE_ERROR = "Ошибка сохранения индекса {index_file}: {error}"
+
+# Кэш результатов select
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Потоковый select кэширует только результаты не длиннее этого.
+SELECT_CACHE_MAX_ROWS = 10_000
+MSG_CACHE_STATS = (
+    "Кэш select: записей {entries}/{max_entries}, "
+    "объём ~{bytes}/{max_bytes} байт\n"
+    "Попаданий: {hits}, промахов: {misses}, "
+    "вытеснено: {evictions}, сброшено изменениями: {invalidations}"
+)
+
+# Агрегаты select
+AGGREGATE_FUNCTIONS = ("count", "sum", "min", "max", "avg")
+# Функции, применимые только к числовым столбцам.
+AGGREGATE_NUMERIC = ("sum", "avg")
+AGGREGATE_ALL = "*"
+MSG_AGGREGATE_TYPE = (
+    'Ошибка: {function}() применима только к столбцам int, а "{column}" '
+    "имеет тип {column_type}."
+)
+MSG_AGGREGATE_NOT_GROUPED = (
+    'Ошибка: столбец "{column}" в списке select должен быть указан в group by.'
+)
+MSG_AGGREGATE_DUPLICATE = 'Ошибка: элемент "{label}" указан в списке select дважды.'
+
+# Подготовленные команды и кэш разобранных команд
+STATEMENT_PARAMETER = "?"
+# Команд insert/select/update/delete, разбор которых хранится в LRU-кэше.
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_SIZE_ENV = "PRIMITIVE_DB_PLAN_CACHE_SIZE"
+MSG_STATEMENT_PREPARED = 'Команда "{name}" подготовлена, параметров: {count}.'
+MSG_STATEMENT_NOT_FOUND = 'Ошибка: подготовленной команды "{name}" нет.'
+MSG_STATEMENT_KIND = (
+    "Некорректное значение: <{command}>. Подготовить можно insert, select, "
+    "update и delete."
+)
+MSG_PARAMETERS_MISMATCH = (
+    "Ошибка: команда ожидает параметров: {expected}, передано: {count}."
+)
+
+# Метрики и профилирование команд
+METRICS_ENV = "PRIMITIVE_DB_METRICS"
+PHASES = ("tokenize", "parse", "load", "filter", "convert", "render", "save")
+# Верхние границы корзин гистограммы задержек, мс.
+METRICS_BUCKETS_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000,
+)
+PLAN_ALL = "all"
+PLAN_PK = "pk"
+PLAN_INDEX = "index"
+PLAN_COLUMNAR = "columnar"
+PLAN_SCAN = "scan"
+PLAN_PARALLEL = "parallel"
+PLAN_SEGMENTS = "segments"
+PLAN_DESCRIPTIONS = {
+    PLAN_ALL: "все записи без фильтра",
+    PLAN_PK: "поиск по первичному ключу",
+    PLAN_INDEX: "поиск по индексам",
+    PLAN_COLUMNAR: "фильтр по колонкам",
+    PLAN_SCAN: "полный просмотр с проверкой условия",
+    PLAN_PARALLEL: "параллельный просмотр частями в пуле процессов",
+    PLAN_SEGMENTS: "просмотр сегментов из диапазона ID",
+}
+MSG_PROFILE_HEADER = "Профиль {command}: {total:.3f} мс"
+MSG_PROFILE_PHASE = "  {phase:<10} {elapsed:9.3f} мс"
+MSG_PROFILE_COUNTER = "  {name}: {value}"
+MSG_EXPLAIN_TABLE = 'Таблица "{name}", записей: {count}'
+MSG_EXPLAIN_ACCESS = "Доступ: {description}"
+MSG_EXPLAIN_INDEXES = "Индексы: {columns}"
+MSG_EXPLAIN_CANDIDATES = "Кандидатов для проверки: {count}"
+MSG_EXPLAIN_CACHED = "Результат уже есть в кэше select."
+MSG_METRICS_ON = "Сбор метрик включён."
+MSG_METRICS_OFF = "Сбор метрик выключен."
+MSG_METRICS_RESET = "Метрики сброшены."
+MSG_METRICS_SAVED = "Метрики записаны в {path}."
+
+# Журнал упреждающей записи (WAL) и атомарная запись файлов
+WAL_FILE_TEMPLATE = "wal.{pid}.jsonl"
+TEMP_FILE_SUFFIX = ".tmp"
+FSYNC_ENV = "PRIMITIVE_DB_FSYNC"
+MSG_WAL_RECOVERED = "Восстановлено незавершённых сбросов из журнала: {count}."
+
+# Блокировки между процессами
+TABLE_LOCK_TEMPLATE = "{table}.lock"
+META_LOCK_FILENAME = ".meta.lock"
+LOCK_TIMEOUT = 10.0
+LOCK_RETRY_INITIAL = 0.005
+LOCK_RETRY_MAX = 0.2
+# Процесс, ждущий блокировку, держит разделяемую блокировку файла
+# <блокировка>.wait. Владелец, удерживающий блокировки записи между
+# командами дольше LOCK_HOLD_MAX (с), при ожидающих сбрасывает изменения
+# и отдаёт блокировки, даже если интервал сброса не истёк (пакетный
+# режим). Внутри транзакции не действует.
+LOCK_WAIT_SUFFIX = ".wait"
+LOCK_HOLD_MAX = 0.05
+SNAPSHOT_READ_RETRIES = 5
+MSG_LOCK_TIMEOUT = "Ошибка: не удалось получить блокировку {path}: ресурс занят."
+
+# Транзакции
+MSG_TRANSACTION_STARTED = "Транзакция начата."
+MSG_TRANSACTION_COMMITTED = "Транзакция зафиксирована."
+MSG_TRANSACTION_ROLLED_BACK = "Транзакция отменена."
+MSG_TRANSACTION_ACTIVE = "Ошибка: транзакция уже начата."
+MSG_NO_TRANSACTION = "Ошибка: нет активной транзакции."
+MSG_NOT_IN_TRANSACTION = 'Ошибка: команда "{command}" недоступна внутри транзакции.'
+MSG_TRANSACTION_ABORTED = "Незавершённая транзакция отменена."
+
+# Параллельный просмотр: таблица делится на части по числу процессов
+SCAN_WORKERS_ENV = "PRIMITIVE_DB_SCAN_WORKERS"
+# Таблицы меньше порога просматриваются в одном процессе. Замер: обращение
+# к уже запущенному пулу стоит около 1 мс плюс передача позиций, а полный
+# просмотр — около 0,2 мкс на запись, поэтому два процесса выигрывают
+# примерно с 20 000 записей; порог взят с запасом.
+PARALLEL_SCAN_MIN_ROWS = 50_000
+PARALLEL_SCAN_MIN_ROWS_ENV = "PRIMITIVE_DB_SCAN_MIN_ROWS"
+
+# Буферный пул таблиц
+COLUMNAR_ENV = "PRIMITIVE_DB_COLUMNAR"
+# Интервал сброса изменений на диск в секундах; 0 — после каждой команды.
+DEFAULT_FLUSH_INTERVAL = 0.0
+FLUSH_INTERVAL_ENV = "PRIMITIVE_DB_FLUSH_INTERVAL"
+
+# Импорт и экспорт
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+TRANSFER_EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".jsonl": FORMAT_JSONL,
+    ".ndjson": FORMAT_JSONL,
+}
+IMPORT_BATCH_SIZE = 10_000
+MSG_BAD_FORMAT = (
+    "Некорректное значение: {path}. Поддерживаются файлы .csv и .jsonl."
+)
+MSG_IMPORT_MISSING_COLUMNS = (
+    "Ошибка: в файле {path} нет столбцов: {columns}."
+)
+MSG_FILE_NOT_FOUND = "Ошибка: файл {path} не найден."
+MSG_IMPORT_NOT_OBJECT = "запись должна быть JSON-объектом"
+MSG_IMPORT_ROW_ERROR = "Ошибка в строке {line} файла {path}: {error}"
+MSG_IMPORTED = 'В таблицу "{table}" загружено записей: {count}.'
+MSG_EXPORTED = 'Из таблицы "{table}" выгружено записей: {count} в {path}.'
+
+# Вывод select
+FORMAT_TABLE = "table"
+FORMAT_TSV = "tsv"
+OUTPUT_FORMATS = (FORMAT_TABLE, FORMAT_TSV, FORMAT_JSONL)
+DEFAULT_PAGE_SIZE = 50
+PROMPT_NEXT_PAGE = "Enter — следующая страница, q — прервать вывод: "
+PAGER_STOP_ANSWERS = {"q", "quit"}
+
+# Сервер и клиент
+SERVER_MODE = "serve"
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 7432
+SERVER_LINE_LIMIT = 16 * 1024 * 1024
+CLIENT_POOL_SIZE = 4
+# Транзакция соединения, не присылающего команд дольше таймаута, отменяется.
+TRANSACTION_IDLE_TIMEOUT = 30.0
+TRANSACTION_IDLE_TIMEOUT_ENV = "PRIMITIVE_DB_TRANSACTION_TIMEOUT"
+MSG_SERVER_LISTENING = "Сервер принимает команды на {address}."
+MSG_SERVER_STOPPED = "Сервер остановлен."
+MSG_SERVER_BAD_REQUEST = (
+    'Некорректный запрос: ожидается JSON-объект с полем "command".'
+)
+MSG_CONNECTION_CLOSED = "Сервер закрыл соединение."
+MSG_TRANSACTION_IDLE = (
+    "Транзакция отменена: нет команд дольше {seconds:g} с. Соединение закрыто."
+)
+
+# Пакетный режим
+SCRIPT_COMMENT_PREFIX = "#"
+CLI_DESCRIPTION = "Простая база данных."
+CLI_HELP_SCRIPT = "выполнить команды из файла"
+CLI_HELP_COMMAND = "выполнить одну команду"
+CLI_HELP_YES = "автоматически подтверждать опасные действия"
+CLI_HELP_STORAGE = "движок хранения таблиц"
+CLI_HELP_COLUMNAR = "держать таблицы в памяти в колоночном виде"
+CLI_HELP_SCAN_WORKERS = "процессов для полного просмотра больших таблиц (0 — без пула)"
+CLI_HELP_FORMAT = "формат вывода select"
+CLI_HELP_MODE = "serve — запустить сервер вместо интерактивного режима"
+CLI_HELP_SOCKET = "Unix-сокет сервера"
+CLI_HELP_HOST = "адрес TCP-сервера"
+CLI_HELP_PORT = "порт TCP-сервера"
+CLI_HELP_PAGE_SIZE = "записей на странице табличного вывода"
@@ -1,17 +1,14 @@
-import time
 from functools import wraps
 from json import JSONDecodeError
 
-import prompt
-
 from .constants import (
     CONFIRM_YES,
     MSG_ACTION_CANCELLED,
     MSG_DB_ERROR,
-    MSG_FUNCTION_TIME,
     MSG_UNEXPECTED_ERROR,
     PROMPT_CONFIRM_TEMPLATE,
 )
+from .primitive_db import metrics
 
 
 def handle_db_errors(missing_default=None):
@@ -41,15 +38,31 @@ def handle_db_errors(missing_default=None):
     return decorator
 
 
+# None — спрашивать пользователя, True/False — готовый ответ без вопроса.
+_auto_confirm: bool | None = None
+
+
+def set_auto_confirm(answer: bool | None) -> None:
+    """Задаёт ответ на запросы подтверждения для неинтерактивного режима."""
+    global _auto_confirm
+    _auto_confirm = answer
+
+
 def confirm_action(action_name: str):
     """Запрашивает подтверждение перед выполнением опасного действия."""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            confirmation = prompt.string(
-                PROMPT_CONFIRM_TEMPLATE.format(action=action_name)
-            )
-            if confirmation.lower() not in CONFIRM_YES:
+            if _auto_confirm is None:
+                import prompt
+
+                confirmation = prompt.string(
+                    PROMPT_CONFIRM_TEMPLATE.format(action=action_name)
+                )
+                confirmed = confirmation.lower() in CONFIRM_YES
+            else:
+                confirmed = _auto_confirm
+            if not confirmed:
                 print(MSG_ACTION_CANCELLED.format(action=action_name))
                 return None
             return func(*args, **kwargs)
@@ -60,19 +73,15 @@ def confirm_action(action_name: str):
 
 
 def log_time(func):
-    """Логирует время выполнения обёрнутой функции."""
+    """
+    Замеряет вызов как команду в реестре метрик (см. primitive_db.metrics).
+
+    Ничего не печатает: время по фазам показывают команды profile и
+    metrics. Внутри уже открытой команды обёртка не создаёт новой.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.monotonic()
-        result = func(*args, **kwargs)
-        end_time = time.monotonic()
-        elapsed_time = end_time - start_time
-        print(
-            MSG_FUNCTION_TIME.format(
-                func_name=func.__name__,
-                elapsed=elapsed_time,
-            )
-        )
-        return result
+        with metrics.command(func.__name__):
+            return func(*args, **kwargs)
 
     return wrapper
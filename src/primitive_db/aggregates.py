@@ -0,0 +1,241 @@
+from itertools import groupby
+from typing import Iterable, NamedTuple
+
+from ..constants import (
+    AGGREGATE_ALL,
+    AGGREGATE_FUNCTIONS,
+    AGGREGATE_NUMERIC,
+    INDEX_SORTED,
+    MSG_AGGREGATE_DUPLICATE,
+    MSG_AGGREGATE_NOT_GROUPED,
+    MSG_AGGREGATE_TYPE,
+    MSG_INVALID_VALUE,
+    MSG_UNKNOWN_COLUMN,
+    TYPE_INT,
+)
+from .buffer_pool import get_table
+from .columnar import ColumnarTable
+from .core import Schema, iter_matches
+from .errors import ColumnNotFoundError, QueryError
+from .indexes import get_index
+from .metrics import count as count_metric
+from .metrics import phase
+from .predicates import as_condition
+
+
+class Aggregate(NamedTuple):
+    """
+    Элемент списка select в агрегатном запросе.
+
+    function(column), где column None означает count(*); function None —
+    столбец группировки, который выводится как есть.
+    """
+
+    function: str | None
+    column: str | None
+
+    @property
+    def label(self) -> str:
+        if self.function is None:
+            return self.column
+        return f"{self.function}({self.column or AGGREGATE_ALL})"
+
+
+def check_aggregates(
+    schema: Schema,
+    items: list[Aggregate],
+    group_by: list[str],
+) -> None:
+    """
+    Проверяет столбцы, типы аргументов и группировку.
+
+    Подписи элементов становятся именами столбцов результата, поэтому
+    повторяться не могут.
+    """
+    if not items:
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
+    labels = [item.label for item in items]
+    for position, label in enumerate(labels):
+        if label in labels[:position]:
+            raise QueryError(MSG_AGGREGATE_DUPLICATE.format(label=label))
+    for column in group_by:
+        if column not in schema.types:
+            raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
+    for item in items:
+        if item.function is not None and item.function not in AGGREGATE_FUNCTIONS:
+            raise QueryError(MSG_INVALID_VALUE.format(value=item.function))
+        if item.column is None:
+            if item.function != "count":
+                raise QueryError(MSG_INVALID_VALUE.format(value=item.label))
+            continue
+        column_type = schema.types.get(item.column)
+        if column_type is None:
+            raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=item.column))
+        if item.function is None and item.column not in group_by:
+            raise QueryError(MSG_AGGREGATE_NOT_GROUPED.format(column=item.column))
+        if item.function in AGGREGATE_NUMERIC and column_type != TYPE_INT:
+            raise QueryError(
+                MSG_AGGREGATE_TYPE.format(
+                    function=item.function,
+                    column=item.column,
+                    column_type=column_type,
+                )
+            )
+
+
+def _finish(function: str, total, count: int):
+    """Итог агрегата по накопленным сумме/экстремуму и числу значений."""
+    if function == "count":
+        return count
+    if function == "avg":
+        return total / count if count else None
+    return total
+
+
+def _fold(
+    rows: Iterable[dict],
+    aggregates: list[Aggregate],
+    group_by: list[str],
+) -> dict[tuple, list[list]]:
+    """
+    Один проход по записям: для каждой группы копит [значение, число].
+
+    Значением служит сумма (sum, avg) или текущий экстремум (min, max);
+    None в столбце пропускается, как в SQL.
+    """
+    groups: dict[tuple, list[list]] = {}
+    for row in rows:
+        key = tuple([row.get(column) for column in group_by])
+        cells = groups.get(key)
+        if cells is None:
+            cells = groups[key] = [[None, 0] for _ in aggregates]
+        for (function, column), cell in zip(aggregates, cells):
+            if column is None:
+                cell[1] += 1
+                continue
+            value = row.get(column)
+            if value is None:
+                continue
+            cell[1] += 1
+            current = cell[0]
+            if current is None:
+                cell[0] = value
+            elif function in AGGREGATE_NUMERIC:
+                cell[0] = current + value
+            elif (function == "min" and value < current) or (
+                function == "max" and value > current
+            ):
+                cell[0] = value
+    return groups
+
+
+def _columnar_cells(
+    table: ColumnarTable,
+    aggregates: list[Aggregate],
+    positions: list[int] | None,
+) -> list[list]:
+    """Агрегаты без группировки по массивам колоночной таблицы."""
+    cells = []
+    for function, column in aggregates:
+        if column is None:
+            count = table.length if positions is None else len(positions)
+            cells.append([None, count])
+            continue
+        values = table.column_values(column, positions)
+        if function == "count":
+            cells.append([None, sum(value is not None for value in values)])
+            continue
+        present = [value for value in values if value is not None]
+        if not present:
+            cells.append([None, 0])
+        elif function in AGGREGATE_NUMERIC:
+            cells.append([sum(present), len(present)])
+        else:
+            cells.append([min(present) if function == "min" else max(present), 0])
+    return cells
+
+
+def _index_groups(
+    table_name: str,
+    table_data,
+    column: str,
+    kind: str,
+) -> dict[tuple, list[list]]:
+    """count(*) по группам индексированного столбца — из записей индекса."""
+    entries = get_index(table_name, column, kind, table_data)["entries"]
+    if kind == INDEX_SORTED:
+        grouped = groupby(entries, key=lambda entry: entry[0])
+        counts = ((value, sum(1 for _ in group)) for value, group in grouped)
+    else:
+        counts = ((value, len(ids)) for value, ids in entries.items())
+    return {(value,): [[None, count]] for value, count in counts if count}
+
+
+def aggregate(
+    table_name: str,
+    schema: Schema,
+    items: list[Aggregate],
+    where_clause=None,
+    group_by: list[str] | None = None,
+    indexes: dict[str, str] | None = None,
+) -> list[dict]:
+    """
+    Вычисляет агрегаты select и возвращает по записи на группу.
+
+    Записи не копируются: подходящие под условие перебираются один раз
+    (через PK, индексы, колонки или пул процессов, как в select), а для
+    каждой группы копятся только суммы, экстремумы и счётчики. Без
+    условия count(*) берётся из длины таблицы, count(*) по группам
+    индексированного столбца — из индекса, а агрегаты колоночной
+    таблицы без группировки считаются по массивам столбцов.
+    """
+    condition = as_condition(where_clause)
+    group_by = list(group_by or [])
+    indexes = indexes or {}
+    check_aggregates(schema, items, group_by)
+    aggregates = [item for item in items if item.function is not None]
+    table_data = get_table(table_name) or []
+
+    groups = None
+    with phase("filter"):
+        only_count = all(item.column is None for item in aggregates)
+        if condition is None and not group_by and only_count:
+            count_metric("aggregate.length")
+            groups = {(): [[None, len(table_data)] for _ in aggregates]}
+        elif (
+            condition is None
+            and len(group_by) == 1
+            and group_by[0] in indexes
+            and aggregates == [Aggregate("count", None)]
+        ):
+            count_metric("aggregate.index")
+            column = group_by[0]
+            groups = _index_groups(table_name, table_data, column, indexes[column])
+        elif isinstance(table_data, ColumnarTable) and not group_by:
+            positions = None
+            if condition is not None:
+                positions = table_data.filter_positions(condition.tree)
+            if condition is None or positions is not None:
+                count_metric("aggregate.columnar")
+                groups = {(): _columnar_cells(table_data, aggregates, positions)}
+        if groups is None:
+            count_metric("aggregate.scan")
+            rows = iter_matches(table_name, table_data, condition, indexes)
+            groups = _fold(rows, aggregates, group_by)
+
+    if not group_by and not groups:
+        groups = {(): [[None, 0] for _ in aggregates]}
+
+    results = []
+    for key, cells in groups.items():
+        grouped = dict(zip(group_by, key))
+        finished = iter(cells)
+        row = {}
+        for item in items:
+            if item.function is None:
+                row[item.label] = grouped[item.column]
+            else:
+                total, count = next(finished)
+                row[item.label] = _finish(item.function, total, count)
+        results.append(row)
+    return results
@@ -0,0 +1,465 @@
+from contextlib import contextmanager
+from typing import Iterable, Iterator, NamedTuple
+
+from ..constants import (
+    ID_NAME,
+    INDEX_HASH,
+    MSG_INVALID_VALUE,
+    MSG_NO_TRANSACTION,
+    MSG_NOT_IN_TRANSACTION,
+    MSG_TRANSACTION_ACTIVE,
+    MSG_UNKNOWN_COLUMN,
+    MSG_VALUES_MISMATCH,
+)
+from ..decorators import log_time
+from .aggregates import Aggregate, aggregate
+from .buffer_pool import (
+    begin,
+    commit,
+    compact_table,
+    drop_table_data,
+    flush,
+    get_metadata,
+    get_table,
+    get_table_for_write,
+    in_transaction,
+    lock_metadata,
+    lock_table,
+    maybe_flush,
+    put_metadata,
+    put_table,
+    rollback,
+)
+from .core import (
+    QueryPlan,
+    Schema,
+    TableInfo,
+    cache_stats,
+    clear_cache,
+    create_index,
+    create_table,
+    delete,
+    drop_index,
+    drop_table,
+    explain,
+    get_schema,
+    info,
+    insert,
+    insert_many,
+    iter_select,
+    list_tables,
+    type_map,
+    update,
+)
+from .errors import ColumnNotFoundError, QueryError, SchemaError, TransactionError
+from .indexes import (
+    build_index,
+    remove_index,
+    remove_pk_map,
+    save_index,
+    sync_indexes,
+    table_indexes,
+)
+from .parser import (
+    parse_aggregate_item,
+    parse_where_condition_tokens,
+    split_command,
+)
+from .predicates import Condition, as_condition
+from .scan import shutdown_pool
+from .storage import convert_table
+from .transfer import export_table, import_table
+from .wal import close as close_wal
+
+# Условие WHERE: готовый Condition, словарь равенств или текст условия.
+Where = Condition | dict | str | None
+
+
+class WriteResult(NamedTuple):
+    """Итог изменяющей операции: число затронутых записей и их ID."""
+
+    count: int
+    ids: list[int]
+
+
+@contextmanager
+def _writing(table_name: str | None, metadata: bool = False) -> Iterator[None]:
+    """
+    Берёт блокировки до чтения изменяемых данных и по завершении
+    сбрасывает пул, если истёк интервал сброса.
+    """
+    try:
+        if metadata:
+            lock_metadata()
+        if table_name is not None:
+            lock_table(table_name)
+        yield
+    finally:
+        maybe_flush()
+
+
+class Table:
+    """
+    Таблица базы данных.
+
+    Методы ничего не печатают и не спрашивают: результат возвращается,
+    а ошибка выбрасывается как подкласс DatabaseError.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Table({self.name!r})"
+
+    @property
+    def schema(self) -> Schema:
+        """Скомпилированная схема таблицы."""
+        return get_schema(get_metadata(), self.name)
+
+    @property
+    def types(self) -> dict[str, str]:
+        """Типы столбцов: имя -> тип."""
+        return dict(self.schema.types)
+
+    @property
+    def columns(self) -> list[str]:
+        """Имена столбцов, включая ID."""
+        return list(self.schema.columns)
+
+    def _condition(self, where: Where) -> Condition | None:
+        if where is None or isinstance(where, Condition):
+            return where
+        schema = self.schema
+        if isinstance(where, str):
+            return parse_where_condition_tokens(split_command(where), schema.types)
+        for column in where:
+            if column not in schema.converters:
+                raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
+        return as_condition(
+            {
+                column: schema.converters[column](value)
+                for column, value in where.items()
+            }
+        )
+
+    def _ordered_values(self, values: dict | list | tuple) -> list:
+        if not isinstance(values, dict):
+            return list(values)
+        columns = self.schema.values
+        for column in values:
+            if column not in columns:
+                raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
+        if len(values) != len(columns):
+            raise SchemaError(MSG_VALUES_MISMATCH)
+        return [values[column] for column in columns]
+
+    @log_time
+    def insert(self, values: dict | list | tuple) -> WriteResult:
+        """
+        Добавляет запись.
+
+        values — словарь столбец -> значение или значения в порядке
+        столбцов без ID. Строки приводятся к типам столбцов.
+        """
+        with _writing(self.name, metadata=True):
+            metadata = get_metadata()
+            ordered = self._ordered_values(values)
+            table_data = get_table_for_write(self.name)
+            ops = []
+            new_id = insert(metadata, self.name, ordered, table_data, ops)
+            put_table(self.name, table_data, ops)
+            put_metadata(metadata)
+            sync_indexes(metadata, self.name, table_data, ops)
+        return WriteResult(1, [new_id])
+
+    @log_time
+    def insert_many(self, rows: Iterable[dict | list | tuple]) -> WriteResult:
+        """
+        Добавляет несколько записей одной операцией.
+
+        Каждая запись задаётся так же, как в insert. ID выделяются
+        подряд, таблица и индексы обновляются один раз; при ошибке в
+        любой записи таблица не меняется.
+        """
+        with _writing(self.name, metadata=True):
+            metadata = get_metadata()
+            ordered = [self._ordered_values(values) for values in rows]
+            table_data = get_table_for_write(self.name)
+            ops = []
+            ids = insert_many(metadata, self.name, ordered, table_data, ops)
+            put_table(self.name, table_data, ops)
+            put_metadata(metadata)
+            sync_indexes(metadata, self.name, table_data, ops)
+        return WriteResult(len(ids), ids)
+
+    def iter(
+        self,
+        where: Where = None,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> Iterator[dict]:
+        """Отдаёт подходящие записи по одной (копии, а не строки пула)."""
+        metadata = get_metadata()
+        type_map(metadata, self.name)
+        return iter_select(
+            self.name,
+            self._condition(where),
+            table_indexes(metadata, self.name),
+            limit,
+            offset,
+        )
+
+    @log_time
+    def select(
+        self,
+        where: Where = None,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> list[dict]:
+        """Возвращает подходящие записи списком."""
+        return list(self.iter(where, limit, offset))
+
+    @log_time
+    def aggregate(
+        self,
+        items: Iterable[str | tuple],
+        where: Where = None,
+        group_by: Iterable[str] = (),
+    ) -> list[dict]:
+        """
+        Считает агрегаты по подходящим записям, по записи на группу.
+
+        items — "count(*)", "sum(age)", столбец группировки или пары
+        (функция, столбец), где столбец None означает count(*). Ключи
+        результата — подписи элементов: {"age": 30, "count(*)": 2}.
+        """
+        metadata = get_metadata()
+        parsed = [
+            parse_aggregate_item(item) if isinstance(item, str) else Aggregate(*item)
+            for item in items
+        ]
+        return aggregate(
+            self.name,
+            get_schema(metadata, self.name),
+            parsed,
+            self._condition(where),
+            list(group_by),
+            table_indexes(metadata, self.name),
+        )
+
+    @log_time
+    def update(self, values: dict, where: Where = None) -> WriteResult:
+        """Изменяет подходящие записи; без условия — все записи."""
+        with _writing(self.name):
+            metadata = get_metadata()
+            condition = self._condition(where)
+            table_data = get_table_for_write(self.name)
+            ops = []
+            ids = update(metadata, self.name, table_data, values, condition, ops)
+            if ids:
+                put_table(self.name, table_data, ops)
+                sync_indexes(metadata, self.name, table_data, ops)
+        return WriteResult(len(ids), ids)
+
+    @log_time
+    def delete(self, where: Where) -> WriteResult:
+        """Удаляет подходящие записи; условие обязательно."""
+        if not where:
+            raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+        with _writing(self.name):
+            metadata = get_metadata()
+            condition = self._condition(where)
+            table_data = get_table_for_write(self.name)
+            ops = []
+            remaining, ids = delete(
+                self.name,
+                table_data,
+                condition,
+                ops,
+                table_indexes(metadata, self.name),
+            )
+            if ids:
+                put_table(self.name, remaining, ops)
+                sync_indexes(metadata, self.name, remaining, ops)
+        return WriteResult(len(ids), ids)
+
+    def explain(self, where: Where = None) -> QueryPlan:
+        """Возвращает план select: способ доступа, индексы, кандидатов."""
+        metadata = get_metadata()
+        type_map(metadata, self.name)
+        return explain(
+            self.name,
+            self._condition(where),
+            table_indexes(metadata, self.name),
+        )
+
+    def create_index(self, column: str, kind: str = INDEX_HASH) -> None:
+        """Строит индекс по столбцу (hash или sorted)."""
+        with _writing(self.name, metadata=True):
+            metadata = create_index(get_metadata(), self.name, column, kind)
+            table_data = get_table(self.name)
+            save_index(self.name, column, build_index(table_data, column, kind))
+            put_metadata(metadata)
+
+    def drop_index(self, column: str) -> None:
+        """Удаляет индекс по столбцу."""
+        with _writing(self.name, metadata=True):
+            put_metadata(drop_index(get_metadata(), self.name, column))
+            remove_index(self.name, column)
+
+    def info(self) -> TableInfo:
+        """Возвращает схему таблицы и количество записей."""
+        metadata = get_metadata()
+        type_map(metadata, self.name)
+        return info(metadata, self.name, get_table(self.name))
+
+    def __len__(self) -> int:
+        return self.info().count
+
+    @log_time
+    def import_file(self, path: str) -> WriteResult:
+        """Дописывает записи из CSV или JSON Lines одной операцией."""
+        with _writing(self.name, metadata=True):
+            metadata = get_metadata()
+            table_data = get_table_for_write(self.name)
+            ops = []
+            count = import_table(metadata, self.name, path, table_data, ops)
+            put_table(self.name, table_data, ops)
+            put_metadata(metadata)
+            sync_indexes(metadata, self.name, table_data, ops)
+        ids = [record[ID_NAME] for record in table_data[len(table_data) - count :]]
+        return WriteResult(count, ids)
+
+    @log_time
+    def export_file(self, path: str) -> int:
+        """Выгружает записи в CSV или JSON Lines и возвращает их число."""
+        metadata = get_metadata()
+        return export_table(metadata, self.name, path, get_table(self.name))
+
+    def compact(self) -> None:
+        """Переписывает журнал таблицы в снимок (вне транзакции)."""
+        if in_transaction():
+            raise TransactionError(MSG_NOT_IN_TRANSACTION.format(command="compact"))
+        with _writing(self.name):
+            type_map(get_metadata(), self.name)
+            compact_table(self.name)
+
+    def convert(self, storage: str) -> None:
+        """
+        Переписывает файл таблицы в формате движка storage (json, log
+        или binary), предварительно сбросив несохранённые изменения.
+        """
+        if in_transaction():
+            raise TransactionError(MSG_NOT_IN_TRANSACTION.format(command="convert"))
+        with _writing(self.name):
+            type_map(get_metadata(), self.name)
+            flush(self.name)
+            convert_table(self.name, storage)
+
+
+class Database:
+    """
+    Программный интерфейс базы в каталоге DATA_PATH.
+
+    Все экземпляры работают с общим пулом таблиц процесса. Запись
+    сбрасывается на диск по правилам пула (set_flush_interval) или
+    целиком при commit/flush/close.
+    """
+
+    def __enter__(self) -> "Database":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def tables(self) -> list[str]:
+        """Возвращает имена таблиц."""
+        return list_tables(get_metadata())
+
+    def table(self, name: str) -> Table:
+        """Возвращает существующую таблицу или выбрасывает TableNotFoundError."""
+        type_map(get_metadata(), name)
+        return Table(name)
+
+    def create_table(
+        self,
+        name: str,
+        columns: list[str] | dict[str, str],
+        notices: list[str] | None = None,
+    ) -> Table:
+        """
+        Создаёт таблицу.
+
+        columns — список "имя:тип" или словарь имя -> тип. Столбец ID
+        добавляется автоматически; предупреждения дописываются в notices.
+        """
+        if isinstance(columns, dict):
+            columns = [f"{column}:{kind}" for column, kind in columns.items()]
+        with _writing(None, metadata=True):
+            put_metadata(create_table(get_metadata(), name, columns, notices))
+        return Table(name)
+
+    def drop_table(self, name: str) -> None:
+        """Удаляет таблицу вместе с её данными и индексами."""
+        with _writing(name, metadata=True):
+            metadata = get_metadata()
+            indexed_columns = list(table_indexes(metadata, name))
+            put_metadata(drop_table(metadata, name))
+            drop_table_data(name)
+            remove_pk_map(name)
+            for column in indexed_columns:
+                remove_index(name, column)
+
+    def cache_stats(self) -> dict[str, int]:
+        """Возвращает счётчики кэша результатов select."""
+        return cache_stats()
+
+    def in_transaction(self) -> bool:
+        return in_transaction()
+
+    def begin(self) -> None:
+        """Открывает транзакцию."""
+        if in_transaction():
+            raise TransactionError(MSG_TRANSACTION_ACTIVE)
+        begin()
+
+    def commit(self) -> None:
+        """Фиксирует транзакцию."""
+        if not in_transaction():
+            raise TransactionError(MSG_NO_TRANSACTION)
+        commit()
+
+    def rollback(self) -> None:
+        """Отменяет транзакцию."""
+        if not in_transaction():
+            raise TransactionError(MSG_NO_TRANSACTION)
+        rollback()
+        clear_cache()
+
+    @contextmanager
+    def transaction(self) -> Iterator["Database"]:
+        """Выполняет блок в транзакции; при исключении она отменяется."""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def flush(self) -> None:
+        """Сбрасывает накопленные изменения на диск."""
+        flush()
+
+    def close(self) -> None:
+        """
+        Отменяет незавершённую транзакцию и сбрасывает изменения.
+
+        Пул процессов параллельного просмотра останавливается.
+        """
+        if in_transaction():
+            self.rollback()
+        flush()
+        shutdown_pool()
+        close_wal()
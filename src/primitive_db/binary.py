@@ -0,0 +1,290 @@
+import json
+import mmap
+import struct
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import BinaryIO, Iterable, Iterator
+
+from ..constants import (
+    BINARY_MAGIC,
+    BINARY_VERSION,
+    ID_NAME,
+    MSG_BAD_BINARY,
+    MSG_BAD_TYPE,
+    TYPE_BOOL,
+    TYPE_INT,
+    TYPE_STR,
+)
+from .columnar import schema_from_info
+
+# Двоичный файл таблицы (little-endian):
+#   преамбула: "PDBT", версия u16, флаги u16, число записей u64,
+#              длина заголовка u32;
+#   заголовок: JSON {"columns": ["ID:int", "name:str", ...]} (table_info);
+#   записи фиксированной ширины: битовая карта null, битовая карта
+#              «длинных» целых, затем по ячейке на столбец:
+#              int — q, bool — ?, str — (смещение, длина) II;
+#   куча строк в UTF-8, смещения отсчитываются от её начала.
+# Целое вне диапазона int64 пишется в кучу десятичным текстом, а его
+# ячейка хранит (смещение, длина) и помечается в карте «длинных».
+_PREAMBLE = struct.Struct("<4sHHQI")
+_CELLS = {TYPE_INT: "q", TYPE_BOOL: "?", TYPE_STR: "II"}
+_INT64 = struct.Struct("<q")
+_SPAN = struct.Struct("<II")
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+# Флаг преамбулы: ID записей возрастают, поиск по ID идёт бинарным поиском.
+FLAG_IDS_SORTED = 1
+
+
+class _Layout:
+    """Раскладка записи для схемы: struct строки и позиции ячеек."""
+
+    def __init__(self, schema: list[tuple[str, str]]):
+        self.schema = schema
+        self.mask_size = (len(schema) + 7) // 8
+        cells = "".join(_CELLS[column_type] for _, column_type in schema)
+        self.row = struct.Struct(f"<{self.mask_size}s{self.mask_size}s{cells}")
+        # Для каждого столбца — индекс первой ячейки в распакованном кортеже.
+        self.slots = []
+        slot = 2
+        for _, column_type in schema:
+            self.slots.append(slot)
+            slot += len(_CELLS[column_type])
+        self.id_offset = None
+        if schema and schema[0] == (ID_NAME, TYPE_INT):
+            self.id_offset = self.mask_size * 2
+
+    def encode(self, record: dict, heap: bytearray) -> bytes:
+        nulls = bytearray(self.mask_size)
+        wide = bytearray(self.mask_size)
+        cells: list = []
+        for column, (name, column_type) in enumerate(self.schema):
+            value = record.get(name)
+            if value is None:
+                nulls[column >> 3] |= 1 << (column & 7)
+                cells.extend((0, 0) if column_type == TYPE_STR else (0,))
+            elif column_type == TYPE_STR:
+                cells.extend(_put(heap, str(value)))
+            elif column_type == TYPE_BOOL:
+                cells.append(bool(value))
+            elif not isinstance(value, int):
+                raise ValueError(MSG_BAD_TYPE.format(value=value))
+            elif _INT64_MIN <= value <= _INT64_MAX:
+                cells.append(value)
+            else:
+                wide[column >> 3] |= 1 << (column & 7)
+                cells.append(_INT64.unpack(_SPAN.pack(*_put(heap, str(value))))[0])
+        return self.row.pack(bytes(nulls), bytes(wide), *cells)
+
+    def decode(self, values: tuple, heap: "mmap.mmap", heap_start: int) -> dict:
+        nulls, wide = values[0], values[1]
+        record = {}
+        for column, ((name, column_type), slot) in enumerate(
+            zip(self.schema, self.slots)
+        ):
+            bit = 1 << (column & 7)
+            if nulls[column >> 3] & bit:
+                record[name] = None
+            elif column_type == TYPE_STR:
+                record[name] = _get(heap, heap_start, values[slot], values[slot + 1])
+            elif wide[column >> 3] & bit:
+                offset, length = _SPAN.unpack(_INT64.pack(values[slot]))
+                record[name] = int(_get(heap, heap_start, offset, length))
+            else:
+                record[name] = values[slot]
+        return record
+
+
+def _put(heap: bytearray, text: str) -> tuple[int, int]:
+    data = text.encode("utf-8")
+    offset = len(heap)
+    heap += data
+    return offset, len(data)
+
+
+def _get(buffer, heap_start: int, offset: int, length: int) -> str:
+    start = heap_start + offset
+    return buffer[start : start + length].decode("utf-8")
+
+
+def _value_type(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return TYPE_BOOL
+    if isinstance(value, int):
+        return TYPE_INT
+    return TYPE_STR
+
+
+def _infer_info(rows: Iterable[dict]) -> list[str]:
+    """Восстанавливает схему по значениям, если table_info недоступен."""
+    types: dict[str, str | None] = {ID_NAME: TYPE_INT}
+    for record in rows:
+        for name, value in record.items():
+            kind = _value_type(value)
+            known = types.get(name)
+            if known is None:
+                types[name] = kind
+            elif kind is not None and kind != known:
+                types[name] = TYPE_STR
+    return [f"{name}:{kind or TYPE_STR}" for name, kind in types.items()]
+
+
+def write_binary(
+    file: BinaryIO,
+    rows: Iterable[dict],
+    table_info: list[str] | None = None,
+) -> int:
+    """
+    Пишет записи в двоичном формате в открытый файл и возвращает их число.
+
+    Записи кодируются по одной; строки копятся в куче, которая
+    дописывается в конец. Преамбула с числом записей переписывается
+    после прохода, поэтому rows может быть любым итерируемым.
+    """
+    if table_info is None:
+        rows = list(rows)
+        table_info = _infer_info(rows)
+    layout = _Layout(schema_from_info(table_info))
+    header = json.dumps({"columns": table_info}, ensure_ascii=False).encode()
+
+    start = file.tell()
+    file.write(_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, 0, 0, len(header)))
+    file.write(header)
+
+    heap = bytearray()
+    count = 0
+    sorted_ids = True
+    previous = None
+    for record in rows:
+        record_id = record.get(ID_NAME)
+        if not isinstance(record_id, int) or (
+            previous is not None and record_id <= previous
+        ):
+            sorted_ids = False
+        previous = record_id
+        file.write(layout.encode(record, heap))
+        count += 1
+    file.write(heap)
+
+    end = file.tell()
+    flags = FLAG_IDS_SORTED if sorted_ids and layout.id_offset is not None else 0
+    file.seek(start)
+    file.write(_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, flags, count, len(header)))
+    file.seek(end)
+    return count
+
+
+class BinaryTable(Sequence):
+    """
+    Двоичная таблица, отображённая в память через mmap.
+
+    Открытие читает только преамбулу и заголовок: len() берётся из
+    заголовка, а запись разбирается из своих байтов лишь при обращении к
+    ней. Таблица только для чтения: для изменения её переводят в список
+    (to_rows). Возвращаемые записи — новые словари.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        error = ValueError(MSG_BAD_BINARY.format(path=path, version=BINARY_VERSION))
+        if len(self._buffer) < _PREAMBLE.size:
+            raise error
+        magic, version, flags, count, header_size = _PREAMBLE.unpack_from(
+            self._buffer
+        )
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise error
+
+        header_start = _PREAMBLE.size
+        header = json.loads(self._buffer[header_start : header_start + header_size])
+        self.table_info: list[str] = header["columns"]
+        self._layout = _Layout(schema_from_info(self.table_info))
+        self._count = count
+        self._ids_sorted = bool(flags & FLAG_IDS_SORTED)
+        self._rows_start = header_start + header_size
+        self._heap_start = self._rows_start + count * self._layout.row.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _decode(self, position: int) -> dict:
+        row = self._layout.row
+        values = row.unpack_from(self._buffer, self._rows_start + position * row.size)
+        return self._layout.decode(values, self._buffer, self._heap_start)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            indices = range(*position.indices(self._count))
+            return [self._decode(index) for index in indices]
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        return self._decode(position)
+
+    def __iter__(self) -> Iterator[dict]:
+        rows = memoryview(self._buffer)[self._rows_start : self._heap_start]
+        decode = self._layout.decode
+        for values in self._layout.row.iter_unpack(rows):
+            yield decode(values, self._buffer, self._heap_start)
+
+    def record_id(self, position: int) -> int:
+        """Читает только ячейку ID записи."""
+        offset = self._rows_start + position * self._layout.row.size
+        return _INT64.unpack_from(self._buffer, offset + self._layout.id_offset)[0]
+
+    def position_of(self, record_id) -> int | None:
+        """
+        Находит позицию записи по ID.
+
+        Если ID в файле возрастают, выполняется бинарный поиск по ячейкам
+        ID (log n чтений по 8 байт); иначе ячейки ID просматриваются
+        подряд, а сами записи не разбираются.
+        """
+        if self._layout.id_offset is None or not isinstance(record_id, int):
+            return None
+        if self._ids_sorted:
+            ids = _IdColumn(self)
+            position = bisect_left(ids, record_id)
+            if position < self._count and ids[position] == record_id:
+                return position
+            return None
+        for position in range(self._count):
+            if self.record_id(position) == record_id:
+                return position
+        return None
+
+    def rows_by_ids(self, ids: Iterable[int]) -> list[dict]:
+        """Возвращает записи с указанными ID в порядке таблицы."""
+        positions = sorted(
+            position
+            for position in map(self.position_of, set(ids))
+            if position is not None
+        )
+        return [self._decode(position) for position in positions]
+
+    def to_rows(self) -> list[dict]:
+        """Разбирает все записи в изменяемый список."""
+        return list(self)
+
+
+class _IdColumn(Sequence):
+    """Столбец ID двоичной таблицы как последовательность для bisect."""
+
+    def __init__(self, table: BinaryTable):
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getitem__(self, position: int) -> int:
+        return self._table.record_id(position)
+
+
+def read_binary(path: str) -> BinaryTable:
+    """Открывает двоичный файл таблицы для ленивого чтения."""
+    return BinaryTable(path)
@@ -0,0 +1,413 @@
+import os
+import time
+from typing import Callable
+
+from ..constants import (
+    COLUMNAR_ENV,
+    DEFAULT_FLUSH_INTERVAL,
+    FLUSH_INTERVAL_ENV,
+    LOCK_HOLD_MAX,
+    LOCK_RETRY_INITIAL,
+    LOCK_RETRY_MAX,
+    META_FILE,
+    SNAPSHOT_READ_RETRIES,
+    STORAGE_SEGMENTS,
+    TABLE_INFO_KEY,
+)
+from .binary import BinaryTable
+from .columnar import ColumnarTable, schema_from_info
+from .indexes import discard_indexes, flush_indexes
+from .locks import (
+    acquire,
+    has_waiters,
+    held_locks,
+    meta_lock_path,
+    release,
+    table_lock_path,
+)
+from .metrics import phase
+from .scan import table_changed
+from .segments import SegmentedTable
+from .storage import get_storage_engine
+from .utils import (
+    delete_table_file,
+    file_stamp,
+    load_metadata,
+    load_table_data,
+    save_metadata,
+    save_table_data,
+)
+from .wal import append, checkpoint, make_record, recover
+
+# Разобранные таблицы: имя -> {"rows", "ops", "dirty", "stamp"}.
+# ops — операции, накопленные с последнего сброса; None — переписать целиком.
+_tables: dict[str, dict] = {}
+_metadata: dict = {"value": None, "stamp": None, "dirty": False}
+# Таблицы, удалённые с последнего сброса: их файлы стираются при flush.
+_dropped: set[str] = set()
+_recovered = False
+# Открыта ли явная транзакция: пока да, изменения не сбрасываются на диск.
+_transaction = {"active": False}
+_flush_interval = float(
+    os.environ.get(FLUSH_INTERVAL_ENV, DEFAULT_FLUSH_INTERVAL)
+)
+_last_flush = time.monotonic()
+# Когда взята первая из удерживаемых блокировок записи.
+_locked_since = time.monotonic()
+_columnar = os.environ.get(COLUMNAR_ENV, "") not in ("", "0")
+# Вызываются с именем таблицы, когда её файлы перечитаны с диска.
+_reload_listeners: list[Callable[[str], None]] = []
+# Вызываются с числом записей, доигранных из журналов упавших процессов.
+_recovery_listeners: list[Callable[[int], None]] = []
+
+
+def _table_stamp(table_name: str) -> tuple:
+    """Снимает отпечатки (mtime, размер) всех файлов таблицы."""
+    files = get_storage_engine().files(table_name)
+    return tuple(file_stamp(path) for path in files)
+
+
+def set_flush_interval(seconds: float) -> None:
+    """Задаёт интервал сброса изменений на диск (0 — после каждой команды)."""
+    global _flush_interval
+    _flush_interval = seconds
+
+
+def set_columnar(enabled: bool) -> None:
+    """Включает колоночное представление таблиц в памяти."""
+    global _columnar
+    _columnar = enabled
+
+
+def _resident_rows(table_name: str, rows):
+    """Переводит записи в колоночный вид, если он включён и схема известна."""
+    if not _columnar or isinstance(rows, ColumnarTable):
+        return rows
+    table_meta = get_metadata().get(table_name)
+    if not table_meta:
+        return rows
+    schema = schema_from_info(table_meta[TABLE_INFO_KEY])
+    return ColumnarTable.from_rows(schema, rows)
+
+
+def _ensure_recovered() -> None:
+    """Один раз за процесс доигрывает журнал, оставшийся после сбоя."""
+    global _recovered
+    if not _recovered:
+        _recovered = True
+        _recover()
+
+
+def _recover() -> None:
+    """Доигрывает журналы упавших процессов и сообщает об этом подписчикам."""
+    count = recover()
+    if count:
+        for listener in _recovery_listeners:
+            listener(count)
+
+
+def add_reload_listener(listener: Callable[[str], None]) -> None:
+    """Подписывает listener(table_name) на перечитывание таблицы с диска."""
+    _reload_listeners.append(listener)
+
+
+def add_recovery_listener(listener: Callable[[int], None]) -> None:
+    """Подписывает listener(count) на доигрывание журналов упавших процессов."""
+    _recovery_listeners.append(listener)
+
+
+def _lock(path: str) -> None:
+    global _locked_since
+    first = not held_locks()
+    if acquire(path):
+        if first:
+            _locked_since = time.monotonic()
+        _recover()
+
+
+def lock_metadata() -> None:
+    """
+    Берёт исключительную блокировку метаданных до ближайшего сброса.
+
+    Вызывается до чтения метаданных командой, которая их изменит, чтобы
+    другой процесс не записал свои изменения между чтением и записью.
+    """
+    _lock(meta_lock_path())
+
+
+def lock_table(table_name: str) -> None:
+    """Берёт исключительную блокировку таблицы до ближайшего сброса."""
+    _lock(table_lock_path(table_name))
+
+
+def _release_locks() -> None:
+    """Снимает блокировки со всего, что уже сброшено на диск."""
+    if _transaction["active"]:
+        return
+    pending = {
+        table_lock_path(name) for name, entry in _tables.items() if entry["dirty"]
+    }
+    pending.update(table_lock_path(name) for name in _dropped)
+    if _metadata["dirty"]:
+        pending.add(meta_lock_path())
+    for path in held_locks():
+        if path not in pending:
+            release(path)
+
+
+def get_metadata() -> dict:
+    """Возвращает метаданные, перечитывая файл только при его изменении."""
+    _ensure_recovered()
+    if _metadata["value"] is None or (
+        not _metadata["dirty"] and _metadata["stamp"] != file_stamp(META_FILE)
+    ):
+        # Отпечаток снимается до чтения: изменение во время чтения
+        # заметит следующая проверка.
+        with phase("load"):
+            _metadata["stamp"] = file_stamp(META_FILE)
+            _metadata["value"] = load_metadata(META_FILE)
+    return _metadata["value"]
+
+
+def put_metadata(metadata: dict) -> None:
+    """Запоминает изменённые метаданные до ближайшего сброса."""
+    _metadata["value"] = metadata
+    _metadata["dirty"] = True
+
+
+def get_table(table_name: str) -> list[dict]:
+    """
+    Возвращает записи таблицы из пула.
+
+    Файл разбирается заново, только если таблицы ещё нет в памяти или
+    её файлы изменил кто-то другой (сравниваются mtime и размер).
+    """
+    _ensure_recovered()
+    entry = _tables.get(table_name)
+    if entry is None and table_name in _dropped:
+        return []
+    stamp = _table_stamp(table_name)
+    if entry is not None and (entry["dirty"] or entry["stamp"] == stamp):
+        return entry["rows"]
+
+    with phase("load"):
+        rows, stamp = _read_snapshot(table_name, stamp)
+    _tables[table_name] = {
+        "rows": _resident_rows(table_name, rows),
+        "ops": [],
+        "dirty": False,
+        "stamp": stamp,
+    }
+    if entry is not None:
+        for listener in _reload_listeners:
+            listener(table_name)
+    return _tables[table_name]["rows"]
+
+
+def get_table_for_write(table_name: str) -> list[dict]:
+    """
+    Возвращает записи таблицы, которые можно изменять на месте.
+
+    Лениво читаемая двоичная таблица при этом разбирается в список.
+    Сегментированная изменяется на месте и читает только сегменты с
+    затронутыми записями, если и сохраняться она будет сегментами.
+    """
+    rows = get_table(table_name)
+    segmented = get_storage_engine().name == STORAGE_SEGMENTS
+    if isinstance(rows, BinaryTable) or (
+        isinstance(rows, SegmentedTable) and not segmented
+    ):
+        rows = rows.to_rows()
+        _tables[table_name]["rows"] = rows
+    return rows
+
+
+def _read_snapshot(
+    table_name: str,
+    stamp: tuple,
+) -> tuple[list[dict], tuple | None]:
+    """
+    Читает согласованное состояние таблицы без блокировок.
+
+    Снимок и журнал таблицы заменяются атомарно, но между их чтением
+    писатель может успеть сжать журнал. Если отпечатки файлов после
+    чтения отличаются от снятых до него, чтение повторяется с паузой,
+    а после SNAPSHOT_READ_RETRIES попыток — под разделяемой блокировкой.
+    """
+    delay = LOCK_RETRY_INITIAL
+    for _ in range(SNAPSHOT_READ_RETRIES):
+        rows = load_table_data(table_name)
+        current = _table_stamp(table_name)
+        if current == stamp:
+            return rows, stamp
+        stamp = current
+        time.sleep(delay)
+        delay *= 2
+    # Файлы всё время менялись: дочитать под разделяемой блокировкой —
+    # она ждёт только писателя, другие читатели её не задерживают.
+    path = table_lock_path(table_name)
+    taken = acquire(path, shared=True)
+    try:
+        rows = load_table_data(table_name)
+        return rows, _table_stamp(table_name)
+    finally:
+        if taken:
+            release(path)
+
+
+def put_table(table_name: str, rows: list[dict], ops=None) -> None:
+    """Запоминает новое состояние таблицы и выполненные над ней операции."""
+    table_changed()
+    rows = _resident_rows(table_name, rows)
+    entry = _tables.setdefault(
+        table_name,
+        {"rows": rows, "ops": [], "dirty": False, "stamp": None},
+    )
+    entry["rows"] = rows
+    if ops is None:
+        entry["ops"] = None
+    elif entry["ops"] is not None:
+        entry["ops"].extend(ops)
+    entry["dirty"] = True
+
+
+def flush(table_name: str | None = None) -> None:
+    """
+    Записывает на диск изменённые метаданные, таблицы и индексы.
+
+    Все изменения сбрасываются одной группой: сначала они одной записью
+    попадают в журнал (WAL) с fsync, затем применяются к файлам через
+    атомарную замену, и только после этого журнал очищается.
+    """
+    global _last_flush
+    names = list(_tables) if table_name is None else [table_name]
+    dirty = [
+        name for name in names if name in _tables and _tables[name]["dirty"]
+    ]
+    with phase("save"):
+        if _metadata["dirty"] or _dropped or dirty:
+            _commit(dirty)
+        try:
+            flush_indexes(table_name)
+        finally:
+            # Таблицы уже записаны: ошибка записи индекса (StorageError)
+            # не должна оставлять блокировки взятыми.
+            _release_locks()
+            _last_flush = time.monotonic()
+
+
+def _commit(dirty: list[str]) -> None:
+    """Фиксирует группу изменений в журнале и применяет её к файлам."""
+    tables = {}
+    for name in dirty:
+        entry = _tables[name]
+        if entry["ops"] is None:
+            tables[name] = {"rows": list(entry["rows"])}
+        else:
+            tables[name] = {"ops": entry["ops"]}
+    metadata = _metadata["value"] if _metadata["dirty"] else None
+    drops = sorted(_dropped)
+    append(make_record(get_storage_engine().name, metadata, drops, tables))
+
+    applied = True
+    if metadata is not None:
+        applied = save_metadata(META_FILE, metadata) and applied
+        _metadata["stamp"] = file_stamp(META_FILE)
+        _metadata["dirty"] = False
+    for name in drops:
+        applied = delete_table_file(name) and applied
+    _dropped.clear()
+    for name in dirty:
+        entry = _tables[name]
+        applied = save_table_data(name, entry["rows"], entry["ops"]) and applied
+        entry["ops"] = []
+        entry["dirty"] = False
+        entry["stamp"] = _table_stamp(name)
+    if applied:
+        checkpoint()
+
+
+def maybe_flush() -> None:
+    """
+    Сбрасывает изменения, если нет транзакции и истёк интервал сброса.
+
+    Процесс с отложенным сбросом (пакетный режим) не держит блокировки
+    весь сценарий: если их ждёт другой процесс, а держатся они дольше
+    LOCK_HOLD_MAX, изменения сбрасываются и блокировки передаются.
+    """
+    if _transaction["active"]:
+        return
+    now = time.monotonic()
+    if now - _last_flush >= _flush_interval:
+        flush()
+    elif now - _locked_since >= LOCK_HOLD_MAX:
+        paths = [path for path in held_locks() if has_waiters(path)]
+        if paths:
+            flush()
+            _hand_over(paths)
+
+
+def _hand_over(paths: list[str]) -> None:
+    """
+    Ждёт, пока ожидающие процессы заберут отпущенные блокировки.
+
+    Иначе процесс взял бы их снова раньше, чем ожидающий повторит
+    попытку. Ожидание ограничено паузой LOCK_RETRY_MAX между попытками.
+    """
+    deadline = time.monotonic() + LOCK_RETRY_MAX
+    while time.monotonic() < deadline and any(map(has_waiters, paths)):
+        time.sleep(LOCK_RETRY_INITIAL)
+
+
+def in_transaction() -> bool:
+    """Проверяет, открыта ли явная транзакция."""
+    return _transaction["active"]
+
+
+def begin() -> None:
+    """
+    Открывает транзакцию.
+
+    Накопленные до неё изменения сначала сбрасываются, поэтому всё
+    «грязное» в пуле после begin относится только к транзакции.
+    """
+    flush()
+    _transaction["active"] = True
+
+
+def commit() -> None:
+    """Фиксирует транзакцию одним групповым сбросом всех таблиц."""
+    _transaction["active"] = False
+    flush()
+
+
+def rollback() -> None:
+    """
+    Отменяет транзакцию без обращения к диску.
+
+    Изменённые таблицы и метаданные просто выгружаются из пула: при
+    следующем обращении они перечитаются из файлов, где изменений нет.
+    """
+    for name in [name for name, entry in _tables.items() if entry["dirty"]]:
+        del _tables[name]
+    _dropped.clear()
+    if _metadata["dirty"]:
+        _metadata.update(value=None, stamp=None, dirty=False)
+    discard_indexes()
+    _transaction["active"] = False
+    _release_locks()
+
+
+def compact_table(table_name: str) -> None:
+    """Сохраняет таблицу целиком в снимок, включая несброшенные изменения."""
+    put_table(table_name, get_table(table_name))
+    flush(table_name)
+
+
+def drop_table_data(table_name: str) -> None:
+    """
+    Выгружает таблицу из пула; файлы удаляются при ближайшем сбросе
+    в одной группе с метаданными без этой таблицы.
+    """
+    _tables.pop(table_name, None)
+    _dropped.add(table_name)
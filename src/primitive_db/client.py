@@ -0,0 +1,141 @@
+import json
+import socket
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+from ..constants import CLIENT_POOL_SIZE, MSG_CONNECTION_CLOSED
+from .errors import CommandError
+
+Address = str | tuple[str, int]
+
+
+class Session:
+    """Одно соединение с сервером; команды выполняются по порядку."""
+
+    def __init__(self, address: Address, timeout: float | None = None):
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(address)
+        else:
+            self.socket = socket.create_connection(address, timeout)
+        self.file: BinaryIO = self.socket.makefile("rwb")
+        self.closed = False
+
+    def execute(self, command: str) -> dict:
+        """
+        Отправляет команду и возвращает ответ сервера.
+
+        Ответ содержит messages (строки, которые команда напечатала бы),
+        а для select — columns и rows. Ошибка команды — CommandError с
+        текстом ошибки, ошибка протокола — ValueError.
+        """
+        self.file.write(json.dumps({"command": command}).encode() + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            self.close()
+            raise ConnectionError(MSG_CONNECTION_CLOSED)
+        response = json.loads(line)
+        if response.get("closed"):
+            self.close()
+        if not response["ok"]:
+            if "messages" in response:
+                raise CommandError(response["error"])
+            raise ValueError(response["error"])
+        return response
+
+    def query(self, command: str) -> list[dict]:
+        """Выполняет select и возвращает найденные записи."""
+        return self.execute(command)["rows"] or []
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.file.close()
+            self.socket.close()
+
+
+class Client:
+    """
+    Клиент сервера базы (database serve) с пулом соединений.
+
+    address — путь к Unix-сокету или пара (host, port). Соединения
+    открываются по требованию и возвращаются в пул после запроса, так
+    что клиентом можно пользоваться из нескольких потоков.
+    """
+
+    def __init__(
+        self,
+        address: Address,
+        pool_size: int = CLIENT_POOL_SIZE,
+        timeout: float | None = None,
+    ):
+        self.address = address
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: list[Session] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> Session:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return Session(self.address, self.timeout)
+
+    def _release(self, session: Session) -> None:
+        if not session.closed:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(session)
+                    return
+            session.close()
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """Закрепляет за блоком одно соединение из пула."""
+        session = self._acquire()
+        try:
+            yield session
+        except CommandError:
+            raise
+        except (OSError, ValueError):
+            session.close()
+            raise
+        finally:
+            self._release(session)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Session]:
+        """Выполняет блок в транзакции на одном соединении."""
+        with self.session() as session:
+            session.execute("begin")
+            try:
+                yield session
+            except BaseException:
+                session.execute("rollback")
+                raise
+            session.execute("commit")
+
+    def execute(self, command: str) -> dict:
+        """Выполняет команду на свободном соединении из пула."""
+        with self.session() as session:
+            return session.execute(command)
+
+    def query(self, command: str) -> list[dict]:
+        """Выполняет select и возвращает найденные записи."""
+        return self.execute(command)["rows"] or []
+
+    def close(self) -> None:
+        """Закрывает все простаивающие соединения."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,433 @@
+from array import array
+from itertools import compress
+from typing import Iterable, Iterator
+
+from ..constants import TYPE_BOOL, TYPE_INT
+from .predicates import (
+    COMPARATORS,
+    NODE_AND,
+    NODE_BETWEEN,
+    NODE_CMP,
+    NODE_IN,
+    NODE_NOT,
+    NODE_OR,
+    RANGE_OPERATORS,
+)
+
+# "столбец op значение" через метод значения: value.__gt__(x) == (x < value).
+_REFLECTED = {
+    "=": "__eq__",
+    "!=": "__ne__",
+    "<>": "__ne__",
+    "<": "__gt__",
+    "<=": "__ge__",
+    ">": "__lt__",
+    ">=": "__le__",
+}
+# Байт битовой карты -> 8 байт 0/1, по одному на запись.
+_EXPAND = [bytes(byte >> bit & 1 for bit in range(8)) for byte in range(256)]
+
+
+class RowView(dict):
+    """
+    Запись колоночной таблицы в виде обычного словаря.
+
+    Изменения через row[column] = value и row.update(...) записываются
+    обратно в колонки, поэтому код, работающий со списком словарей,
+    не замечает разницы.
+    """
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table: "ColumnarTable", position: int):
+        super().__init__(table.row_values(position))
+        self._table = table
+        self._position = position
+
+    def __setitem__(self, column, value) -> None:
+        super().__setitem__(column, value)
+        self._table.set_value(self._position, column, value)
+
+    def update(self, *args, **kwargs) -> None:
+        for column, value in dict(*args, **kwargs).items():
+            self[column] = value
+
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _stored_matches(stored, op: str, value) -> bool:
+    """Сравнение, как в predicates: None не попадает в диапазоны."""
+    if stored is None and op in RANGE_OPERATORS:
+        return False
+    try:
+        return COMPARATORS[op](stored, value)
+    except TypeError:
+        return False
+
+
+def _stored_in(stored, values: frozenset) -> bool:
+    try:
+        return stored in values
+    except TypeError:
+        return False
+
+
+class _Column:
+    """
+    Общая часть колонок: значения, которые нельзя положить в
+    типизированный массив (None, целые вне int64, значения чужого типа),
+    хранятся в словаре extra по позициям, а в массиве на их месте стоит
+    заглушка — как битовые карты null и «широких» значений в binary.py.
+    Условия для таких позиций проверяются по самим значениям.
+    """
+
+    def __init__(self):
+        self.extra: dict[int, object] = {}
+
+    def get(self, position: int):
+        extra = self.extra
+        if extra and position in extra:
+            return extra[position]
+        return self.stored(position)
+
+    def set(self, position: int, value) -> None:
+        if self.fits(value):
+            self.extra.pop(position, None)
+            self.store(position, value)
+        else:
+            self.extra[position] = value
+            self.store(position, self.placeholder)
+
+    def truncate(self, length: int) -> None:
+        if self.extra:
+            self.extra = {
+                position: value
+                for position, value in self.extra.items()
+                if position < length
+            }
+
+    def patch(self, flags: bytes, check) -> bytes:
+        """Исправляет флаги позиций из extra по проверке check(значение)."""
+        if not self.extra:
+            return flags
+        patched = bytearray(flags)
+        for position, stored in self.extra.items():
+            patched[position] = check(stored)
+        return bytes(patched)
+
+    def patch_cmp(self, flags: bytes, op: str, value) -> bytes:
+        return self.patch(flags, lambda stored: _stored_matches(stored, op, value))
+
+    def patch_in(self, flags: bytes, values: tuple) -> bytes:
+        allowed = frozenset(values)
+        return self.patch(flags, lambda stored: _stored_in(stored, allowed))
+
+
+class _IntColumn(_Column):
+    """Целые числа в непрерывном массиве array('q')."""
+
+    placeholder = 0
+
+    def __init__(self):
+        super().__init__()
+        self.values = array("q")
+
+    @staticmethod
+    def fits(value) -> bool:
+        return type(value) is int and _INT64_MIN <= value <= _INT64_MAX
+
+    def append(self, value) -> None:
+        if not self.fits(value):
+            self.extra[len(self.values)] = value
+            value = self.placeholder
+        self.values.append(value)
+
+    def stored(self, position: int):
+        return self.values[position]
+
+    def store(self, position: int, value) -> None:
+        self.values[position] = value
+
+    def truncate(self, length: int) -> None:
+        super().truncate(length)
+        del self.values[length:]
+
+    def flags(self, op: str, value) -> bytes | None:
+        if not isinstance(value, int):
+            return None
+        flags = bytes(map(getattr(value, _REFLECTED[op]), self.values))
+        return self.patch_cmp(flags, op, value)
+
+    def flags_in(self, values: tuple) -> bytes:
+        flags = bytes(map(frozenset(values).__contains__, self.values))
+        return self.patch_in(flags, values)
+
+
+class _BoolColumn(_Column):
+    """Булевы значения в битовой карте: один бит на запись."""
+
+    placeholder = False
+
+    def __init__(self):
+        super().__init__()
+        self.bits = bytearray()
+        self.length = 0
+
+    @staticmethod
+    def fits(value) -> bool:
+        return type(value) is bool
+
+    def append(self, value) -> None:
+        if self.length % 8 == 0:
+            self.bits.append(0)
+        self.length += 1
+        self.set(self.length - 1, value)
+
+    def stored(self, position: int) -> bool:
+        return bool(self.bits[position >> 3] >> (position & 7) & 1)
+
+    def store(self, position: int, value) -> None:
+        mask = 1 << (position & 7)
+        if value:
+            self.bits[position >> 3] |= mask
+        else:
+            self.bits[position >> 3] &= ~mask & 0xFF
+
+    def truncate(self, length: int) -> None:
+        super().truncate(length)
+        for position in range(length, self.length):
+            self.store(position, False)
+        self.length = length
+        del self.bits[(length + 7) // 8 :]
+
+    def expanded(self) -> bytes:
+        """Разворачивает битовую карту в байт 0/1 на запись."""
+        return b"".join(map(_EXPAND.__getitem__, self.bits))[: self.length]
+
+    def flags(self, op: str, value) -> bytes | None:
+        if not isinstance(value, int):
+            return None
+        flags = bytes(map(getattr(int(value), _REFLECTED[op]), self.expanded()))
+        return self.patch_cmp(flags, op, value)
+
+    def flags_in(self, values: tuple) -> bytes:
+        allowed = frozenset(int(value) for value in values if value in (0, 1))
+        flags = bytes(map(allowed.__contains__, self.expanded()))
+        return self.patch_in(flags, values)
+
+
+class _StrColumn(_Column):
+    """Строки со словарным кодированием: коды в array('l') + словарь."""
+
+    placeholder = -1
+
+    def __init__(self):
+        super().__init__()
+        self.codes = array("l")
+        self.dictionary: list[str] = []
+        self.code_of: dict[str, int] = {}
+
+    @staticmethod
+    def fits(value) -> bool:
+        return type(value) is str
+
+    def encode(self, value) -> int:
+        if not self.fits(value):
+            return self.placeholder
+        code = self.code_of.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.code_of[value] = code
+        return code
+
+    def append(self, value) -> None:
+        if not self.fits(value):
+            self.extra[len(self.codes)] = value
+            self.codes.append(self.placeholder)
+            return
+        self.codes.append(self.encode(value))
+
+    def stored(self, position: int) -> str:
+        return self.dictionary[self.codes[position]]
+
+    def store(self, position: int, value) -> None:
+        self.codes[position] = self.encode(value)
+
+    def truncate(self, length: int) -> None:
+        super().truncate(length)
+        del self.codes[length:]
+
+    def _flags_for_codes(self, codes: Iterable[int]) -> bytes:
+        return bytes(map(frozenset(codes).__contains__, self.codes))
+
+    def flags(self, op: str, value) -> bytes | None:
+        """Условие проверяется по словарю один раз на значение, а не на запись."""
+        if not isinstance(value, str):
+            return None
+        if op == "=":
+            code = self.code_of.get(value)
+            if code is None:
+                flags = bytes(len(self.codes))
+            else:
+                flags = bytes(map(code.__eq__, self.codes))
+        else:
+            compare = COMPARATORS[op]
+            flags = self._flags_for_codes(
+                {
+                    code
+                    for code, current in enumerate(self.dictionary)
+                    if compare(current, value)
+                }
+            )
+        return self.patch_cmp(flags, op, value)
+
+    def flags_in(self, values: tuple) -> bytes:
+        flags = self._flags_for_codes(
+            {self.code_of[value] for value in values if value in self.code_of}
+        )
+        return self.patch_in(flags, values)
+
+
+_COLUMN_TYPES = {TYPE_INT: _IntColumn, TYPE_BOOL: _BoolColumn}
+
+
+def schema_from_info(table_info: list[str]) -> list[tuple[str, str]]:
+    """Разбирает описания "имя:тип" из table_info в пары (имя, тип)."""
+    schema = []
+    for column_def in table_info:
+        name_part, type_part = column_def.split(":")
+        schema.append((name_part.strip(), type_part.strip()))
+    return schema
+
+
+class ColumnarTable:
+    """
+    Таблица, хранящая каждый столбец в отдельном типизированном массиве.
+
+    Ведёт себя как список записей (len, индексация, итерация, append,
+    extend, del по срезу), но словари создаются только при обращении.
+    Фильтры по столбцам вычисляются целыми колонками в filter_positions.
+    """
+
+    def __init__(self, schema: list[tuple[str, str]]):
+        self.schema = schema
+        self.columns = {
+            name: _COLUMN_TYPES.get(column_type, _StrColumn)()
+            for name, column_type in schema
+        }
+        self.length = 0
+
+    @classmethod
+    def from_rows(
+        cls,
+        schema: list[tuple[str, str]],
+        rows: Iterable[dict],
+    ) -> "ColumnarTable":
+        table = cls(schema)
+        table.extend(rows)
+        return table
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, position: int) -> RowView:
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError(position)
+        return RowView(self, position)
+
+    def __iter__(self) -> Iterator[RowView]:
+        for position in range(self.length):
+            yield RowView(self, position)
+
+    def __delitem__(self, key: slice) -> None:
+        start, stop, step = key.indices(self.length)
+        if stop != self.length or step != 1:
+            raise TypeError("ColumnarTable supports only tail truncation")
+        for column in self.columns.values():
+            column.truncate(start)
+        self.length = start
+
+    def row_values(self, position: int) -> dict:
+        return {name: column.get(position) for name, column in self.columns.items()}
+
+    def set_value(self, position: int, column: str, value) -> None:
+        self.columns[column].set(position, value)
+
+    def append(self, record: dict) -> None:
+        for name, column in self.columns.items():
+            column.append(record.get(name))
+        self.length += 1
+
+    def extend(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.append(record)
+
+    def column_values(
+        self,
+        column: str,
+        positions: Iterable[int] | None = None,
+    ) -> list:
+        """Значения столбца (для позиций positions или всех записей)."""
+        stored = self.columns[column]
+        if positions is None:
+            if isinstance(stored, _IntColumn) and not stored.extra:
+                return list(stored.values)
+            positions = range(self.length)
+        return list(map(stored.get, positions))
+
+    def to_rows(self) -> list[dict]:
+        """Материализует все записи в обычные словари (для сохранения)."""
+        return [self.row_values(position) for position in range(self.length)]
+
+    def _mask(self, tree: tuple) -> int | None:
+        """
+        Вычисляет маску условия: целое число, где байт i равен 1 для
+        подходящей записи. Сравнения выполняются через map по массиву
+        столбца, логические связки — побитовыми операциями над целыми.
+        None — узел не поддерживается или тип значения не совпадает
+        с типом столбца (тогда условие проверяется по записям).
+        """
+        kind = tree[0]
+        if kind in (NODE_AND, NODE_OR):
+            masks = [self._mask(child) for child in tree[1:]]
+            if any(mask is None for mask in masks):
+                return None
+            result = masks[0]
+            for mask in masks[1:]:
+                result = result & mask if kind == NODE_AND else result | mask
+            return result
+        if kind == NODE_NOT:
+            mask = self._mask(tree[1])
+            if mask is None:
+                return None
+            return mask ^ int.from_bytes(b"\x01" * self.length, "little")
+
+        column = self.columns.get(tree[1])
+        if column is None:
+            return None
+        if kind == NODE_CMP:
+            flags = column.flags(tree[2], tree[3])
+        elif kind == NODE_IN:
+            flags = column.flags_in(tree[2])
+        elif kind == NODE_BETWEEN:
+            low = column.flags(">=", tree[2])
+            high = column.flags("<=", tree[3])
+            if low is None or high is None:
+                return None
+            return int.from_bytes(low, "little") & int.from_bytes(high, "little")
+        else:
+            return None
+        return None if flags is None else int.from_bytes(flags, "little")
+
+    def filter_positions(self, tree: tuple) -> list[int] | None:
+        """Возвращает позиции записей, подходящих под условие, или None."""
+        mask = self._mask(tree)
+        if mask is None:
+            return None
+        flags = mask.to_bytes(self.length, "little")
+        return list(compress(range(self.length), flags))
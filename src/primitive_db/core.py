@@ -1,325 +1,873 @@
-from typing import Any, Callable, Hashable
+import sys
+from collections import OrderedDict
+from itertools import islice
+from types import MappingProxyType
+from typing import Any, Callable, Hashable, Iterator, Mapping, NamedTuple
 
 from ..constants import (
     AVAILABLE_TYPES,
     BOOL_FALSE_LITERALS,
     BOOL_INT_VALUES,
     BOOL_TRUE_LITERALS,
+    CACHE_MAX_BYTES,
+    CACHE_MAX_ENTRIES,
     ID_FIELD,
     ID_NAME,
     ID_TYPE,
+    INDEX_HASH,
+    INDEX_KINDS,
     MSG_BAD_COLUMN,
     MSG_BAD_TYPE,
     MSG_ID_UPDATE_FORBIDDEN,
+    MSG_INDEX_EXISTS,
+    MSG_INDEX_NOT_EXISTS,
+    MSG_INVALID_VALUE,
     MSG_NO_COLUMNS,
-    MSG_NO_TABLES,
-    MSG_RECORD_DELETED,
-    MSG_RECORD_INSERTED,
-    MSG_RECORD_UPDATED,
-    MSG_RECORDS_NO_MATCH,
-    MSG_TABLE_COLUMNS,
-    MSG_TABLE_COUNT,
-    MSG_TABLE_CREATED,
-    MSG_TABLE_DROPPED,
     MSG_TABLE_EXISTS,
-    MSG_TABLE_INFO,
     MSG_TABLE_NOT_EXISTS,
-    MSG_TABLES_PREFIX,
     MSG_TYPE_REPLACED,
+    MSG_UNKNOWN_COLUMN,
     MSG_VALUES_MISMATCH,
-    PROMPT_CONFIRM_DELETE,
-    PROMPT_CONFIRM_DROP,
+    OP_DELETE,
+    OP_INSERT,
+    OP_UPDATE,
+    PLAN_ALL,
+    PLAN_COLUMNAR,
+    PLAN_INDEX,
+    PLAN_PARALLEL,
+    PLAN_PK,
+    PLAN_SCAN,
+    PLAN_SEGMENTS,
+    SELECT_CACHE_MAX_ROWS,
+    TABLE_INDEXES_KEY,
     TABLE_INFO_KEY,
+    TABLE_SEQUENCE_KEY,
     TYPE_BOOL,
     TYPE_INT,
 )
-from ..decorators import confirm_action, handle_db_errors, log_time
-from .utils import load_table_data
-
-
-def create_cacher() -> Callable[[Hashable, Callable[[], Any]], Any]:
-    """Создаёт кэшер с поддержкой сброса по имени таблицы."""
-    cache: dict[Hashable, Any] = {}
-
-    def cache_result(key: Hashable, value_func: Callable[[], Any]) -> Any:
-        if key not in cache:
-            cache[key] = value_func()
-        return cache[key]
-
-    def clear(table_name: str | None = None) -> None:
-        if table_name is None:
-            cache.clear()
+from .binary import BinaryTable
+from .buffer_pool import add_reload_listener, get_table
+from .columnar import ColumnarTable
+from .errors import (
+    ColumnNotFoundError,
+    ConversionError,
+    IndexDefinitionError,
+    SchemaError,
+    TableExistsError,
+    TableNotFoundError,
+)
+from .indexes import (
+    get_index,
+    get_pk_map,
+    lookup,
+    range_lookup,
+    rows_by_ids,
+    table_indexes,
+)
+from .metrics import count as count_metric
+from .metrics import phase, timed_iter
+from .predicates import (
+    NODE_BETWEEN,
+    NODE_CMP,
+    NODE_IN,
+    Condition,
+    as_condition,
+    key_range,
+    plan_ids,
+)
+from .scan import parallel_positions, use_parallel
+from .segments import SegmentedTable
+
+
+def _estimate_size(value: Any) -> int:
+    """Грубо оценивает объём результата в байтах."""
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        for item in value:
+            size += sys.getsizeof(item)
+            if isinstance(item, dict):
+                size += sum(sys.getsizeof(field) for field in item.values())
+    return size
+
+
+def create_cacher(
+    max_entries: int = CACHE_MAX_ENTRIES,
+    max_bytes: int = CACHE_MAX_BYTES,
+) -> Callable[..., Any]:
+    """
+    Создаёт LRU-кэш результатов с ограничением по числу записей и объёму.
+
+    Ключ — кортеж, первым элементом которого идёт имя таблицы. Вместе с
+    результатом можно сохранить matcher(record) -> bool: тогда изменение
+    строки сбрасывает только те результаты, условию которых она подходит.
+    """
+    cache: OrderedDict[Hashable, tuple[Any, Callable | None, int]] = OrderedDict()
+    counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    total_bytes = 0
+
+    def drop(key: Hashable) -> None:
+        nonlocal total_bytes
+        _, _, size = cache.pop(key)
+        total_bytes -= size
+
+    def peek(key: Hashable) -> Any | None:
+        """Возвращает сохранённый результат или None, учитывая попадание."""
+        entry = cache.get(key)
+        if entry is None:
+            counters["misses"] += 1
+            return None
+        cache.move_to_end(key)
+        counters["hits"] += 1
+        return entry[0]
+
+    def store(
+        key: Hashable,
+        value: Any,
+        matcher: Callable[[dict], bool] | None = None,
+    ) -> None:
+        nonlocal total_bytes
+        size = _estimate_size(value)
+        if size > max_bytes:
             return
-        matching_keys = [
+
+        if key in cache:
+            drop(key)
+        cache[key] = (value, matcher, size)
+        total_bytes += size
+        while len(cache) > max_entries or total_bytes > max_bytes:
+            drop(next(iter(cache)))
+            counters["evictions"] += 1
+
+    def cache_result(
+        key: Hashable,
+        value_func: Callable[[], Any],
+        matcher: Callable[[dict], bool] | None = None,
+    ) -> Any:
+        value = peek(key)
+        if value is None:
+            value = value_func()
+            store(key, value, matcher)
+        return value
+
+    def table_keys(table_name: str) -> list[Hashable]:
+        return [
             key
             for key in cache
             if isinstance(key, tuple) and key and key[0] == table_name
         ]
-        for cache_key in matching_keys:
-            cache.pop(cache_key, None)
 
+    def clear(table_name: str | None = None) -> None:
+        nonlocal total_bytes
+        if table_name is None:
+            cache.clear()
+            total_bytes = 0
+            return
+        for cache_key in table_keys(table_name):
+            drop(cache_key)
+
+    def invalidate(table_name: str, records: list[dict]) -> None:
+        """Сбрасывает результаты, которые могли измениться из-за записей."""
+        for cache_key in table_keys(table_name):
+            matcher = cache[cache_key][1]
+            if matcher is None or any(matcher(record) for record in records):
+                drop(cache_key)
+                counters["invalidations"] += 1
+
+    def stats() -> dict[str, int]:
+        return {
+            **counters,
+            "entries": len(cache),
+            "bytes": total_bytes,
+            "max_entries": max_entries,
+            "max_bytes": max_bytes,
+        }
+
+    cache_result.peek = peek  # type: ignore[attr-defined]
+    cache_result.store = store  # type: ignore[attr-defined]
     cache_result.clear = clear  # type: ignore[attr-defined]
+    cache_result.invalidate = invalidate  # type: ignore[attr-defined]
+    cache_result.stats = stats  # type: ignore[attr-defined]
     return cache_result
 
 
 _select_cache = create_cacher()
+add_reload_listener(_select_cache.clear)  # type: ignore[attr-defined]
+
+
+class TableInfo(NamedTuple):
+    """Схема таблицы и количество записей."""
+
+    name: str
+    columns: list[str]
+    count: int
+
+
+def _require_table(metadata: dict, table_name: str) -> dict:
+    """Возвращает метаданные таблицы или выбрасывает TableNotFoundError."""
+    if table_name not in metadata:
+        raise TableNotFoundError(MSG_TABLE_NOT_EXISTS.format(name=table_name))
+    return metadata[table_name]
+
+
+class Schema(NamedTuple):
+    """
+    Схема таблицы, разобранная из table_info один раз.
+
+    types, positions и converters — неизменяемые отображения по имени
+    столбца; values — столбцы без ID в порядке значений insert.
+    """
+
+    table: str
+    info: tuple[str, ...]
+    columns: tuple[str, ...]
+    values: tuple[str, ...]
+    types: Mapping[str, str]
+    positions: Mapping[str, int]
+    converters: Mapping[str, Callable[[Any], Any]]
+
+
+# Скомпилированные схемы по имени таблицы. Схема используется, пока
+# table_info совпадает с тем, из которого она собрана (метаданные могли
+# перечитаться с диска или откатиться транзакцией); create_table и
+# drop_table сбрасывают её явно.
+_schemas: dict[str, Schema] = {}
 
 
-@handle_db_errors()
-def create_table(metadata, table_name, columns: list[str]) -> dict:
-    """Добавляет описание новой таблицы в метаданные."""
+def _compile_schema(table_name: str, table_info: list[str]) -> Schema:
+    types = {}
+    for column_def in table_info:
+        name_part, type_part = column_def.split(":")
+        types[name_part.strip()] = type_part.strip()
+    return Schema(
+        table_name,
+        tuple(table_info),
+        tuple(types),
+        tuple(name for name in types if name != ID_NAME),
+        MappingProxyType(types),
+        MappingProxyType({name: index for index, name in enumerate(types)}),
+        MappingProxyType(
+            {
+                name: _CONVERTERS.get(column_type, _to_str)
+                for name, column_type in types.items()
+            }
+        ),
+    )
+
+
+def get_schema(metadata: dict, table_name: str) -> Schema:
+    """Возвращает скомпилированную схему таблицы (из кэша, если она не менялась)."""
+    table_info = _require_table(metadata, table_name)[TABLE_INFO_KEY]
+    schema = _schemas.get(table_name)
+    if schema is None or schema.info != tuple(table_info):
+        schema = _schemas[table_name] = _compile_schema(table_name, table_info)
+    return schema
+
+
+def type_map(metadata: dict, table_name: str) -> Mapping[str, str]:
+    """Возвращает типы столбцов таблицы: имя -> тип (только для чтения)."""
+    return get_schema(metadata, table_name).types
+
+
+def create_table(
+    metadata,
+    table_name,
+    columns: list[str],
+    notices: list[str] | None = None,
+) -> dict:
+    """
+    Добавляет описание новой таблицы в метаданные.
+
+    Если передан список notices, в него дописываются предупреждения
+    (например, о замене типа столбца ID).
+    """
     if table_name in metadata:
-        raise ValueError(MSG_TABLE_EXISTS.format(name=table_name))
+        raise TableExistsError(MSG_TABLE_EXISTS.format(name=table_name))
 
     if not columns:
-        raise ValueError(MSG_NO_COLUMNS)
+        raise SchemaError(MSG_NO_COLUMNS)
 
     parsed_columns = []
-    has_id = False
 
     for column in columns:
         column_str = column.strip()
         if ":" not in column_str:
-            raise ValueError(MSG_BAD_COLUMN.format(column=column))
+            raise SchemaError(MSG_BAD_COLUMN.format(column=column))
         column_name, column_type = [
             part.strip() for part in column_str.split(":", 1)
         ]
         if not column_name or not column_type:
-            raise ValueError(MSG_BAD_COLUMN.format(column=column))
+            raise SchemaError(MSG_BAD_COLUMN.format(column=column))
 
         if column_name.lower() == ID_NAME.lower():
-            has_id = True
-            column_name = ID_NAME
-            if column_type.lower() != ID_TYPE:
-                print(
+            if column_type.lower() != ID_TYPE and notices is not None:
+                notices.append(
                     MSG_TYPE_REPLACED.format(
                         id_name=ID_NAME,
                         id_type=ID_TYPE,
                         column_type=column_type,
                     )
                 )
-            column_type = ID_TYPE
+            # ID всегда идёт первым столбцом: insert опирается на это.
+            continue
 
         if column_type not in AVAILABLE_TYPES:
-            raise ValueError(MSG_BAD_TYPE.format(value=column_type))
+            raise SchemaError(MSG_BAD_TYPE.format(value=column_type))
         parsed_columns.append(f"{column_name}:{column_type}")
 
-    if not has_id:
-        parsed_columns.insert(0, ID_FIELD)
+    parsed_columns.insert(0, ID_FIELD)
 
-    metadata[table_name] = {TABLE_INFO_KEY: parsed_columns}
-    columns_repr = ", ".join(parsed_columns)
-    print(MSG_TABLE_CREATED.format(name=table_name, columns=columns_repr))
+    metadata[table_name] = {
+        TABLE_INFO_KEY: parsed_columns,
+        TABLE_SEQUENCE_KEY: 1,
+    }
+    _schemas.pop(table_name, None)
     return metadata
 
 
-@confirm_action(PROMPT_CONFIRM_DROP)
-@handle_db_errors()
 def drop_table(metadata, table_name) -> dict:
     """Удаляет описание таблицы из метаданных."""
-    if table_name not in metadata:
-        raise ValueError(MSG_TABLE_NOT_EXISTS.format(name=table_name))
-
+    _require_table(metadata, table_name)
     del metadata[table_name]
+    _schemas.pop(table_name, None)
     _select_cache.clear(table_name)
-    print(MSG_TABLE_DROPPED.format(name=table_name))
     return metadata
 
 
-def list_tables(metadata) -> None:
-    """Выводит список известных таблиц."""
-    if not metadata:
-        print(MSG_NO_TABLES)
-        return
+def create_index(metadata, table_name, column, kind=INDEX_HASH) -> dict:
+    """Регистрирует индекс по столбцу в метаданных таблицы."""
+    table_meta = _require_table(metadata, table_name)
+    if kind not in INDEX_KINDS:
+        raise IndexDefinitionError(MSG_INVALID_VALUE.format(value=kind))
+    if column not in type_map(metadata, table_name):
+        raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
 
-    for table_name in metadata:
-        print(MSG_TABLES_PREFIX.format(name=table_name))
+    indexes = table_meta.setdefault(TABLE_INDEXES_KEY, {})
+    if column in indexes:
+        raise IndexDefinitionError(MSG_INDEX_EXISTS.format(column=column))
 
+    indexes[column] = kind
+    return metadata
 
-def convert_value(value, column_type: str):
-    """Преобразует строковое значение к типу столбца."""
+
+def drop_index(metadata, table_name, column) -> dict:
+    """Убирает индекс по столбцу из метаданных таблицы."""
+    table_meta = _require_table(metadata, table_name)
+    indexes = table_meta.get(TABLE_INDEXES_KEY, {})
+    if column not in indexes:
+        raise IndexDefinitionError(MSG_INDEX_NOT_EXISTS.format(column=column))
+
+    del indexes[column]
+    if not indexes:
+        table_meta.pop(TABLE_INDEXES_KEY, None)
+    return metadata
+
+
+def clear_cache(table_name: str | None = None) -> None:
+    """Сбрасывает кэш select для таблицы или целиком."""
+    _select_cache.clear(table_name)  # type: ignore[attr-defined]
+
+
+def cache_stats() -> dict[str, int]:
+    """Возвращает счётчики кэша результатов select."""
+    return _select_cache.stats()  # type: ignore[attr-defined]
+
+
+def list_tables(metadata) -> list[str]:
+    """Возвращает имена известных таблиц."""
+    return list(metadata)
+
+
+def _unquote(value):
+    """Снимает пробелы и парные кавычки со строкового значения."""
     if isinstance(value, str):
         value = value.strip()
         if len(value) >= 2 and value[0] == value[-1] and value[0] in {'"', "'"}:
             value = value[1:-1]
+    return value
 
+
+def _to_int(value) -> int:
+    value = _unquote(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ConversionError(MSG_BAD_TYPE.format(value=value))
+
+
+def _to_bool(value) -> bool:
+    value = _unquote(value)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered in BOOL_TRUE_LITERALS:
+            return True
+        if lowered in BOOL_FALSE_LITERALS:
+            return False
+    if isinstance(value, int) and value in BOOL_INT_VALUES:
+        return bool(value)
+    raise ConversionError(MSG_BAD_TYPE.format(value=value))
+
+
+def _to_str(value) -> str:
+    return str(_unquote(value))
+
+
+# Преобразователь значения для каждого типа; схема выбирает его один раз.
+_CONVERTERS: dict[str, Callable[[Any], Any]] = {
+    TYPE_INT: _to_int,
+    TYPE_BOOL: _to_bool,
+}
+
+
+def convert_value(value, column_type: str):
+    """Преобразует строковое значение к типу столбца."""
+    return _CONVERTERS.get(column_type, _to_str)(value)
+
+
+_BOOL_LITERALS = {
+    **dict.fromkeys(BOOL_TRUE_LITERALS, True),
+    **dict.fromkeys(BOOL_FALSE_LITERALS, False),
+}
+
+
+def convert_column(values: list, column_type: str) -> list:
+    """
+    Приводит значения одного столбца к типу column_type.
+
+    Целые, булевы литералы и строки без кавычек разбираются одним
+    проходом; если в столбце есть значение, требующее разбора, весь
+    столбец проходит через преобразователь типа, который и сообщает
+    об ошибке.
+    """
     if column_type == TYPE_INT:
         try:
-            return int(value)
+            return list(map(int, values))
         except (TypeError, ValueError):
-            raise ValueError(MSG_BAD_TYPE.format(value=value))
-    if column_type == TYPE_BOOL:
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, str):
-            lowered = value.lower()
-            if lowered in BOOL_TRUE_LITERALS:
-                return True
-            if lowered in BOOL_FALSE_LITERALS:
-                return False
-        if isinstance(value, int) and value in BOOL_INT_VALUES:
-            return bool(value)
-        raise ValueError(MSG_BAD_TYPE.format(value=value))
-    return str(value)
-
-@handle_db_errors()
-@log_time
-def insert(metadata, table_name, values, table_data=None):
-    """Добавляет новую запись и возвращает обновлённые данные таблицы."""
-    if table_name not in metadata:
-        raise ValueError(MSG_TABLE_NOT_EXISTS.format(name=table_name))
-
-    table_info = metadata[table_name][TABLE_INFO_KEY]
-    data_without_id = table_info[1:]
-    if len(values) != len(data_without_id):
-        raise ValueError(MSG_VALUES_MISMATCH)
+            pass
+    elif all(type(value) is str for value in values):
+        stripped = list(map(str.strip, values))
+        if column_type == TYPE_BOOL:
+            converted = [_BOOL_LITERALS.get(value.lower()) for value in stripped]
+            if None not in converted:
+                return converted
+        elif not any(value.startswith(('"', "'")) for value in stripped):
+            return stripped
+    return list(map(_CONVERTERS.get(column_type, _to_str), values))
+
+
+def allocate_ids(table_meta: dict, table_data: list[dict], count: int = 1) -> int:
+    """
+    Выделяет count подряд идущих ID из счётчика в метаданных таблицы.
+
+    Возвращает первый ID диапазона. Для таблиц, созданных до появления
+    счётчика, он один раз инициализируется максимальным существующим ID.
+    """
+    first_id = table_meta.get(TABLE_SEQUENCE_KEY)
+    if first_id is None:
+        existing_ids = [
+            row.get(ID_NAME)
+            for row in table_data
+            if isinstance(row, dict) and isinstance(row.get(ID_NAME), int)
+        ]
+        first_id = max(existing_ids, default=0) + 1
+    table_meta[TABLE_SEQUENCE_KEY] = first_id + count
+    return first_id
+
+
+def insert(metadata, table_name, values, table_data=None, ops=None) -> int:
+    """
+    Добавляет новую запись в table_data и возвращает её ID.
+
+    Значения перечисляются в порядке столбцов без ID. Если передан
+    список ops, в него дописывается операция вставки.
+    """
+    return insert_many(metadata, table_name, [values], table_data, ops)[0]
+
+
+def insert_many(
+    metadata,
+    table_name,
+    rows,
+    table_data=None,
+    ops=None,
+) -> list[int]:
+    """
+    Добавляет записи в table_data и возвращает их ID.
+
+    Каждая запись — значения в порядке столбцов без ID. Схема
+    разбирается один раз, значения приводятся к типам по столбцам,
+    а ID выделяются одним непрерывным диапазоном. Все значения
+    проверяются до изменения таблицы, поэтому ошибка в любой записи
+    не оставляет вставку выполненной наполовину.
+    """
+    schema = get_schema(metadata, table_name)
+    columns = schema.values
+    rows = list(rows)
+    if not rows or any(len(values) != len(columns) for values in rows):
+        raise SchemaError(MSG_VALUES_MISMATCH)
 
     if table_data is None:
         table_data = []
 
-    existing_ids = [
-        row.get(ID_NAME)
-        for row in table_data
-        if isinstance(row, dict) and isinstance(row.get(ID_NAME), int)
-    ]
-    new_id = max(existing_ids, default=0) + 1
-
-    record = {ID_NAME: new_id}
-    for col_def, raw_value in zip(data_without_id, values):
-        name_part, type_part = col_def.split(":")
-        col_name = name_part.strip()
-        col_type = type_part.strip()
-        record[col_name] = convert_value(raw_value, col_type)
-
-    table_data.append(record)
-    print(
-        MSG_RECORD_INSERTED.format(
-            id_name=ID_NAME,
-            record_id=new_id,
-            table=table_name,
-        )
+    with phase("convert"):
+        converted = [
+            convert_column(list(column_values), schema.types[column])
+            for column, column_values in zip(columns, zip(*rows))
+        ]
+
+    first_id = allocate_ids(metadata[table_name], table_data, len(rows))
+    ids = list(range(first_id, first_id + len(rows)))
+    names = [ID_NAME, *columns]
+    records = [dict(zip(names, values)) for values in zip(ids, *converted)]
+
+    table_data.extend(records)
+    if ops is not None:
+        ops.extend({"op": OP_INSERT, "row": record} for record in records)
+    _select_cache.invalidate(table_name, records)
+    return ids
+
+
+def _leaf_ids(
+    table_name: str,
+    table_data: list[dict],
+    indexes: dict[str, str],
+    used: list[str],
+) -> Callable[[tuple], set | None]:
+    """
+    Возвращает функцию, отвечающую на сравнение через PK или индекс.
+
+    Столбцы, по которым удалось ответить, дописываются в used.
+    """
+
+    def leaf_ids(node: tuple) -> set | None:
+        ids = _lookup_leaf(node)
+        if ids is not None:
+            used.append(node[1])
+        return ids
+
+    def _lookup_leaf(node: tuple) -> set | None:
+        kind, column = node[0], node[1]
+        if column == ID_NAME:
+            if kind == NODE_CMP and node[2] == "=":
+                return {node[3]}
+            if kind == NODE_IN:
+                return set(node[2])
+            return None
+
+        index_kind = indexes.get(column)
+        if index_kind is None:
+            return None
+        index = get_index(table_name, column, index_kind, table_data)
+
+        if kind == NODE_IN:
+            return {
+                record_id for value in node[2] for record_id in lookup(index, value)
+            }
+        if kind == NODE_BETWEEN:
+            ids = range_lookup(index, node[2], node[3])
+        elif node[2] == "=":
+            ids = lookup(index, node[3])
+        elif node[2] in ("<", "<="):
+            ids = range_lookup(index, high=node[3], include_high=node[2] == "<=")
+        elif node[2] in (">", ">="):
+            ids = range_lookup(index, low=node[3], include_low=node[2] == ">=")
+        else:
+            ids = None
+        return None if ids is None else set(ids)
+
+    return leaf_ids
+
+
+class QueryPlan(NamedTuple):
+    """План выборки: способ доступа, задействованные столбцы, кандидаты."""
+
+    table: str
+    rows: int
+    access: str
+    columns: list[str]
+    candidates: int | None
+    cached: bool
+
+
+def _plan(
+    table_name: str,
+    table_data: list[dict],
+    condition: Condition | None,
+    indexes: dict[str, str] | None,
+) -> tuple[str, list[str], set | None]:
+    """Выбирает способ доступа и, если возможно, множество ID кандидатов."""
+    if condition is None:
+        return PLAN_ALL, [], None
+    used: list[str] = []
+    leaf_ids = _leaf_ids(table_name, table_data, indexes or {}, used)
+    ids = plan_ids(condition.tree, leaf_ids)
+    if ids is not None:
+        columns = list(dict.fromkeys(used))
+        access = PLAN_PK if columns == [ID_NAME] else PLAN_INDEX
+        return access, columns, ids
+    if isinstance(table_data, SegmentedTable) and key_range(condition.tree, ID_NAME):
+        return PLAN_SEGMENTS, [ID_NAME], None
+    if isinstance(table_data, ColumnarTable):
+        return PLAN_COLUMNAR, [], None
+    if use_parallel(len(table_data)):
+        return PLAN_PARALLEL, [], None
+    return PLAN_SCAN, [], None
+
+
+def explain(
+    table_name: str,
+    where_clause=None,
+    indexes: dict[str, str] | None = None,
+) -> QueryPlan:
+    """
+    Строит план select без просмотра записей.
+
+    Индексы при этом читаются (или строятся, если их ещё нет): план
+    показывает, сколько кандидатов останется для проверки условия.
+    """
+    condition = as_condition(where_clause)
+    table_data = get_table(table_name) or []
+    cache_key = (table_name, condition.tree if condition else None)
+    access, columns, ids = _plan(table_name, table_data, condition, indexes)
+    candidates = None if ids is None else len(ids)
+    if access == PLAN_SEGMENTS:
+        candidates = table_data.count_in_range(*key_range(condition.tree, ID_NAME))
+    return QueryPlan(
+        table_name,
+        len(table_data),
+        access,
+        columns,
+        candidates,
+        _select_cache.peek(cache_key) is not None,  # type: ignore[attr-defined]
     )
-    _select_cache.clear(table_name)
-    return table_data
 
 
-@handle_db_errors(list)
-@log_time
-def select(table_name: str, where_clause: dict | None = None) -> list[dict]:
-    """Возвращает записи таблицы с учётом условий фильтра."""
-    cache_key: Hashable
-    if not where_clause:
-        cache_key = (table_name, None)
-    else:
-        cache_key = (table_name, tuple(sorted(where_clause.items())))
+def iter_matches(
+    table_name: str,
+    table_data: list[dict],
+    where_clause,
+    indexes: dict[str, str] | None = None,
+) -> Iterator[dict]:
+    """
+    Лениво перебирает записи, удовлетворяющие условию.
+
+    Условие компилируется один раз. Сравнения по ID разрешаются через
+    карту первичного ключа (в двоичной таблице — бинарным поиском по
+    столбцу ID, в сегментированной — чтением только нужных сегментов),
+    равенства и диапазоны по индексированным столбцам — через индексы;
+    скомпилированная проверка применяется только к найденным
+    кандидатам. Диапазон ID в сегментированной таблице просматривает
+    только пересекающие его сегменты. Колоночная таблица без подходящего
+    индекса фильтруется целыми столбцами, а большая таблица в остальных
+    случаях просматривается частями в пуле процессов (scan.py).
+    """
+    condition = as_condition(where_clause)
+    access, columns, ids = _plan(table_name, table_data, condition, indexes)
+    count_metric(f"plan.{access}")
+    for column in columns:
+        count_metric(f"index.{column}")
+    if condition is None:
+        return iter(table_data)
+
+    candidates = table_data
+    if isinstance(table_data, (BinaryTable, SegmentedTable)) and ids is not None:
+        candidates = table_data.rows_by_ids(ids)
+    elif access == PLAN_SEGMENTS:
+        low, high = key_range(condition.tree, ID_NAME)
+        candidates = table_data.rows_in_range(low, high)
+    elif ids is not None:
+        pk_map = get_pk_map(table_name, table_data)
+        candidates = rows_by_ids(table_data, pk_map, ids)
+    elif access == PLAN_COLUMNAR:
+        positions = table_data.filter_positions(condition.tree)
+        if positions is not None:
+            return timed_iter("filter", map(table_data.__getitem__, positions))
+    elif access == PLAN_PARALLEL:
+        with phase("filter"):
+            positions = parallel_positions(table_data, condition.tree)
+        if positions is not None:
+            return map(table_data.__getitem__, positions)
+
+    return timed_iter("filter", filter(condition.matches, candidates))
+
+
+def find_matches(
+    table_name: str,
+    table_data: list[dict],
+    where_clause,
+    indexes: dict[str, str] | None = None,
+) -> list[dict]:
+    """Возвращает список записей, удовлетворяющих условию."""
+    return list(iter_matches(table_name, table_data, where_clause, indexes))
+
+
+def select(
+    table_name: str,
+    where_clause=None,
+    indexes: dict[str, str] | None = None,
+) -> list[dict]:
+    """Возвращает копии записей таблицы с учётом условий фильтра."""
+    condition = as_condition(where_clause)
+    cache_key: Hashable = (table_name, condition.tree if condition else None)
+
+    # Таблица запрашивается до кэша: если её изменил другой процесс,
+    # пул перечитает файл и сбросит устаревшие результаты.
+    table_data = get_table(table_name) or []
 
     def compute() -> list[dict]:
-        table_data = load_table_data(table_name) or []
-        if not where_clause:
-            return [dict(record) for record in table_data]
-        filtered = []
-        for record in table_data:
-            if all(record.get(key) == value for key, value in where_clause.items()):
-                filtered.append(dict(record))
-        return filtered
-
-    return _select_cache(cache_key, compute)
-
-
-@handle_db_errors()
-def update(metadata, table_name, table_data, set_values, where_clause=None):
-    """Изменяет записи таблицы согласно условию."""
-    if table_name not in metadata:
-        raise ValueError(MSG_TABLE_NOT_EXISTS.format(name=table_name))
+        matched = iter_matches(table_name, table_data, condition, indexes)
+        return [dict(record) for record in matched]
+
+    matcher = condition.matches if condition else None
+    # Кэш хранит свои копии: изменение возвращённых записей его не портит.
+    return [dict(row) for row in _select_cache(cache_key, compute, matcher)]
+
+
+def iter_select(
+    table_name: str,
+    where_clause=None,
+    indexes: dict[str, str] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> Iterator[dict]:
+    """
+    Отдаёт записи select по одной, не собирая результат целиком.
+
+    Готовый результат берётся из кэша. Иначе записи копируются по мере
+    выдачи; полностью прочитанный результат не длиннее
+    SELECT_CACHE_MAX_ROWS записей попадает в кэш. Вызывающий код всегда
+    получает собственные копии: ни строки пула, ни записи кэша наружу
+    не отдаются.
+    """
+    condition = as_condition(where_clause)
+    cache_key: Hashable = (table_name, condition.tree if condition else None)
+    stop = None if limit is None else offset + limit
+
+    table_data = get_table(table_name) or []
+    cached = _select_cache.peek(cache_key)  # type: ignore[attr-defined]
+    if cached is not None:
+        count_metric("cache.hit")
+        for row in islice(cached, offset, stop):
+            yield dict(row)
+        return
+    count_metric("cache.miss")
 
-    schema = metadata[table_name][TABLE_INFO_KEY]
-    type_map = {}
-    for column_def in schema:
-        name_part, type_part = column_def.split(":")
-        type_map[name_part.strip()] = type_part.strip()
+    matched = iter_matches(table_name, table_data, condition, indexes)
+    if limit is not None or offset:
+        for record in islice(matched, offset, stop):
+            yield dict(record)
+        return
 
+    collected: list[dict] | None = []
+    for record in matched:
+        row = dict(record)
+        if collected is not None:
+            collected.append(dict(record))
+            if len(collected) > SELECT_CACHE_MAX_ROWS:
+                collected = None
+        yield row
+    if collected is not None:
+        matcher = condition.matches if condition else None
+        _select_cache.store(cache_key, collected, matcher)  # type: ignore[attr-defined]
+
+
+def update(
+    metadata,
+    table_name,
+    table_data,
+    set_values,
+    where_clause=None,
+    ops=None,
+) -> list[int]:
+    """
+    Изменяет подходящие под условие записи и возвращает их ID.
+
+    Новые значения приводятся к типам столбцов до первого изменения,
+    поэтому некорректное значение не оставляет таблицу обновлённой
+    наполовину.
+    """
+    converters = get_schema(metadata, table_name).converters
     for column in set_values:
         if column == ID_NAME:
-            raise ValueError(
-                MSG_ID_UPDATE_FORBIDDEN.format(id_name=ID_NAME)
-            )
-        if column not in type_map:
-            raise ValueError(
-                f'Некорректное значение: столбца "{column}" не существует.'
-            )
+            raise SchemaError(MSG_ID_UPDATE_FORBIDDEN.format(id_name=ID_NAME))
+        if column not in converters:
+            raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
+    with phase("convert"):
+        changes = {
+            column: converters[column](value) for column, value in set_values.items()
+        }
 
     if table_data is None:
         table_data = []
 
-    matched = False
-    for record in table_data:
-        if where_clause and not all(
-            record.get(key) == value for key, value in where_clause.items()
-        ):
-            continue
-        for column, value in set_values.items():
-            record[column] = convert_value(value, type_map[column])
-        print(
-            MSG_RECORD_UPDATED.format(
-                id_name=ID_NAME,
-                record_id=record.get(ID_NAME),
-                table=table_name,
+    touched = []
+    updated_ids = []
+    indexes = table_indexes(metadata, table_name)
+    for record in find_matches(table_name, table_data, where_clause, indexes):
+        touched.append(dict(record))
+        if ops is not None:
+            ops.append(
+                {
+                    "op": OP_UPDATE,
+                    "id": record.get(ID_NAME),
+                    "values": changes,
+                    "old": {column: record.get(column) for column in changes},
+                }
             )
-        )
-        matched = True
-
-    if not matched:
-        print(MSG_RECORDS_NO_MATCH)
-
-    if matched:
-        _select_cache.clear(table_name)
-
-    return table_data
-
-
-@confirm_action(PROMPT_CONFIRM_DELETE)
-def delete(table_name, table_data, where_clause=None):
-    """Удаляет записи таблицы по условию."""
+        record.update(changes)
+        touched.append(record)
+        updated_ids.append(record.get(ID_NAME))
+
+    if touched:
+        _select_cache.invalidate(table_name, touched)
+    return updated_ids
+
+
+def delete(
+    table_name,
+    table_data,
+    where_clause=None,
+    ops=None,
+    indexes=None,
+) -> tuple[list[dict], list[int]]:
+    """
+    Удаляет записи по условию.
+
+    Возвращает оставшиеся записи и ID удалённых. Без условия ничего
+    не удаляется.
+    """
     if table_data is None:
         table_data = []
 
-    remaining = []
     removed = []
-
-    for record in table_data:
-        if where_clause and all(
-            record.get(key) == value for key, value in where_clause.items()
-        ):
-            removed.append(record)
-            continue
-        remaining.append(record)
-
+    if where_clause:
+        removed = find_matches(table_name, table_data, where_clause, indexes)
     if not removed:
-        print(MSG_RECORDS_NO_MATCH)
-        return table_data
-
-    for record in removed:
-        print(
-            MSG_RECORD_DELETED.format(
-                id_name=ID_NAME,
-                record_id=record.get(ID_NAME),
-                table=table_name,
-            )
-        )
+        return table_data, []
 
-    _select_cache.clear(table_name)
-    return remaining
+    removed_ids = [record.get(ID_NAME) for record in removed]
+    if isinstance(table_data, SegmentedTable):
+        # Переписываются только сегменты с удалёнными записями.
+        table_data.remove_ids(removed_ids)
+        remaining = table_data
+    else:
+        removed_set = set(removed_ids)
+        remaining = [
+            record for record in table_data if record.get(ID_NAME) not in removed_set
+        ]
+    if ops is not None:
+        ops.extend(
+            {"op": OP_DELETE, "id": record.get(ID_NAME), "row": record}
+            for record in removed
+        )
 
+    _select_cache.invalidate(table_name, removed)
+    return remaining, removed_ids
 
-@handle_db_errors()
-def info(metadata, table_name, table_data):
-    """Печатает краткую информацию о таблице и количестве записей."""
-    if table_name not in metadata:
-        raise ValueError(MSG_TABLE_NOT_EXISTS.format(name=table_name))
 
-    schema = metadata[table_name][TABLE_INFO_KEY]
+def info(metadata, table_name, table_data) -> TableInfo:
+    """Возвращает схему таблицы и количество записей."""
+    schema = get_schema(metadata, table_name)
     count = len(table_data) if table_data else 0
-
-    print(MSG_TABLE_INFO.format(name=table_name))
-    print(MSG_TABLE_COLUMNS.format(columns=", ".join(schema)))
-    print(MSG_TABLE_COUNT.format(count=count))
+    return TableInfo(table_name, list(schema.info), count)
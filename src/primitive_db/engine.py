@@ -1,250 +1,470 @@
-import shlex
-
-import prompt
-from prettytable import PrettyTable
+import math
+import time
+from itertools import islice
+from typing import Iterable
 
 from ..constants import (
     COMMANDS,
     HELP_ALIGNMENT,
-    META_FILE,
+    ID_NAME,
+    INDEX_HASH,
+    MSG_CACHE_STATS,
     MSG_EXIT,
+    MSG_EXPLAIN_ACCESS,
+    MSG_EXPLAIN_CACHED,
+    MSG_EXPLAIN_CANDIDATES,
+    MSG_EXPLAIN_INDEXES,
+    MSG_EXPLAIN_TABLE,
+    MSG_EXPORTED,
+    MSG_IMPORTED,
+    MSG_INDEX_CREATED,
+    MSG_INDEX_DROPPED,
     MSG_INVALID_INFO,
     MSG_INVALID_VALUE,
+    MSG_METRICS_OFF,
+    MSG_METRICS_ON,
+    MSG_METRICS_RESET,
+    MSG_METRICS_SAVED,
+    MSG_NO_TABLES,
     MSG_PARSE_ERROR,
     MSG_PARSE_HINT,
+    MSG_PROFILE_COUNTER,
+    MSG_PROFILE_HEADER,
+    MSG_PROFILE_PHASE,
+    MSG_RECORD_DELETED,
+    MSG_RECORD_INSERTED,
+    MSG_RECORD_UPDATED,
+    MSG_RECORDS_INSERTED,
     MSG_RECORDS_NO_MATCH,
-    MSG_TABLE_NOT_EXISTS,
-    MSG_UNKNOWN_COLUMN,
+    MSG_STATEMENT_PREPARED,
+    MSG_TABLE_COLUMNS,
+    MSG_TABLE_COMPACTED,
+    MSG_TABLE_CONVERTED,
+    MSG_TABLE_COUNT,
+    MSG_TABLE_CREATED,
+    MSG_TABLE_DROPPED,
+    MSG_TABLE_INFO,
+    MSG_TABLES_PREFIX,
+    MSG_TRANSACTION_ABORTED,
+    MSG_TRANSACTION_COMMITTED,
+    MSG_TRANSACTION_ROLLED_BACK,
+    MSG_TRANSACTION_STARTED,
+    MSG_UNEXPECTED_ERROR,
     MSG_UNKNOWN_COMMAND,
+    MSG_WAL_RECOVERED,
     MSG_WELCOME,
+    PLAN_DESCRIPTIONS,
+    PROMPT_CONFIRM_DELETE,
+    PROMPT_CONFIRM_DROP,
     PROMPT_INPUT,
+    SCRIPT_COMMENT_PREFIX,
     TABLE_INFO_KEY,
 )
-from .core import (
-    convert_value,
-    create_table,
-    delete,
-    drop_table,
-    info,
-    insert,
-    list_tables,
-    select,
-    update,
+from ..decorators import confirm_action
+from . import metrics
+from .api import Database
+from .buffer_pool import (
+    add_recovery_listener,
+    get_metadata,
+    in_transaction,
+    maybe_flush,
+    set_flush_interval,
 )
+from .core import QueryPlan
+from .errors import QueryError
+from .output import print_rows
 from .parser import (
-    parse_delete_tokens,
-    parse_insert_tokens,
+    parse_parameter_tokens,
     parse_select_tokens,
-    parse_update_tokens,
     parse_where_condition_tokens,
+    split_command,
 )
-from .utils import (
-    delete_table_file,
-    load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
+from .statements import (
+    STATEMENT_COMMANDS,
+    Statement,
+    bind_statement,
+    cached_plan,
+    compile_statement,
+    prepare_statement,
+    prepared_statement,
+    refresh_statement,
+    remember_plan,
 )
 
+# CLI — тонкий слой над Database: разбирает команду, вызывает API и
+# печатает результат. Ошибки API (DatabaseError) печатаются как есть.
+_database = Database()
 
-def run():
-    """Запускает основной цикл взаимодействия с пользователем."""
-    while True:
-        metadata = load_metadata(META_FILE)
-        user_input = prompt.string(PROMPT_INPUT)
 
+def _print_recovered(count: int) -> None:
+    print(MSG_WAL_RECOVERED.format(count=count))
+
+
+# Библиотека о восстановлении из журнала не печатает: сообщает CLI.
+add_recovery_listener(_print_recovered)
+
+# Допустимое число аргументов команды, включая её имя: (от, до).
+_ARITY = {
+    "create_table": (3, None),
+    "drop_table": (2, 2),
+    "create_index": (3, 4),
+    "drop_index": (3, 3),
+    "import": (3, 3),
+    "export": (3, 3),
+    "convert": (3, 3),
+    "profile": (2, None),
+    "explain": (4, None),
+    "metrics": (1, 2),
+    "prepare": (4, None),
+}
+# Символы, внутри которых пробелы значимы (см. _normalize).
+_QUOTING = "\"'\\"
+
+
+def execute(user_input: str, errors: list[str] | None = None) -> bool:
+    """
+    Выполняет одну команду.
+
+    Возвращает False, если команда завершает работу (exit). Команда
+    замеряется в реестре метрик; префикс profile дополнительно печатает
+    её профиль по фазам. Разбор insert/select/update/delete берётся из
+    кэша, если та же строка уже выполнялась. Если передан список errors,
+    в него дописываются напечатанные сообщения об ошибках.
+    """
+    text, profiled = _normalize(user_input)
+    statement = cached_plan(text)
+    if statement is not None:
+        command = statement.tokens[0]
+    elif text.split(None, 1)[:1] == ["execute"]:
+        command = "execute"
+    else:
+        start = time.perf_counter()
         try:
-            args = shlex.split(user_input)
+            args = split_command(text)
         except ValueError as error:
-            print(MSG_PARSE_ERROR.format(error=error))
+            _report(MSG_PARSE_ERROR.format(error=error), errors)
             print(MSG_PARSE_HINT)
-            continue
+            return True
+        tokenized = time.perf_counter() - start
         if not args:
-            continue
+            return True
         command = args[0]
 
-        match command:
-            case "create_table":
-                if len(args) < 3:
-                    invalid_value = " ".join(args[1:]) or command
-                    print(MSG_INVALID_VALUE.format(value=invalid_value))
-                    continue
-                table_name = args[1]
-                columns = args[2:]
-                updated_metadata = create_table(metadata, table_name, columns)
-                if updated_metadata is None:
-                    continue
-                metadata = updated_metadata
-                save_metadata(META_FILE, metadata)
-            case "drop_table":
-                if len(args) < 2:
-                    invalid_value = " ".join(args[1:]) or command
-                    print(MSG_INVALID_VALUE.format(value=invalid_value))
-                    continue
-                table_name = args[1]
-                updated_metadata = drop_table(metadata, table_name)
-                if updated_metadata is None:
-                    continue
-                metadata = updated_metadata
-                save_metadata(META_FILE, metadata)
-                delete_table_file(table_name)
-            case "list_tables":
-                list_tables(metadata)
-            case "insert":
-                try:
-                    table_name, values = parse_insert_tokens(args)
-                except ValueError as e:
-                    print(e)
-                    continue
-
-                table_data = load_table_data(table_name)
-                updated_data = insert(metadata, table_name, values, table_data)
-                if updated_data is None:
-                    continue
-                save_table_data(table_name, updated_data)
-            case "select":
-                try:
-                    table_name, condition_tokens = parse_select_tokens(args)
-                except ValueError as e:
-                    print(e)
-                    continue
-
-                table_info = metadata.get(table_name, {}).get(TABLE_INFO_KEY)
-                if not table_info:
-                    print(MSG_TABLE_NOT_EXISTS.format(name=table_name))
-                    continue
-
-                type_map = {}
-                headers = []
-                for column_def in table_info:
-                    name_part, type_part = column_def.split(":")
-                    column_name = name_part.strip()
-                    headers.append(column_name)
-                    type_map[column_name] = type_part.strip()
-
-                where_clause = None
-                if condition_tokens:
-                    try:
-                        where_clause = parse_where_condition_tokens(
-                            condition_tokens,
-                            type_map,
-                        )
-                    except ValueError as e:
-                        print(e)
-                        continue
-                rows = select(table_name, where_clause)
-
-                if rows is None:
-                    continue
-                if not rows:
-                    print(MSG_RECORDS_NO_MATCH)
-                    continue
-
-                table = PrettyTable()
-                table.field_names = headers
-
-                for row in rows:
-                    table.add_row([row.get(header) for header in headers])
-                print(table)
-            case "update":
-                try:
-                    table_name, set_values, condition_tokens = parse_update_tokens(args)
-                except ValueError as e:
-                    print(e)
-                    continue
-
-                table_info = metadata.get(table_name, {}).get(TABLE_INFO_KEY)
-                if not table_info:
-                    print(MSG_TABLE_NOT_EXISTS.format(name=table_name))
-                    continue
-
-                type_map = {}
-                for column_def in table_info:
-                    name_part, type_part = column_def.split(":")
-                    type_map[name_part.strip()] = type_part.strip()
-
-                converted_set = {}
-                for column, raw_value in set_values.items():
-                    if column not in type_map:
-                        print(MSG_UNKNOWN_COLUMN.format(column=column))
-                        break
-                    try:
-                        converted_set[column] = convert_value(
-                            raw_value,
-                            type_map[column],
-                        )
-                    except ValueError as e:
-                        print(e)
-                        break
+    keep_going = True
+    try:
+        with metrics.command(command, force=profiled):
+            try:
+                if statement is not None:
+                    metrics.count("plan_cache.hit")
+                    remember_plan(text, _run(statement))
+                elif command == "execute":
+                    _execute_prepared(text)
+                elif command in STATEMENT_COMMANDS:
+                    metrics.add_phase("tokenize", tokenized)
+                    metrics.count("plan_cache.miss")
+                    statement = compile_statement(args)
+                    remember_plan(text, statement)
+                    _run(statement)
                 else:
-                    where_clause = None
-                    if condition_tokens:
-                        try:
-                            where_clause = parse_where_condition_tokens(
-                                condition_tokens,
-                                type_map,
-                            )
-                        except ValueError as e:
-                            print(e)
-                            continue
-
-                    table_data = load_table_data(table_name)
-                    updated_data = update(
-                        metadata,
-                        table_name,
-                        table_data,
-                        converted_set,
-                        where_clause,
-                    )
-                    if updated_data is None:
-                        continue
-                    save_table_data(table_name, updated_data)
-            case "delete":
-                try:
-                    table_name, condition_tokens = parse_delete_tokens(args)
-                except ValueError as e:
-                    print(e)
-                    continue
-
-                table_info = metadata.get(table_name, {}).get(TABLE_INFO_KEY)
-                if not table_info:
-                    print(MSG_TABLE_NOT_EXISTS.format(name=table_name))
-                    continue
-
-                type_map = {
-                    column.split(":")[0].strip(): column.split(":")[1].strip()
-                    for column in table_info
-                }
-
-                table_data = load_table_data(table_name)
-                try:
-                    where_clause = parse_where_condition_tokens(
-                        condition_tokens,
-                        type_map,
+                    metrics.add_phase("tokenize", tokenized)
+                    keep_going = _dispatch(args)
+            finally:
+                maybe_flush()
+    except ValueError as error:
+        _report(str(error), errors)
+    except Exception as error:
+        # Ошибка вне DatabaseError не должна завершать сеанс или сценарий.
+        _report(MSG_UNEXPECTED_ERROR.format(error=error), errors)
+    if profiled:
+        _print_profile()
+    return keep_going
+
+
+def _report(message: str, errors: list[str] | None) -> None:
+    print(message)
+    if errors is not None:
+        errors.append(message)
+
+
+def _normalize(user_input: str) -> tuple[str, bool]:
+    """
+    Ключ кэша разбора: команда без префикса profile и лишних пробелов.
+
+    Пробелы схлопываются, только если в строке нет кавычек и
+    экранирования, иначе они могут быть частью значения.
+    """
+    text = user_input.strip()
+    if not any(char in text for char in _QUOTING):
+        text = " ".join(text.split())
+    parts = text.split(None, 1)
+    if len(parts) == 2 and parts[0] == "profile":
+        return parts[1], True
+    return text, False
+
+
+def _print_profile() -> None:
+    profile = metrics.last_profile()
+    print(
+        MSG_PROFILE_HEADER.format(
+            command=profile["command"],
+            total=profile["total"] * 1000,
+        )
+    )
+    for name, seconds in metrics.ordered_phases(profile["phases"]):
+        print(MSG_PROFILE_PHASE.format(phase=name, elapsed=seconds * 1000))
+    for name, value in sorted(profile["counters"].items()):
+        print(MSG_PROFILE_COUNTER.format(name=name, value=value))
+
+
+def _bad_arity(args: list[str]) -> bool:
+    if args[0] not in _ARITY:
+        return False
+    low, high = _ARITY[args[0]]
+    return len(args) < low or (high is not None and len(args) > high)
+
+
+def _confirmed(action_name: str) -> bool:
+    """Спрашивает подтверждение так же, как confirm_action."""
+    return confirm_action(action_name)(lambda: True)() is True
+
+
+def _print_ids(message: str, table_name: str, ids: list[int]) -> None:
+    if not ids:
+        print(MSG_RECORDS_NO_MATCH)
+    for record_id in ids:
+        print(message.format(id_name=ID_NAME, record_id=record_id, table=table_name))
+
+
+def _dispatch(args: list[str]) -> bool:
+    command = args[0]
+    if _bad_arity(args):
+        raise QueryError(MSG_INVALID_VALUE.format(value=" ".join(args[1:]) or command))
+
+    match command:
+        case "create_table":
+            table_name = args[1]
+            notices: list[str] = []
+            _database.create_table(table_name, args[2:], notices)
+            for notice in notices:
+                print(notice)
+            columns = get_metadata()[table_name][TABLE_INFO_KEY]
+            print(MSG_TABLE_CREATED.format(name=table_name, columns=", ".join(columns)))
+        case "drop_table":
+            table_name = args[1]
+            _database.table(table_name)
+            if _confirmed(PROMPT_CONFIRM_DROP):
+                _database.drop_table(table_name)
+                print(MSG_TABLE_DROPPED.format(name=table_name))
+        case "create_index":
+            table_name, column = args[1], args[2]
+            kind = args[3].lower() if len(args) == 4 else INDEX_HASH
+            _database.table(table_name).create_index(column, kind)
+            print(MSG_INDEX_CREATED.format(kind=kind, column=column, name=table_name))
+        case "drop_index":
+            table_name, column = args[1], args[2]
+            _database.table(table_name).drop_index(column)
+            print(MSG_INDEX_DROPPED.format(column=column, name=table_name))
+        case "list_tables":
+            tables = _database.tables()
+            if not tables:
+                print(MSG_NO_TABLES)
+            for table_name in tables:
+                print(MSG_TABLES_PREFIX.format(name=table_name))
+        case "prepare":
+            name = args[1]
+            if args[2].lower() != "as":
+                raise QueryError(MSG_INVALID_VALUE.format(value=args[2]))
+            statement = prepare_statement(name, args[3:])
+            print(MSG_STATEMENT_PREPARED.format(name=name, count=statement.parameters))
+        case "explain":
+            if args[1].lower() != "select":
+                raise QueryError(MSG_INVALID_VALUE.format(value=args[1]))
+            table_name, condition_tokens, _, _ = parse_select_tokens(args[1:])
+            table = _database.table(table_name)
+            types = table.schema.types
+            where = None
+            if condition_tokens:
+                where = parse_where_condition_tokens(condition_tokens, types)
+            _print_plan(table.explain(where))
+        case "metrics":
+            _metrics(args[1] if len(args) == 2 else None)
+        case "compact":
+            if len(args) < 2:
+                raise QueryError(MSG_INVALID_INFO)
+            table_name = args[1]
+            _database.table(table_name).compact()
+            print(MSG_TABLE_COMPACTED.format(name=table_name))
+        case "convert":
+            table_name, storage = args[1], args[2].lower()
+            _database.table(table_name).convert(storage)
+            print(MSG_TABLE_CONVERTED.format(name=table_name, storage=storage))
+        case "info":
+            if len(args) < 2:
+                raise QueryError(MSG_INVALID_INFO)
+            table_info = _database.table(args[1]).info()
+            print(MSG_TABLE_INFO.format(name=table_info.name))
+            print(MSG_TABLE_COLUMNS.format(columns=", ".join(table_info.columns)))
+            print(MSG_TABLE_COUNT.format(count=table_info.count))
+        case "import":
+            table_name, path = args[1], args[2]
+            result = _database.table(table_name).import_file(path)
+            print(MSG_IMPORTED.format(table=table_name, count=result.count))
+        case "export":
+            table_name, path = args[1], args[2]
+            count = _database.table(table_name).export_file(path)
+            print(MSG_EXPORTED.format(table=table_name, count=count, path=path))
+        case "cache_stats":
+            print(MSG_CACHE_STATS.format(**_database.cache_stats()))
+        case "begin":
+            _database.begin()
+            print(MSG_TRANSACTION_STARTED)
+        case "commit":
+            _database.commit()
+            print(MSG_TRANSACTION_COMMITTED)
+        case "rollback":
+            _database.rollback()
+            print(MSG_TRANSACTION_ROLLED_BACK)
+        case "exit":
+            print(MSG_EXIT)
+            return False
+        case "help":
+            print_help()
+        case _:
+            raise QueryError(MSG_UNKNOWN_COMMAND.format(command=command))
+    return True
+
+
+def _execute_prepared(text: str) -> None:
+    """
+    execute <название> (значение, ...).
+
+    Строка не проходит shlex: значения разбираются как в insert, кавычки
+    снимает приведение к типу столбца.
+    """
+    parts = text.split(None, 2)
+    if len(parts) < 3:
+        raise QueryError(MSG_INVALID_VALUE.format(value=text))
+    statement = prepared_statement(parts[1])
+    _run(bind_statement(statement, parse_parameter_tokens(parts[2:])))
+
+
+def _run(statement: Statement) -> Statement:
+    """
+    Выполняет разобранную команду и печатает результат.
+
+    Возвращает команду, разобранную под текущую схему таблицы (её и
+    стоит хранить в кэше).
+    """
+    statement = refresh_statement(statement)
+    table_name = statement.table
+    table = _database.table(table_name)
+    where = statement.condition
+    match statement.kind:
+        case "insert":
+            rows = statement.rows
+            if len(rows) == 1:
+                result = table.insert(rows[0])
+                _print_ids(MSG_RECORD_INSERTED, table_name, result.ids)
+            else:
+                result = table.insert_many(rows)
+                print(
+                    MSG_RECORDS_INSERTED.format(
+                        table=table_name,
+                        count=result.count,
+                        id_name=ID_NAME,
+                        first=result.ids[0],
+                        last=result.ids[-1],
                     )
-                except ValueError as e:
-                    print(e)
-                    continue
-                updated_data = delete(table_name, table_data, where_clause)
-                if updated_data is None:
-                    continue
-                save_table_data(table_name, updated_data)
-            case "info":
-                if len(args) < 2:
-                    print(MSG_INVALID_INFO)
-                    continue
-
-                table_name = args[1]
-                table_data = load_table_data(table_name)
-                info(metadata, table_name, table_data)
-            case "exit":
-                print(MSG_EXIT)
+                )
+        case "aggregate":
+            items = statement.items
+            rows = table.aggregate(items, where, statement.group_by)
+            offset, limit = statement.offset, statement.limit
+            stop = None if limit is None else offset + limit
+            with metrics.phase("render"):
+                print_rows(islice(rows, offset, stop), [item.label for item in items])
+        case "select":
+            rows = table.iter(where, statement.limit, statement.offset)
+            with metrics.phase("render"):
+                print_rows(rows, list(table.schema.columns))
+        case "update":
+            result = table.update(statement.values, where)
+            _print_ids(MSG_RECORD_UPDATED, table_name, result.ids)
+        case "delete":
+            if _confirmed(PROMPT_CONFIRM_DELETE):
+                result = table.delete(where)
+                _print_ids(MSG_RECORD_DELETED, table_name, result.ids)
+    return statement
+
+
+def _print_plan(plan: QueryPlan) -> None:
+    print(MSG_EXPLAIN_TABLE.format(name=plan.table, count=plan.rows))
+    print(MSG_EXPLAIN_ACCESS.format(description=PLAN_DESCRIPTIONS[plan.access]))
+    if plan.columns:
+        print(MSG_EXPLAIN_INDEXES.format(columns=", ".join(plan.columns)))
+    if plan.candidates is not None:
+        print(MSG_EXPLAIN_CANDIDATES.format(count=plan.candidates))
+    if plan.cached:
+        print(MSG_EXPLAIN_CACHED)
+
+
+def _metrics(argument: str | None) -> None:
+    """metrics: печать JSON, reset, on/off или запись в файл."""
+    match argument:
+        case None:
+            print(metrics.dump())
+        case "reset":
+            metrics.reset()
+            print(MSG_METRICS_RESET)
+        case "on" | "off":
+            metrics.set_enabled(argument == "on")
+            print(MSG_METRICS_ON if argument == "on" else MSG_METRICS_OFF)
+        case path:
+            metrics.dump(path)
+            print(MSG_METRICS_SAVED.format(path=path))
+
+
+def shutdown() -> None:
+    """Отменяет незавершённую транзакцию и сбрасывает изменения на диск."""
+    if in_transaction():
+        print(MSG_TRANSACTION_ABORTED)
+    try:
+        _database.close()
+    except ValueError as error:
+        print(error)
+
+
+def run():
+    """Запускает основной цикл взаимодействия с пользователем."""
+    import prompt
+
+    try:
+        while execute(prompt.string(PROMPT_INPUT)):
+            pass
+    finally:
+        shutdown()
+
+
+def run_batch(lines: Iterable[str]) -> None:
+    """
+    Выполняет команды без интерактивного ввода.
+
+    Таблицы держатся в памяти на протяжении всего сценария и
+    сохраняются на диск один раз в конце. Пустые строки и строки,
+    начинающиеся с #, пропускаются. Транзакция, не завершённая
+    commit к концу сценария, отменяется.
+    """
+    set_flush_interval(math.inf)
+    try:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(SCRIPT_COMMENT_PREFIX):
+                continue
+            if not execute(line):
                 break
+    finally:
+        shutdown()
 
-            case "help":
-                print_help()
-            case _:
-                print(MSG_UNKNOWN_COMMAND.format(command=command))
 
 def welcome():
     """Выводит приветственное сообщение и справку по командам."""
@@ -0,0 +1,51 @@
+class DatabaseError(ValueError):
+    """
+    Базовая ошибка базы данных; текст — готовое сообщение пользователю.
+
+    Наследует ValueError, поэтому CLI и handle_db_errors, которые ловят
+    ValueError, обрабатывают её без изменений.
+    """
+
+
+class TableNotFoundError(DatabaseError):
+    """Таблицы нет в метаданных."""
+
+
+class TableExistsError(DatabaseError):
+    """Таблица с таким именем уже существует."""
+
+
+class SchemaError(DatabaseError):
+    """Некорректное описание столбцов или количество значений."""
+
+
+class ColumnNotFoundError(DatabaseError):
+    """Столбца нет в схеме таблицы."""
+
+
+class ConversionError(DatabaseError):
+    """Значение нельзя привести к типу столбца."""
+
+
+class IndexDefinitionError(DatabaseError):
+    """Индекс уже существует, не существует или вид индекса неизвестен."""
+
+
+class QueryError(DatabaseError):
+    """Команду или условие не удалось разобрать."""
+
+
+class LockTimeoutError(DatabaseError):
+    """Блокировку не удалось получить за отведённое время."""
+
+
+class TransactionError(DatabaseError):
+    """Недопустимая операция с транзакцией."""
+
+
+class StorageError(DatabaseError):
+    """Файл базы не удалось записать на диск."""
+
+
+class CommandError(DatabaseError):
+    """Команда, выполненная сервером, завершилась ошибкой."""
@@ -0,0 +1,403 @@
+import json
+import os
+from bisect import bisect_left, bisect_right, insort
+from contextlib import suppress
+from typing import Any, Callable, Iterable
+
+from ..constants import (
+    DATA_PATH,
+    ID_NAME,
+    INDEX_FILE_TEMPLATE,
+    INDEX_HASH,
+    INDEX_SORTED,
+    MSG_INDEX_SAVE_ERROR,
+    OP_DELETE,
+    OP_INSERT,
+    OP_UPDATE,
+    PK_FILE_TEMPLATE,
+    TABLE_INDEXES_KEY,
+)
+from .errors import StorageError
+from .segments import SegmentedTable
+from .storage import atomic_open
+from .utils import file_stamp
+
+# Индексы, прочитанные или изменённые в этом процессе: путь -> состояние.
+_resident: dict[str, dict] = {}
+
+
+# Записи sorted-индекса упорядочены по ключу (значение is None, значение,
+# ID): None в столбце допустим и стоит после всех значений, поэтому
+# сравнивать его с числами или строками не приходится.
+def _entry_key(entry: tuple) -> tuple:
+    value, record_id = entry
+    return (value is None, value, record_id)
+
+
+def _entry_value(entry: tuple) -> tuple:
+    return (entry[0] is None, entry[0])
+
+
+def _value_key(value) -> tuple:
+    return (value is None, value)
+
+
+def index_path(table_name: str, column: str) -> str:
+    """Возвращает путь к файлу индекса столбца."""
+    return os.path.join(
+        DATA_PATH,
+        INDEX_FILE_TEMPLATE.format(table=table_name, column=column),
+    )
+
+
+def pk_path(table_name: str) -> str:
+    """Возвращает путь к файлу карты первичного ключа."""
+    return os.path.join(DATA_PATH, PK_FILE_TEMPLATE.format(table=table_name))
+
+
+def table_indexes(metadata: dict, table_name: str) -> dict[str, str]:
+    """Возвращает описания индексов таблицы: столбец -> вид индекса."""
+    return metadata.get(table_name, {}).get(TABLE_INDEXES_KEY, {})
+
+
+def build_index(table_data: list[dict], column: str, kind: str) -> dict:
+    """Строит индекс по столбцу из загруженных записей."""
+    if kind == INDEX_SORTED:
+        entries = sorted(
+            ((record.get(column), record.get(ID_NAME)) for record in table_data),
+            key=_entry_key,
+        )
+        return {"kind": kind, "entries": entries}
+
+    buckets: dict[object, list[int]] = {}
+    for record in table_data:
+        buckets.setdefault(record.get(column), []).append(record.get(ID_NAME))
+    return {"kind": INDEX_HASH, "entries": buckets}
+
+
+def _add(index: dict, value, record_id: int) -> None:
+    if index["kind"] == INDEX_SORTED:
+        insort(index["entries"], (value, record_id), key=_entry_key)
+    else:
+        index["entries"].setdefault(value, []).append(record_id)
+
+
+def _remove(index: dict, value, record_id: int) -> None:
+    if index["kind"] == INDEX_SORTED:
+        entries = index["entries"]
+        position = bisect_left(
+            entries, _entry_key((value, record_id)), key=_entry_key
+        )
+        if position < len(entries) and entries[position] == (value, record_id):
+            del entries[position]
+        return
+
+    bucket = index["entries"].get(value)
+    if bucket and record_id in bucket:
+        bucket.remove(record_id)
+        if not bucket:
+            del index["entries"][value]
+
+
+def apply_ops(index: dict, column: str, ops: list[dict]) -> None:
+    """Отражает в индексе операции insert/update/delete."""
+    for op in ops:
+        kind = op["op"]
+        if kind == OP_INSERT:
+            row = op["row"]
+            _add(index, row.get(column), row.get(ID_NAME))
+        elif kind == OP_UPDATE and column in op["values"]:
+            _remove(index, op["old"].get(column), op["id"])
+            _add(index, op["values"][column], op["id"])
+        elif kind == OP_DELETE:
+            _remove(index, op["row"].get(column), op["id"])
+
+
+def lookup(index: dict, value) -> list[int]:
+    """Возвращает ID записей, у которых столбец равен value."""
+    entries = index["entries"]
+    if index["kind"] == INDEX_SORTED:
+        start = bisect_left(entries, _value_key(value), key=_entry_value)
+        end = bisect_right(entries, _value_key(value), key=_entry_value)
+        return [record_id for _, record_id in entries[start:end]]
+    return list(entries.get(value, ()))
+
+
+def range_lookup(
+    index: dict,
+    low=None,
+    high=None,
+    include_low: bool = True,
+    include_high: bool = True,
+) -> list[int] | None:
+    """
+    Возвращает ID записей со значением в диапазоне [low, high].
+
+    None в границе означает открытый конец. Для hash-индекса диапазон
+    не вычислить — возвращается None.
+    """
+    if index["kind"] != INDEX_SORTED:
+        return None
+    entries = index["entries"]
+    # Записи с None стоят в конце и в диапазон не входят.
+    start, end = 0, bisect_left(entries, (True,), key=_entry_value)
+    if low is not None:
+        find_start = bisect_left if include_low else bisect_right
+        start = find_start(entries, _value_key(low), key=_entry_value)
+    if high is not None:
+        find_end = bisect_right if include_high else bisect_left
+        end = find_end(entries, _value_key(high), key=_entry_value)
+    return [record_id for _, record_id in entries[start:end]]
+
+
+def _read_index_file(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            stored = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    kind = stored.get("kind")
+    if kind == INDEX_SORTED:
+        entries = [tuple(entry) for entry in stored["entries"]]
+        return {"kind": kind, "entries": entries}
+    buckets = {value: ids for value, ids in stored["entries"]}
+    return {"kind": INDEX_HASH, "entries": buckets}
+
+
+def _serialize_index(index: dict) -> dict:
+    if index["kind"] == INDEX_SORTED:
+        entries = index["entries"]
+    else:
+        entries = list(index["entries"].items())
+    return {"kind": index["kind"], "entries": entries}
+
+
+def _cached_read(path: str, reader: Callable[[str], Any]) -> Any:
+    """Читает файл индекса, пока он не изменился, из памяти процесса."""
+    entry = _resident.get(path)
+    if entry is not None and (entry["dirty"] or entry["stamp"] == file_stamp(path)):
+        return entry["value"]
+    value = reader(path)
+    if value is None:
+        _resident.pop(path, None)
+        return None
+    _resident[path] = {
+        "value": value,
+        "stamp": file_stamp(path),
+        "dirty": False,
+        "serialize": None,
+    }
+    return value
+
+
+def _write(path: str, entry: dict) -> None:
+    """
+    Записывает индекс на диск.
+
+    Если записать не удалось, прежний файл устарел: он удаляется, чтобы
+    индекс перестроился из таблицы, и выбрасывается StorageError.
+    """
+    try:
+        with atomic_open(path, sync=False) as file:
+            json.dump(entry["serialize"](entry["value"]), file, ensure_ascii=False)
+    except OSError as error:
+        with suppress(OSError):
+            _forget(path)
+        raise StorageError(MSG_INDEX_SAVE_ERROR.format(index_file=path, error=error))
+    entry["stamp"] = file_stamp(path)
+    entry["dirty"] = False
+
+
+def _store(
+    path: str,
+    value: Any,
+    serialize: Callable[[Any], Any],
+    deferred: bool = False,
+) -> None:
+    """Кладёт индекс в память и пишет его на диск сразу или при flush."""
+    entry = {"value": value, "stamp": None, "dirty": True, "serialize": serialize}
+    _resident[path] = entry
+    if not deferred:
+        _write(path, entry)
+
+
+def _forget(path: str) -> None:
+    _resident.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def flush_indexes(table_name: str | None = None) -> None:
+    """
+    Записывает на диск изменённые в памяти индексы.
+
+    Ошибка записи одного индекса не мешает записать остальные; о всех
+    ошибках сообщает одна StorageError в конце.
+    """
+    prefix = None
+    if table_name is not None:
+        prefix = os.path.join(DATA_PATH, f"{table_name}.")
+    failures = []
+    for path, entry in list(_resident.items()):
+        if entry["dirty"] and (prefix is None or path.startswith(prefix)):
+            try:
+                _write(path, entry)
+            except StorageError as error:
+                failures.append(str(error))
+    if failures:
+        raise StorageError("\n".join(failures))
+
+
+def discard_indexes() -> None:
+    """Забывает несохранённые изменения индексов (после отката)."""
+    for path in [path for path, entry in _resident.items() if entry["dirty"]]:
+        del _resident[path]
+
+
+def load_index(table_name: str, column: str) -> dict | None:
+    """Возвращает индекс столбца; None, если файла нет или он повреждён."""
+    return _cached_read(index_path(table_name, column), _read_index_file)
+
+
+def save_index(table_name: str, column: str, index: dict) -> None:
+    """Сохраняет индекс столбца на диск."""
+    _store(index_path(table_name, column), index, _serialize_index)
+
+
+def get_index(
+    table_name: str,
+    column: str,
+    kind: str,
+    table_data: list[dict],
+) -> dict:
+    """Возвращает индекс столбца, перестраивая его при отсутствии файла."""
+    index = load_index(table_name, column)
+    if index is None or index["kind"] != kind:
+        index = build_index(table_data, column, kind)
+        _store(index_path(table_name, column), index, _serialize_index, True)
+    return index
+
+
+def sync_indexes(
+    metadata: dict,
+    table_name: str,
+    table_data: list[dict],
+    ops: list[dict],
+) -> None:
+    """
+    Применяет выполненные операции ко всем индексам таблицы.
+
+    Изменённые индексы остаются в памяти и записываются при flush_indexes.
+    """
+    if not ops:
+        return
+    sync_pk_map(table_name, table_data, ops)
+    for column, kind in table_indexes(metadata, table_name).items():
+        index = load_index(table_name, column)
+        if index is None or index["kind"] != kind:
+            index = build_index(table_data, column, kind)
+        else:
+            apply_ops(index, column, ops)
+        _store(index_path(table_name, column), index, _serialize_index, True)
+
+
+def rebuild_indexes(metadata: dict, table_name: str, table_data: list[dict]) -> None:
+    """Перестраивает карту первичного ключа и все индексы таблицы."""
+    _store(pk_path(table_name), build_pk_map(table_data), _serialize_pk_map, True)
+    for column, kind in table_indexes(metadata, table_name).items():
+        index = build_index(table_data, column, kind)
+        _store(index_path(table_name, column), index, _serialize_index, True)
+
+
+def remove_index(table_name: str, column: str) -> None:
+    """Удаляет индекс из памяти и с диска."""
+    _forget(index_path(table_name, column))
+
+
+def build_pk_map(table_data: list[dict]) -> dict[int, int]:
+    """Строит карту ID -> позиция записи в таблице."""
+    return {
+        record.get(ID_NAME): position for position, record in enumerate(table_data)
+    }
+
+
+def _read_pk_file(path: str) -> dict[int, int] | None:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return {record_id: position for record_id, position in json.load(file)}
+    except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
+def _serialize_pk_map(pk_map: dict[int, int]) -> list:
+    return list(pk_map.items())
+
+
+def _pk_map_is_prefix(pk_map: dict[int, int], table_data: list[dict]) -> bool:
+    """Проверяет, что сохранённая карта описывает начало текущей таблицы."""
+    if len(pk_map) > len(table_data):
+        return False
+    if not pk_map:
+        return True
+    record_id, position = next(reversed(pk_map.items()))
+    return (
+        position < len(table_data)
+        and table_data[position].get(ID_NAME) == record_id
+    )
+
+
+def get_pk_map(table_name: str, table_data: list[dict]) -> dict[int, int]:
+    """
+    Возвращает карту первичного ключа для загруженной таблицы.
+
+    Вставки только дописывают записи в конец, поэтому сохранённая карта
+    остаётся верной для начала таблицы и дополняется новыми строками.
+    Файл переписывается, только если карта устарела целиком.
+    """
+    path = pk_path(table_name)
+    pk_map = _cached_read(path, _read_pk_file)
+    if pk_map is None or not _pk_map_is_prefix(pk_map, table_data):
+        pk_map = build_pk_map(table_data)
+        _store(path, pk_map, _serialize_pk_map, True)
+        return pk_map
+
+    for position in range(len(pk_map), len(table_data)):
+        pk_map[table_data[position].get(ID_NAME)] = position
+    return pk_map
+
+
+def sync_pk_map(table_name: str, table_data: list[dict], ops: list[dict]) -> None:
+    """
+    Перестраивает карту первичного ключа, если операции сдвинули позиции.
+
+    Сегментированная таблица ищет записи по границам сегментов, а не по
+    карте, поэтому устаревшая карта просто удаляется: перестраивать её
+    значило бы прочитать все сегменты.
+    """
+    if not any(op["op"] == OP_DELETE for op in ops):
+        return
+    if isinstance(table_data, SegmentedTable):
+        _forget(pk_path(table_name))
+    else:
+        pk_map = build_pk_map(table_data)
+        _store(pk_path(table_name), pk_map, _serialize_pk_map, True)
+
+
+def rows_by_ids(
+    table_data: list[dict],
+    pk_map: dict[int, int],
+    ids: Iterable[int],
+) -> list[dict]:
+    """Возвращает записи с указанными ID в порядке таблицы без её просмотра."""
+    positions = sorted(
+        position
+        for position in map(pk_map.get, ids)
+        if position is not None
+    )
+    return [table_data[position] for position in positions]
+
+
+def remove_pk_map(table_name: str) -> None:
+    """Удаляет карту первичного ключа из памяти и с диска."""
+    _forget(pk_path(table_name))
@@ -0,0 +1,122 @@
+import os
+import time
+from typing import TextIO
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки между процессами не поддерживаются
+    fcntl = None
+
+from ..constants import (
+    DATA_PATH,
+    LOCK_RETRY_INITIAL,
+    LOCK_RETRY_MAX,
+    LOCK_TIMEOUT,
+    LOCK_WAIT_SUFFIX,
+    META_LOCK_FILENAME,
+    MSG_LOCK_TIMEOUT,
+    TABLE_LOCK_TEMPLATE,
+)
+from .errors import LockTimeoutError
+from .storage import ensure_directory
+
+# Блокировки, которые держит этот процесс: путь -> открытый файл.
+_held: dict[str, TextIO] = {}
+
+
+def table_lock_path(table_name: str) -> str:
+    """Возвращает путь к файлу блокировки таблицы."""
+    return os.path.join(DATA_PATH, TABLE_LOCK_TEMPLATE.format(table=table_name))
+
+
+def meta_lock_path() -> str:
+    """Возвращает путь к файлу блокировки метаданных."""
+    return os.path.join(DATA_PATH, META_LOCK_FILENAME)
+
+
+def try_lock(file: TextIO, exclusive: bool = True) -> bool:
+    """Пытается без ожидания взять flock на открытый файл."""
+    if fcntl is None:
+        return True
+    mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    try:
+        fcntl.flock(file.fileno(), mode | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def acquire(path: str, timeout: float = LOCK_TIMEOUT, shared: bool = False) -> bool:
+    """
+    Берёт блокировку файла, повторяя попытки с паузой.
+
+    По умолчанию блокировка исключительная (запись); shared=True —
+    разделяемая: её одновременно держат несколько читателей, но не
+    писатель. Пока блокировка занята, процесс отмечается ожидающим
+    (has_waiters). Пауза удваивается от LOCK_RETRY_INITIAL до
+    LOCK_RETRY_MAX; по истечении timeout выбрасывается LockTimeoutError.
+    Возвращает True, если блокировка взята сейчас, и False, если процесс
+    уже её держит.
+    """
+    if path in _held:
+        return False
+
+    ensure_directory(path)
+    file = open(path, "a", encoding="utf-8")
+    deadline = time.monotonic() + timeout
+    delay = LOCK_RETRY_INITIAL
+    waiting = None
+    announced = False
+    try:
+        while not try_lock(file, exclusive=not shared):
+            if waiting is None:
+                waiting = open(path + LOCK_WAIT_SUFFIX, "a", encoding="utf-8")
+            if not announced:
+                announced = try_lock(waiting, exclusive=False)
+            if time.monotonic() >= deadline:
+                file.close()
+                raise LockTimeoutError(MSG_LOCK_TIMEOUT.format(path=path))
+            time.sleep(delay)
+            delay = min(delay * 2, LOCK_RETRY_MAX)
+    finally:
+        if waiting is not None:
+            waiting.close()
+    _held[path] = file
+    return True
+
+
+def has_waiters(path: str) -> bool:
+    """Проверяет, ждёт ли блокировку path другой процесс."""
+    if fcntl is None:
+        return False
+    try:
+        waiting = open(path + LOCK_WAIT_SUFFIX, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return False
+    with waiting:
+        return not try_lock(waiting)
+
+
+def release(path: str) -> None:
+    """Снимает блокировку файла, если процесс её держит."""
+    file = _held.pop(path, None)
+    if file is not None:
+        file.close()
+
+
+def close_inherited() -> None:
+    """
+    Закрывает блокировки, унаследованные дочерним процессом после fork.
+
+    flock принадлежит открытому файлу, общему с родителем, и снимается,
+    только когда закрыты все его дескрипторы. Поэтому дочерний процесс
+    закрывает свои копии, не снимая блокировку: родитель её держит.
+    """
+    for file in _held.values():
+        file.close()
+    _held.clear()
+
+
+def held_locks() -> list[str]:
+    """Возвращает пути файлов, блокировки которых держит процесс."""
+    return list(_held)
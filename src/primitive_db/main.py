@@ -1,11 +1,121 @@
 #!/usr/bin/env python3
 
-from .engine import run, welcome
+import argparse
+import sys
 
+from ..constants import (
+    CLI_DESCRIPTION,
+    CLI_HELP_COLUMNAR,
+    CLI_HELP_COMMAND,
+    CLI_HELP_FORMAT,
+    CLI_HELP_HOST,
+    CLI_HELP_MODE,
+    CLI_HELP_PAGE_SIZE,
+    CLI_HELP_PORT,
+    CLI_HELP_SCAN_WORKERS,
+    CLI_HELP_SCRIPT,
+    CLI_HELP_SOCKET,
+    CLI_HELP_STORAGE,
+    CLI_HELP_YES,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    FORMAT_TABLE,
+    OUTPUT_FORMATS,
+    SERVER_MODE,
+)
+from ..decorators import set_auto_confirm
+from .buffer_pool import set_columnar
+from .engine import run, run_batch, welcome
+from .output import set_output_format, set_page_size, set_pager
+from .scan import set_scan_workers
+from .storage import STORAGE_ENGINES, set_storage_engine
 
-def main():
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(prog="database", description=CLI_DESCRIPTION)
+    parser.add_argument("mode", nargs="?", choices=[SERVER_MODE], help=CLI_HELP_MODE)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--script", metavar="FILE", help=CLI_HELP_SCRIPT)
+    source.add_argument("-c", dest="command", metavar="CMD", help=CLI_HELP_COMMAND)
+    parser.add_argument("-y", "--yes", action="store_true", help=CLI_HELP_YES)
+    parser.add_argument(
+        "--storage",
+        choices=sorted(STORAGE_ENGINES),
+        help=CLI_HELP_STORAGE,
+    )
+    parser.add_argument("--columnar", action="store_true", help=CLI_HELP_COLUMNAR)
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        metavar="N",
+        help=CLI_HELP_SCAN_WORKERS,
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=FORMAT_TABLE,
+        help=CLI_HELP_FORMAT,
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        metavar="N",
+        help=CLI_HELP_PAGE_SIZE,
+    )
+    parser.add_argument("--socket", metavar="PATH", help=CLI_HELP_SOCKET)
+    parser.add_argument("--host", default=DEFAULT_SERVER_HOST, help=CLI_HELP_HOST)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_SERVER_PORT,
+        help=CLI_HELP_PORT,
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    if args.storage:
+        set_storage_engine(args.storage)
+    if args.columnar:
+        set_columnar(True)
+    if args.scan_workers is not None:
+        set_scan_workers(args.scan_workers)
+    set_output_format(args.format)
+    set_page_size(args.page_size)
+
+    if args.mode == SERVER_MODE:
+        # Подтверждать опасные команды клиентов некому: без --yes отказ.
+        set_auto_confirm(args.yes)
+        # asyncio нужен только серверу: обычный запуск его не импортирует.
+        from .server import run_server
+
+        if args.socket:
+            run_server(socket_path=args.socket)
+        else:
+            run_server(host=args.host, port=args.port)
+        return
+
+    if args.command is not None or args.script or not sys.stdin.isatty():
+        # Без терминала спросить подтверждение не у кого: без --yes отказываем.
+        set_auto_confirm(args.yes)
+        if args.command is not None:
+            run_batch([args.command])
+        elif args.script:
+            with open(args.script, "r", encoding="utf-8") as file:
+                run_batch(file)
+        else:
+            run_batch(sys.stdin)
+        return
+
+    if args.yes:
+        set_auto_confirm(True)
+    set_pager(True)
     welcome()
     run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,253 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from typing import Iterable, Iterator
+
+from ..constants import METRICS_BUCKETS_MS, METRICS_ENV, PHASES
+
+# Реестр метрик процесса. Команда (execute, метод API) открывает профиль;
+# фазы внутри неё (tokenize, parse, load, filter, convert, render, save)
+# замеряются с вычетом вложенных, поэтому сумма фаз не превышает общего
+# времени. По завершении команды профиль добавляется в статистику её типа:
+# число вызовов и ошибок, суммарное и максимальное время, гистограмма
+# задержек, время по фазам и счётчики (кэш, способ доступа, индексы).
+_enabled = os.environ.get(METRICS_ENV, "1") not in ("", "0")
+_commands: dict[str, dict] = {}
+_counters: dict[str, int] = {}
+# Профиль выполняющейся команды и стек открытых фаз.
+_state: dict = {"profile": None, "last": None}
+_stack: list["_Phase"] = []
+_NULL = nullcontext()
+
+
+def set_enabled(enabled: bool) -> None:
+    """Включает или отключает сбор метрик (вызовы в коде не меняются)."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _Phase:
+    """Замер фазы: время без вложенных фаз добавляется в профиль."""
+
+    __slots__ = ("name", "profile", "start", "child")
+
+    def __init__(self, name: str, profile: dict):
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self) -> "_Phase":
+        self.child = 0.0
+        _stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        _stack.pop()
+        if _stack:
+            _stack[-1].child += elapsed
+        phases = self.profile["phases"]
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed - self.child
+
+
+class _Command(_Phase):
+    """Профиль команды верхнего уровня."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_Phase":
+        _state["profile"] = self.profile
+        return super().__enter__()
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        super().__exit__(exc_type, *exc_info)
+        profile = self.profile
+        profile["total"] = time.perf_counter() - self.start + profile["before"]
+        profile["error"] = exc_type is not None
+        _state["profile"] = None
+        _state["last"] = profile
+        if _enabled:
+            _record(profile)
+
+
+def command(name: str, force: bool = False):
+    """
+    Открывает профиль команды name.
+
+    Вложенный вызов (метод API внутри команды CLI) ничего не делает:
+    его фазы попадают в профиль внешней команды. force включает профиль
+    и при отключённом сборе (команда profile).
+    """
+    if (not _enabled and not force) or _state["profile"] is not None:
+        return _NULL
+    profile = {"command": name, "phases": {}, "counters": {}, "before": 0.0}
+    # Время вне замеренных фаз относится к фазе other.
+    return _Command("other", profile)
+
+
+def phase(name: str):
+    """Замеряет фазу текущей команды; вне команды ничего не делает."""
+    profile = _state["profile"]
+    if profile is None:
+        return _NULL
+    return _Phase(name, profile)
+
+
+def add_phase(name: str, seconds: float) -> None:
+    """Добавляет к фазе (и к общему времени) замер до открытия профиля."""
+    profile = _state["profile"]
+    if profile is not None:
+        profile["phases"][name] = profile["phases"].get(name, 0.0) + seconds
+        profile["before"] += seconds
+
+
+def timed(phase_name: str):
+    """Декоратор: весь вызов функции относится к фазе phase_name."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _state["profile"] is None:
+                return func(*args, **kwargs)
+            with phase(phase_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_iter(phase_name: str, items: Iterable) -> Iterator:
+    """
+    Относит к фазе время получения каждого элемента.
+
+    Нужен для ленивых конвейеров: фильтрация select идёт вперемешку с
+    выводом, и замер всего вывода смешал бы обе фазы.
+    """
+    profile = _state["profile"]
+    if profile is None:
+        return iter(items)
+    return _timed_items(_Phase(phase_name, profile), iter(items))
+
+
+def _timed_items(timer: _Phase, items: Iterator) -> Iterator:
+    while True:
+        with timer:
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name: str, value: int = 1) -> None:
+    """Увеличивает счётчик (попадания в кэш, способ доступа, индексы)."""
+    profile = _state["profile"]
+    if profile is not None:
+        counters = profile["counters"]
+        counters[name] = counters.get(name, 0) + value
+    elif _enabled:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _record(profile: dict) -> None:
+    stats = _commands.get(profile["command"])
+    if stats is None:
+        stats = _commands[profile["command"]] = {
+            "count": 0,
+            "errors": 0,
+            "total": 0.0,
+            "max": 0.0,
+            "buckets": [0] * (len(METRICS_BUCKETS_MS) + 1),
+            "phases": {},
+            "counters": {},
+        }
+    elapsed = profile["total"]
+    stats["count"] += 1
+    stats["errors"] += profile["error"]
+    stats["total"] += elapsed
+    stats["max"] = max(stats["max"], elapsed)
+    stats["buckets"][bisect_left(METRICS_BUCKETS_MS, elapsed * 1000)] += 1
+    for name, seconds in profile["phases"].items():
+        stats["phases"][name] = stats["phases"].get(name, 0.0) + seconds
+    for name, value in profile["counters"].items():
+        stats["counters"][name] = stats["counters"].get(name, 0) + value
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def last_profile() -> dict | None:
+    """Возвращает профиль последней завершённой команды."""
+    return _state["last"]
+
+
+def ordered_phases(phases: dict[str, float]) -> list[tuple[str, float]]:
+    """Фазы в порядке конвейера, затем прочие."""
+    known = [(name, phases[name]) for name in PHASES if name in phases]
+    rest = [(name, value) for name, value in phases.items() if name not in PHASES]
+    return known + rest
+
+
+def _percentile(buckets: list[int], total: int, share: float) -> float | None:
+    """Верхняя граница корзины, в которую попадает доля share вызовов."""
+    if not total:
+        return None
+    seen = 0
+    for bound, amount in zip([*METRICS_BUCKETS_MS, None], buckets):
+        seen += amount
+        if seen >= share * total:
+            return bound
+    return None
+
+
+def snapshot() -> dict:
+    """Возвращает накопленную статистику в виде, готовом для JSON."""
+    commands = {}
+    for name, stats in sorted(_commands.items()):
+        labels = [f"<={bound}" for bound in METRICS_BUCKETS_MS] + ["inf"]
+        commands[name] = {
+            "count": stats["count"],
+            "errors": stats["errors"],
+            "total_ms": round(stats["total"] * 1000, 3),
+            "mean_ms": round(stats["total"] * 1000 / stats["count"], 3),
+            "max_ms": round(stats["max"] * 1000, 3),
+            "p50_ms": _percentile(stats["buckets"], stats["count"], 0.5),
+            "p99_ms": _percentile(stats["buckets"], stats["count"], 0.99),
+            "histogram_ms": {
+                label: amount
+                for label, amount in zip(labels, stats["buckets"])
+                if amount
+            },
+            "phases_ms": {
+                phase_name: round(seconds * 1000, 3)
+                for phase_name, seconds in ordered_phases(stats["phases"])
+            },
+            "counters": dict(sorted(stats["counters"].items())),
+        }
+    return {
+        "enabled": _enabled,
+        "commands": commands,
+        "counters": dict(sorted(_counters.items())),
+    }
+
+
+def dump(path: str | None = None) -> str:
+    """Возвращает статистику в JSON и при заданном path пишет её в файл."""
+    text = json.dumps(snapshot(), ensure_ascii=False, indent=2)
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    return text
+
+
+def reset() -> None:
+    """Сбрасывает накопленную статистику."""
+    _commands.clear()
+    _counters.clear()
+    _state["last"] = None
@@ -0,0 +1,126 @@
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from ..constants import (
+    DEFAULT_PAGE_SIZE,
+    FORMAT_JSONL,
+    FORMAT_TABLE,
+    FORMAT_TSV,
+    MSG_RECORDS_NO_MATCH,
+    PAGER_STOP_ANSWERS,
+    PROMPT_NEXT_PAGE,
+)
+
+# Настройки вывода select: формат, размер страницы и пауза между страницами.
+_settings = {"format": FORMAT_TABLE, "page_size": DEFAULT_PAGE_SIZE, "pager": False}
+# Куда складывать записи вместо печати (см. collect_rows).
+_collector: dict = {"result": None}
+
+
+def set_output_format(output_format: str) -> None:
+    """Задаёт формат вывода select: table, tsv или jsonl."""
+    _settings["format"] = output_format
+
+
+def set_page_size(page_size: int) -> None:
+    """Задаёт число записей на странице табличного вывода."""
+    _settings["page_size"] = max(1, page_size)
+
+
+def set_pager(enabled: bool) -> None:
+    """Включает ожидание ввода между страницами (интерактивный режим)."""
+    _settings["pager"] = enabled
+
+
+@contextmanager
+def collect_rows() -> Iterator[dict]:
+    """
+    Перехватывает вывод select: вместо печати записи и имена столбцов
+    складываются в result["rows"] и result["columns"].
+    """
+    result = {"columns": None, "rows": None}
+    previous = _collector["result"]
+    _collector["result"] = result
+    try:
+        yield result
+    finally:
+        _collector["result"] = previous
+
+
+def _pages(rows: Iterable[dict], page_size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while page := list(islice(rows, page_size)):
+        yield page
+
+
+def _render_table(rows: Iterable[dict], headers: list[str]) -> int:
+    """Печатает записи страницами по page_size строк в PrettyTable."""
+    # prettytable и prompt импортируются при первой таблице: сценарии с
+    # выводом tsv/jsonl и команды без вывода их не загружают.
+    import prompt
+    from prettytable import PrettyTable
+
+    count = 0
+    for page in _pages(rows, _settings["page_size"]):
+        if count and _settings["pager"]:
+            answer = prompt.string(PROMPT_NEXT_PAGE)
+            if answer.strip().lower() in PAGER_STOP_ANSWERS:
+                break
+        table = PrettyTable()
+        table.field_names = headers
+        table.add_rows([[row.get(header) for header in headers] for row in page])
+        print(table)
+        count += len(page)
+    if not count:
+        print(MSG_RECORDS_NO_MATCH)
+    return count
+
+
+def _tsv_field(value) -> str:
+    text = "" if value is None else str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _write_tsv(rows: Iterable[dict], headers: list[str], out: TextIO) -> int:
+    out.write("\t".join(headers) + "\n")
+    count = 0
+    for row in rows:
+        out.write("\t".join(_tsv_field(row.get(header)) for header in headers))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def _write_jsonl(rows: Iterable[dict], headers: list[str], out: TextIO) -> int:
+    count = 0
+    for row in rows:
+        record = {header: row.get(header) for header in headers}
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def print_rows(rows: Iterable[dict], headers: list[str]) -> int:
+    """
+    Выводит записи по мере их получения и возвращает их количество.
+
+    tsv и jsonl пишутся построчно в stdout без промежуточных списков;
+    таблица собирается только для одной страницы за раз.
+    """
+    result = _collector["result"]
+    if result is not None:
+        result["columns"] = headers
+        result["rows"] = [
+            {header: row.get(header) for header in headers} for row in rows
+        ]
+        return len(result["rows"])
+
+    output_format = _settings["format"]
+    if output_format == FORMAT_TSV:
+        return _write_tsv(rows, headers, sys.stdout)
+    if output_format == FORMAT_JSONL:
+        return _write_jsonl(rows, headers, sys.stdout)
+    return _render_table(rows, headers)
@@ -1,7 +1,115 @@
 from __future__ import annotations
 
-from ..constants import MSG_INVALID_VALUE, MSG_UNKNOWN_COLUMN
+import re
+import shlex
+from typing import Mapping, NamedTuple
+
+from ..constants import MSG_INVALID_VALUE, MSG_UNKNOWN_COLUMN, STATEMENT_PARAMETER
+from .aggregates import Aggregate
 from .core import convert_value
+from .errors import ColumnNotFoundError, QueryError
+from .metrics import timed
+from .predicates import (
+    COMPARATORS,
+    NODE_AND,
+    NODE_BETWEEN,
+    NODE_CMP,
+    NODE_IN,
+    NODE_NOT,
+    NODE_OR,
+    Condition,
+    make_condition,
+)
+
+# Граница между кортежами multi-row insert: "), (".
+_TUPLE_SEPARATOR = re.compile(r"\)\s*,\s*\(")
+# Элемент списка select: функция(столбец | *) или столбец группировки.
+_AGGREGATE_ITEM = re.compile(
+    r"^(?:(count|sum|min|max|avg)\s*\(\s*(\*|[A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))$",
+    re.IGNORECASE,
+)
+
+
+# Исходный текст токена: подряд идущие строки в кавычках, экранированные
+# символы и символы вне кавычек (границы те же, что у shlex.split).
+_RAW_TOKEN = re.compile(r"""(?:"(?:\\.|[^"\\])*"|'[^']*'|\\.|[^\s"'\\])+""")
+_QUOTING = "\"'\\"
+
+
+class Word(str):
+    """
+    Токен, в исходном тексте которого были кавычки или экранирование.
+
+    Сам токен — значение после shlex, raw — исходный текст. По raw
+    разбор условия отличает значение "and" или ")" от связки и скобки.
+    """
+
+    raw: str
+
+
+def _word(value: str, raw: str) -> str:
+    if value == raw:
+        return value
+    word = Word(value)
+    word.raw = raw
+    return word
+
+
+def _raw(token: str) -> str:
+    return token.raw if isinstance(token, Word) else token
+
+
+def _from_raw(raw: str) -> str:
+    """Токен по исходному тексту с закрытыми кавычками."""
+    if not any(char in raw for char in _QUOTING):
+        return raw
+    return _word(" ".join(shlex.split(raw)), raw)
+
+
+def _keyword(token: str | None) -> str | None:
+    """Ключевое слово в нижнем регистре; None — токена нет или он в кавычках."""
+    if token is None or isinstance(token, Word):
+        return None
+    return token.lower()
+
+
+def _trim(token: str, head: int = 0, tail: int = 0) -> str:
+    """Отрезает от токена символы вне кавычек: head в начале, tail в конце."""
+    raw = _raw(token)
+    return _word(token[head : len(token) - tail], raw[head : len(raw) - tail])
+
+
+def _unquoted_index(raw: str, char: str) -> int:
+    """Позиция первого символа char вне кавычек; -1 — такого нет."""
+    quote = ""
+    escaped = False
+    for index, current in enumerate(raw):
+        if escaped:
+            escaped = False
+        elif current == "\\" and quote != "'":
+            escaped = True
+        elif quote:
+            if current == quote:
+                quote = ""
+        elif current in {'"', "'"}:
+            quote = current
+        elif current == char:
+            return index
+    return -1
+
+
+def split_command(text: str) -> list[str]:
+    """
+    Делит команду на токены как shlex.split.
+
+    Токены, записанные с кавычками или экранированием, возвращаются как
+    Word: условие WHERE считает их только значениями.
+    """
+    tokens = shlex.split(text)
+    raws = _RAW_TOKEN.findall(text)
+    if len(raws) != len(tokens):
+        return tokens
+    return [_word(token, raw) for token, raw in zip(tokens, raws)]
 
 
 def _join_tokens(tokens: list[str]) -> str:
@@ -37,6 +145,34 @@ def _split_values(segment: str) -> list[str]:
         parts.append(tail)
     return parts
 
+def _split_tuples(segment: str) -> list[str]:
+    """
+    Разбивает "(...), (...)" на содержимое скобок с учётом кавычек.
+
+    Границей кортежей считается только ")" , "(" вне кавычек, поэтому
+    одиночные скобки внутри значений не мешают разбору.
+    """
+    if not segment.startswith("(") or not segment.endswith(")"):
+        raise QueryError(MSG_INVALID_VALUE.format(value="insert"))
+    inner = segment[1:-1]
+    tuples: list[str] = []
+    start = 0
+    quote_char = ""
+    for index, char in enumerate(inner):
+        if char in {'"', "'"}:
+            if quote_char == char:
+                quote_char = ""
+            elif not quote_char:
+                quote_char = char
+        elif char == ")" and not quote_char:
+            separator = _TUPLE_SEPARATOR.match(inner, index)
+            if separator:
+                tuples.append(inner[start:index])
+                start = separator.end()
+    tuples.append(inner[start:])
+    return tuples
+
+
 def _split_assignments(segment: str) -> list[str]:
     """Выделяет пары присваиваний из блока SET."""
     assignments: list[str] = []
@@ -86,86 +222,388 @@ def _split_assignments(segment: str) -> list[str]:
         assignments.append(tail)
     return assignments
 
-def parse_insert_tokens(tokens: list[str]) -> tuple[str, list[str]]:
-    """Парсит команду insert и возвращает имя таблицы и значения."""
+@timed("parse")
+def parse_insert_tokens(tokens: list[str]) -> tuple[str, list[list[str]]]:
+    """
+    Парсит команду insert и возвращает имя таблицы и список записей.
+
+    После values может идти несколько кортежей через запятую:
+    insert into t values (...), (...).
+    """
     if len(tokens) < 5:
-        raise ValueError(MSG_INVALID_VALUE.format(value="insert"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="insert"))
 
     if tokens[1].lower() != "into":
-        raise ValueError(MSG_INVALID_VALUE.format(value="insert"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="insert"))
     if tokens[3].lower() != "values":
-        raise ValueError(MSG_INVALID_VALUE.format(value="insert"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="insert"))
 
     table_name = tokens[2]
-    values_str = _join_tokens(tokens[4:])
-    if not values_str.startswith("(") or not values_str.endswith(")"):
-        raise ValueError(MSG_INVALID_VALUE.format(value="insert"))
-
-    values_segment = values_str[1:-1]
-    values = _split_values(values_segment)
-    if not values:
-        raise ValueError(MSG_INVALID_VALUE.format(value="insert"))
-    return table_name, values
-
-
-def parse_select_tokens(tokens: list[str]) -> tuple[str, list[str] | None]:
-    """Парсит команду select и, при наличии, условие where."""
+    rows = []
+    for values_segment in _split_tuples(_join_tokens(tokens[4:])):
+        values = _split_values(values_segment)
+        if not values:
+            raise QueryError(MSG_INVALID_VALUE.format(value="insert"))
+        rows.append(values)
+    return table_name, rows
+
+
+@timed("parse")
+def parse_parameter_tokens(tokens: list[str]) -> list[str]:
+    """Разбирает значения параметров execute: (значение, ...)."""
+    segment = _join_tokens(tokens)
+    if not segment.startswith("(") or not segment.endswith(")"):
+        raise QueryError(MSG_INVALID_VALUE.format(value=segment))
+    return _split_values(segment[1:-1])
+
+
+def _split_limit(tokens: list[str]) -> tuple[list[str], int | None, int]:
+    """Отделяет хвост "limit N [offset M]" или "offset M" от команды."""
+    limit, offset = None, 0
+    if len(tokens) >= 2 and _keyword(tokens[-2]) == "offset":
+        offset = _parse_count(tokens[-1], "offset")
+        tokens = tokens[:-2]
+    if len(tokens) >= 2 and _keyword(tokens[-2]) == "limit":
+        limit = _parse_count(tokens[-1], "limit")
+        tokens = tokens[:-2]
+    return tokens, limit, offset
+
+
+def _parse_count(raw: str, keyword: str) -> int:
+    if not raw.isdigit():
+        raise QueryError(MSG_INVALID_VALUE.format(value=f"{keyword} {raw}"))
+    return int(raw)
+
+
+@timed("parse")
+def parse_select_tokens(
+    tokens: list[str],
+) -> tuple[str, list[str] | None, int | None, int]:
+    """
+    Парсит команду select: имя таблицы, условие where (если есть),
+    limit (None — без ограничения) и offset.
+    """
+    tokens, limit, offset = _split_limit(tokens)
     if len(tokens) < 3:
-        raise ValueError(MSG_INVALID_VALUE.format(value="select"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
     if tokens[1].lower() != "from":
-        raise ValueError(MSG_INVALID_VALUE.format(value="select"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
 
     table_name = tokens[2]
     if len(tokens) == 3:
-        return table_name, None
+        return table_name, None, limit, offset
 
-    if tokens[3].lower() != "where":
-        raise ValueError(MSG_INVALID_VALUE.format(value="select"))
+    if _keyword(tokens[3]) != "where":
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
 
     condition_tokens = tokens[4:]
     if not condition_tokens:
-        raise ValueError(MSG_INVALID_VALUE.format(value="WHERE"))
-    return table_name, condition_tokens
+        raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+    return table_name, condition_tokens, limit, offset
 
 
-def parse_where_condition_tokens(
-    tokens: list[str],
-    type_map: dict[str, str],
-) -> dict[str, object]:
-    """Преобразует условие WHERE в словарь с приведёнными значениями."""
-    if len(tokens) < 3:
-        raise ValueError(MSG_INVALID_VALUE.format(value="WHERE"))
+def parse_aggregate_item(raw: str) -> Aggregate:
+    """Разбирает элемент списка select: count(*), sum(age) или столбец."""
+    match = _AGGREGATE_ITEM.match(raw.strip())
+    if match is None:
+        raise QueryError(MSG_INVALID_VALUE.format(value=raw.strip()))
+    function, argument, column = match.groups()
+    if column is not None:
+        return Aggregate(None, column)
+    return Aggregate(function.lower(), None if argument == "*" else argument)
 
-    column_name = tokens[0]
-    if column_name not in type_map:
-        raise ValueError(MSG_UNKNOWN_COLUMN.format(column=column_name))
 
-    if tokens[1] != "=":
-        raise ValueError(MSG_INVALID_VALUE.format(value="WHERE"))
+@timed("parse")
+def parse_aggregate_tokens(
+    tokens: list[str],
+) -> tuple[str, list[Aggregate], list[str] | None, list[str], int | None, int]:
+    """
+    Парсит агрегатный select:
+    select count(*), sum(age) from <имя> [where ...] [group by столбец, ...].
+
+    Возвращает имя таблицы, элементы списка select, условие where,
+    столбцы группировки, limit и offset.
+    """
+    tokens, limit, offset = _split_limit(tokens)
+    lowered = [_keyword(token) for token in tokens]
+    if "from" not in lowered:
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
+    from_index = lowered.index("from")
+    if from_index + 1 >= len(tokens):
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
+    items = [
+        parse_aggregate_item(raw)
+        for raw in _join_tokens(tokens[1:from_index]).split(",")
+    ]
+    table_name = tokens[from_index + 1]
+    rest, lowered = tokens[from_index + 2 :], lowered[from_index + 2 :]
+
+    group_by: list[str] = []
+    for index in range(len(rest) - 1):
+        if lowered[index] == "group" and lowered[index + 1] == "by":
+            group_by = [
+                column.strip() for column in _join_tokens(rest[index + 2 :]).split(",")
+            ]
+            if not all(group_by):
+                raise QueryError(MSG_INVALID_VALUE.format(value="group by"))
+            rest = rest[:index]
+            break
 
-    value_tokens = tokens[2:]
-    if not value_tokens:
-        raise ValueError(MSG_INVALID_VALUE.format(value="WHERE"))
+    if not rest:
+        return table_name, items, None, group_by, limit, offset
+    if _keyword(rest[0]) != "where":
+        raise QueryError(MSG_INVALID_VALUE.format(value="select"))
+    condition_tokens = rest[1:]
+    if not condition_tokens:
+        raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+    return table_name, items, condition_tokens, group_by, limit, offset
+
+
+_GLUED_COLUMN = re.compile(r"^([A-Za-z_]\w*)(<=|>=|!=|<>|=|<|>)(.*)$")
+_GLUED_OPERATOR = re.compile(r"^(<=|>=|!=|<>|=|<|>)(.+)$")
+_CONNECTIVES = {"and", "or"}
+
+
+class Parameter(NamedTuple):
+    """Место параметра "?" в дереве условия подготовленной команды."""
+
+    column_type: str
+
+
+class _WhereParser:
+    """
+    Рекурсивный спуск по токенам условия WHERE.
+
+    Грамматика (ключевые слова без учёта регистра):
+        expr    := term (OR term)*
+        term    := factor (AND factor)*
+        factor  := NOT factor | "(" expr ")" | predicate
+        predicate := column op value
+                   | column [NOT] IN "(" value, ... ")"
+                   | column [NOT] BETWEEN value AND value
+    """
+
+    def __init__(
+        self,
+        tokens: list[str],
+        type_map: Mapping[str, str],
+        parameters: bool = False,
+    ):
+        self.tokens = list(tokens)
+        self.position = 0
+        self.depth = 0
+        self.type_map = type_map
+        self.parameters = parameters
+
+    def error(self) -> QueryError:
+        return QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+
+    def peek(self) -> str | None:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise self.error()
+        self.position += 1
+        return token
+
+    def push(self, token: str) -> None:
+        """Возвращает в поток отщеплённую часть токена."""
+        self.tokens.insert(self.position, token)
+
+    def peek_keyword(self) -> str | None:
+        return _keyword(self.peek())
+
+    def split_closing(self, token: str) -> str:
+        """Отделяет от значения закрывающие скобки открытых групп (вне кавычек)."""
+        raw = _raw(token)
+        closing = min(len(raw) - len(raw.rstrip(")")), self.depth)
+        for _ in range(closing):
+            self.push(")")
+        return _trim(token, tail=closing)
+
+    def parse(self) -> tuple:
+        tree = self.parse_or()
+        if self.peek() is not None:
+            raise self.error()
+        return tree
+
+    def parse_or(self) -> tuple:
+        children = [self.parse_and()]
+        while self.peek_keyword() == "or":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else (NODE_OR, *children)
+
+    def parse_and(self) -> tuple:
+        children = [self.parse_not()]
+        while self.peek_keyword() == "and":
+            self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else (NODE_AND, *children)
+
+    def parse_not(self) -> tuple:
+        token = self.take()
+        if _keyword(token) == "not":
+            return (NODE_NOT, self.parse_not())
+        if _raw(token).startswith("("):
+            if len(token) > 1:
+                self.push(_trim(token, head=1))
+            self.depth += 1
+            tree = self.parse_or()
+            if self.take() != ")":
+                raise self.error()
+            self.depth -= 1
+            return tree
+        return self.parse_predicate(token)
+
+    def value(self, token: str, column_type: str) -> object:
+        """Приводит значение к типу столбца; "?" без кавычек — параметр."""
+        if self.parameters and _raw(token) == STATEMENT_PARAMETER:
+            return Parameter(column_type)
+        return convert_value(str(token), column_type)
+
+    def column_type(self, column: str) -> str:
+        if column not in self.type_map:
+            raise ColumnNotFoundError(MSG_UNKNOWN_COLUMN.format(column=column))
+        return self.type_map[column]
+
+    def parse_predicate(self, token: str) -> tuple:
+        # Столбец и оператор ищутся в исходном тексте: оператор в
+        # кавычках — значение, а не сравнение.
+        glued = _GLUED_COLUMN.match(_raw(token))
+        if glued:
+            column, op, rest = glued.groups()
+            if rest:
+                self.push(_trim(token, head=len(column) + len(op)))
+        else:
+            column = token
+            op = self.take()
+            glued_op = _GLUED_OPERATOR.match(_raw(op))
+            if glued_op and op not in COMPARATORS:
+                operator = glued_op.group(1)
+                self.push(_trim(op, head=len(operator)))
+                op = operator
+            op = _raw(op)
+        column_type = self.column_type(column)
+
+        negate = op.lower() == "not"
+        if negate:
+            op = _raw(self.take())
+        keyword = op.lower()
+        if keyword == "in":
+            tree = (NODE_IN, column, self.parse_list(column_type))
+        elif keyword == "between":
+            low = self.value(self.split_closing(self.take()), column_type)
+            if _keyword(self.take()) != "and":
+                raise self.error()
+            high = self.value(self.split_closing(self.take()), column_type)
+            tree = (NODE_BETWEEN, column, low, high)
+        elif op in COMPARATORS and not negate:
+            tree = (NODE_CMP, column, op, self.parse_value(column_type))
+        else:
+            raise self.error()
+        return (NODE_NOT, tree) if negate else tree
+
+    def parse_value(self, column_type: str) -> object:
+        """Собирает значение до связки AND/OR или закрывающей скобки."""
+        parts = []
+        while True:
+            token = self.peek()
+            if token is None or self.peek_keyword() in _CONNECTIVES:
+                break
+            if _raw(token) == ")":
+                break
+            self.take()
+            stripped = self.split_closing(token)
+            if stripped:
+                parts.append(stripped)
+            if _raw(stripped) != _raw(token):
+                break
+        if not parts:
+            raise self.error()
+        if len(parts) == 1:
+            return self.value(parts[0], column_type)
+        return self.value(_join_tokens(parts), column_type)
+
+    def parse_list(self, column_type: str) -> tuple:
+        """
+        Разбирает список значений IN (a, b, ...).
+
+        Список собирается из исходного текста токенов, поэтому запятые и
+        скобки внутри кавычек остаются частью значений.
+        """
+        parts = []
+        while True:
+            raw = _raw(self.take())
+            closing = _unquoted_index(raw, ")")
+            if closing >= 0:
+                parts.append(raw[:closing])
+                if raw[closing + 1 :]:
+                    self.push(_from_raw(raw[closing + 1 :]))
+                break
+            parts.append(raw)
+        segment = _join_tokens(parts)
+        if not segment.startswith("("):
+            raise self.error()
+        values = _split_values(segment[1:])
+        if not values:
+            raise self.error()
+        return tuple(self.value(_from_raw(value), column_type) for value in values)
+
+
+@timed("parse")
+def parse_where_condition_tokens(
+    tokens: list[str],
+    type_map: Mapping[str, str],
+) -> Condition:
+    """
+    Разбирает условие WHERE и компилирует его в проверку записи.
+
+    Поддерживаются =, !=, <>, <, <=, >, >=, IN, BETWEEN, NOT, AND, OR и
+    скобки. Значения приводятся к типам столбцов один раз при разборе.
+    """
+    if not tokens:
+        raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+    tree = _WhereParser(tokens, type_map).parse()
+    return make_condition(tree)
+
+
+@timed("parse")
+def parse_where_tree_tokens(
+    tokens: list[str],
+    type_map: Mapping[str, str],
+    parameters: bool = False,
+) -> tuple:
+    """
+    Разбирает условие WHERE в дерево без компиляции.
 
-    value_raw = _join_tokens(value_tokens)
-    converted = convert_value(value_raw, type_map[column_name])
-    return {column_name: converted}
+    С parameters=True значение "?" становится Parameter: его подставляют
+    и приводят к типу столбца при выполнении подготовленной команды.
+    """
+    if not tokens:
+        raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
+    return _WhereParser(tokens, type_map, parameters).parse()
 
 
+@timed("parse")
 def parse_update_tokens(
     tokens: list[str],
 ) -> tuple[str, dict[str, str], list[str] | None]:
     """Парсит команду update, возвращая SET и WHERE части."""
     if len(tokens) < 4:
-        raise ValueError(MSG_INVALID_VALUE.format(value="update"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="update"))
 
     table_name = tokens[1]
     if tokens[2].lower() != "set":
-        raise ValueError(MSG_INVALID_VALUE.format(value="update"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="update"))
 
     where_index = None
     for index, token in enumerate(tokens):
-        if token.lower() == "where":
+        if _keyword(token) == "where":
             where_index = index
             break
 
@@ -178,36 +616,37 @@ def parse_update_tokens(
 
     assignments_raw = _split_assignments(_join_tokens(set_tokens))
     if not assignments_raw:
-        raise ValueError(MSG_INVALID_VALUE.format(value="SET"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="SET"))
 
     set_values: dict[str, str] = {}
     for assignment in assignments_raw:
         if "=" not in assignment:
-            raise ValueError(MSG_INVALID_VALUE.format(value="SET"))
+            raise QueryError(MSG_INVALID_VALUE.format(value="SET"))
         column_part, value_part = assignment.split("=", 1)
         column_name = column_part.strip()
         value_raw = value_part.strip()
         if not column_name or not value_raw:
-            raise ValueError(MSG_INVALID_VALUE.format(value="SET"))
+            raise QueryError(MSG_INVALID_VALUE.format(value="SET"))
         set_values[column_name] = value_raw
 
     return table_name, set_values, condition_tokens
 
 
+@timed("parse")
 def parse_delete_tokens(tokens: list[str]) -> tuple[str, list[str]]:
     """Парсит команду delete и извлекает условие WHERE."""
     if len(tokens) < 5:
-        raise ValueError(MSG_INVALID_VALUE.format(value="delete"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="delete"))
 
     if tokens[1].lower() != "from":
-        raise ValueError(MSG_INVALID_VALUE.format(value="delete"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="delete"))
 
     table_name = tokens[2]
-    if tokens[3].lower() != "where":
-        raise ValueError(MSG_INVALID_VALUE.format(value="delete"))
+    if _keyword(tokens[3]) != "where":
+        raise QueryError(MSG_INVALID_VALUE.format(value="delete"))
 
     condition_tokens = tokens[4:]
     if not condition_tokens:
-        raise ValueError(MSG_INVALID_VALUE.format(value="WHERE"))
+        raise QueryError(MSG_INVALID_VALUE.format(value="WHERE"))
 
     return table_name, condition_tokens
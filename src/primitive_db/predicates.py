@@ -0,0 +1,172 @@
+import operator
+from typing import Callable, NamedTuple
+
+# Узлы дерева условия WHERE (кортежи, чтобы дерево было хэшируемым ключом):
+#   ("cmp", столбец, оператор, значение)
+#   ("in", столбец, (значение, ...))
+#   ("between", столбец, нижняя граница, верхняя граница)
+#   ("and", узел, узел, ...), ("or", узел, узел, ...), ("not", узел)
+NODE_CMP = "cmp"
+NODE_IN = "in"
+NODE_BETWEEN = "between"
+NODE_AND = "and"
+NODE_OR = "or"
+NODE_NOT = "not"
+
+COMPARATORS: dict[str, Callable[[object, object], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+RANGE_OPERATORS = {"<", "<=", ">", ">="}
+
+
+class Condition(NamedTuple):
+    """Разобранное условие WHERE и скомпилированная проверка записи."""
+
+    tree: tuple
+    matches: Callable[[dict], bool]
+
+
+def _compile(tree: tuple) -> Callable[[dict], bool]:
+    """Превращает дерево условия в одну функцию record -> bool."""
+    kind = tree[0]
+
+    if kind == NODE_CMP:
+        _, column, op, value = tree
+        if op == "=":
+            return lambda record: record.get(column) == value
+        compare = COMPARATORS[op]
+        if op not in RANGE_OPERATORS:
+            return lambda record: compare(record.get(column), value)
+
+        def check_range(record: dict) -> bool:
+            field = record.get(column)
+            return field is not None and compare(field, value)
+
+        return check_range
+
+    if kind == NODE_IN:
+        _, column, values = tree
+        allowed = frozenset(values)
+        return lambda record: record.get(column) in allowed
+
+    if kind == NODE_BETWEEN:
+        _, column, low, high = tree
+
+        def check_between(record: dict) -> bool:
+            field = record.get(column)
+            return field is not None and low <= field <= high
+
+        return check_between
+
+    if kind == NODE_NOT:
+        inner = _compile(tree[1])
+        return lambda record: not inner(record)
+
+    parts = [_compile(child) for child in tree[1:]]
+    if kind == NODE_AND:
+        if len(parts) == 2:
+            first, second = parts
+            return lambda record: first(record) and second(record)
+        return lambda record: all(part(record) for part in parts)
+    if len(parts) == 2:
+        first, second = parts
+        return lambda record: first(record) or second(record)
+    return lambda record: any(part(record) for part in parts)
+
+
+def make_condition(tree: tuple) -> Condition:
+    """Компилирует дерево условия один раз перед просмотром таблицы."""
+    return Condition(tree, _compile(tree))
+
+
+def as_condition(where_clause) -> Condition | None:
+    """Приводит условие к Condition; словарь трактуется как AND равенств."""
+    if not where_clause:
+        return None
+    if isinstance(where_clause, Condition):
+        return where_clause
+
+    comparisons = tuple(
+        (NODE_CMP, column, "=", value)
+        for column, value in sorted(where_clause.items())
+    )
+    if len(comparisons) == 1:
+        return make_condition(comparisons[0])
+    return make_condition((NODE_AND, *comparisons))
+
+
+def plan_ids(
+    tree: tuple,
+    leaf_ids: Callable[[tuple], set | None],
+) -> set | None:
+    """
+    Оценивает множество ID, которым может соответствовать условие.
+
+    leaf_ids отвечает за отдельные сравнения (обычно через индексы) и
+    возвращает None, если ответить без просмотра таблицы нельзя. Для AND
+    достаточно одного известного множества, для OR нужны все.
+    """
+    kind = tree[0]
+    if kind == NODE_AND:
+        known = [
+            ids
+            for ids in (plan_ids(child, leaf_ids) for child in tree[1:])
+            if ids is not None
+        ]
+        if not known:
+            return None
+        return set.intersection(*known)
+    if kind == NODE_OR:
+        result: set = set()
+        for child in tree[1:]:
+            ids = plan_ids(child, leaf_ids)
+            if ids is None:
+                return None
+            result |= ids
+        return result
+    if kind == NODE_NOT:
+        return None
+    return leaf_ids(tree)
+
+
+def key_range(tree: tuple, column: str) -> tuple | None:
+    """
+    Границы (low, high) значений column, которые допускает условие.
+
+    Учитываются сравнения и between по column на верхнем уровне и под
+    AND; None в границе — открытый конец, None вместо пары — условие
+    столбец не ограничивает. Границы нестрогие: условие всё равно
+    проверяется по записям.
+    """
+    kind = tree[0]
+    if kind == NODE_AND:
+        low = high = None
+        found = False
+        for child in tree[1:]:
+            bounds = key_range(child, column)
+            if bounds is None:
+                continue
+            found = True
+            if bounds[0] is not None:
+                low = bounds[0] if low is None else max(low, bounds[0])
+            if bounds[1] is not None:
+                high = bounds[1] if high is None else min(high, bounds[1])
+        return (low, high) if found else None
+    if kind not in (NODE_CMP, NODE_BETWEEN) or tree[1] != column:
+        return None
+    if kind == NODE_BETWEEN:
+        return tree[2], tree[3]
+    operator_name, value = tree[2], tree[3]
+    if operator_name == "=":
+        return value, value
+    if operator_name in ("<", "<="):
+        return None, value
+    if operator_name in (">", ">="):
+        return value, None
+    return None
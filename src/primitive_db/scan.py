@@ -0,0 +1,134 @@
+import atexit
+import os
+from itertools import compress
+from typing import Sequence
+
+from ..constants import (
+    PARALLEL_SCAN_MIN_ROWS,
+    PARALLEL_SCAN_MIN_ROWS_ENV,
+    SCAN_WORKERS_ENV,
+)
+from .predicates import make_condition
+
+# Параллельный полный просмотр. Таблица делится на непрерывные части по
+# числу процессов; каждый процесс проверяет условие на своей части и
+# возвращает позиции подходящих записей. Процессы пула запускаются через
+# fork и получают таблицу из памяти родителя, поэтому записи не
+# сериализуются; передаётся только дерево условия, которое процесс
+# компилирует сам. Унаследованные дескрипторы блокировок и журнала
+# процесс пула сразу закрывает (_init_worker): иначе блокировки, снятые
+# родителем, оставались бы взятыми, пока жив пул. Пул живёт до конца
+# процесса (останавливается при выходе) и переиспользуется, пока
+# просматривается та же неизменённая таблица; после записи в таблицу
+# (table_changed) или при просмотре другой он запускается заново. Позиции
+# частей склеиваются по порядку, то есть в порядке таблицы (по
+# возрастанию ID). Без fork (Windows) и на одном процессоре просмотр идёт
+# в одном процессе. concurrent.futures и multiprocessing импортируются
+# только при первом параллельном просмотре: они заметно удлиняют запуск
+# CLI.
+_FORK = hasattr(os, "fork")
+_CPUS = os.cpu_count() or 1
+_workers = int(os.environ.get(SCAN_WORKERS_ENV, _CPUS))
+_min_rows = int(os.environ.get(PARALLEL_SCAN_MIN_ROWS_ENV, PARALLEL_SCAN_MIN_ROWS))
+# Таблица, которую видят процессы пула (после fork), и сам пул.
+_shared: dict = {}
+_pool: dict = {"executor": None, "workers": 0, "stale": False}
+
+
+def set_scan_workers(workers: int) -> None:
+    """Задаёт число процессов просмотра (0 или 1 — без пула)."""
+    global _workers
+    _workers = workers
+
+
+def set_scan_threshold(rows: int) -> None:
+    """Задаёт размер таблицы, начиная с которого просмотр идёт в пуле."""
+    global _min_rows
+    _min_rows = rows
+
+
+def use_parallel(rows: int) -> bool:
+    """Пойдёт ли просмотр таблицы из rows записей в пуле процессов."""
+    return (
+        _FORK
+        and _CPUS > 1
+        and _workers > 1
+        and rows >= max(_min_rows, _workers)
+    )
+
+
+def table_changed() -> None:
+    """
+    Отмечает, что записи таблиц изменились.
+
+    Процессы пула видят таблицу такой, какой она была при их запуске,
+    поэтому следующий параллельный просмотр запустит пул заново.
+    """
+    _pool["stale"] = True
+
+
+def shutdown_pool() -> None:
+    """Останавливает процессы пула просмотра, если они запущены."""
+    executor = _pool["executor"]
+    if executor is not None:
+        executor.shutdown()
+    _pool.update(executor=None, workers=0, stale=False)
+    _shared.clear()
+
+
+atexit.register(shutdown_pool)
+
+
+def _init_worker() -> None:
+    """Закрывает в процессе пула унаследованные блокировки и журнал."""
+    from .locks import close_inherited as close_locks
+    from .wal import close_inherited as close_wal
+
+    close_locks()
+    close_wal()
+
+
+def _executor(rows: Sequence[dict]):
+    """Пул, чьи процессы видят rows; запускается, только если прежний не годится."""
+    if (
+        _pool["executor"] is not None
+        and not _pool["stale"]
+        and _pool["workers"] == _workers
+        and _shared.get("rows") is rows
+    ):
+        return _pool["executor"]
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    shutdown_pool()
+    _shared["rows"] = rows
+    executor = ProcessPoolExecutor(
+        _workers, mp_context=get_context("fork"), initializer=_init_worker
+    )
+    _pool.update(executor=executor, workers=_workers)
+    return executor
+
+
+def _scan_chunk(tree: tuple, start: int, stop: int) -> list[int]:
+    """Позиции подходящих записей в части [start, stop) (в дочернем процессе)."""
+    matches = make_condition(tree).matches
+    rows = _shared["rows"]
+    return list(compress(range(start, stop), map(matches, rows[start:stop])))
+
+
+def parallel_positions(rows: Sequence[dict], tree: tuple) -> list[int] | None:
+    """
+    Возвращает позиции записей rows, подходящих под условие tree.
+
+    None — таблица меньше порога или пул недоступен; тогда вызывающий
+    код просматривает её сам.
+    """
+    total = len(rows)
+    if not use_parallel(total):
+        return None
+    executor = _executor(rows)
+    step = -(-total // _workers)
+    starts = range(0, total, step)
+    stops = [min(start + step, total) for start in starts]
+    chunks = executor.map(_scan_chunk, [tree] * len(starts), starts, stops)
+    return [position for chunk in chunks for position in chunk]
@@ -0,0 +1,212 @@
+import json
+import os
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Iterable, Iterator
+
+from ..constants import ID_NAME
+
+# Сегментированная таблица: записи разбиты на файлы по диапазонам ID,
+# а манифест <имя>.manifest.json перечисляет сегменты по возрастанию:
+#   {"segment_rows": N, "version": v, "count": всего записей,
+#    "segments": [{"segment": k, "file": ..., "first_id": ...,
+#                  "last_id": ..., "rows": ...}, ...],
+#    "garbage": [файлы, заменённые версией v]}
+# Сегмент k хранит записи с ID от k * N + 1 до (k + 1) * N. Изменённый
+# сегмент пишется в новый файл, и только затем атомарно заменяется
+# манифест, поэтому читатель всегда видит согласованный набор файлов.
+
+
+def segment_of(record_id: int, segment_rows: int) -> int:
+    """Номер сегмента, в который попадает запись с ID record_id."""
+    return (record_id - 1) // segment_rows
+
+
+def read_manifest(path: str) -> dict | None:
+    """Читает манифест таблицы; None — его нет или он повреждён."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(manifest, dict) or "segments" not in manifest:
+        return None
+    return manifest
+
+
+def _read_segment(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class SegmentedTable(Sequence):
+    """
+    Таблица из сегментов, читаемых по мере обращения.
+
+    Открытие читает только манифест: len() берётся из него, сегмент
+    разбирается при первом обращении к его записям. Поиск по ID и по
+    диапазону ID читает только сегменты, в чьи границы попадают ID.
+
+    Таблицу можно изменять на месте: вставка дописывает записи в
+    последний сегмент (или заводит новые), удаление читает только
+    сегменты с удаляемыми ID, а обновлённые записи — это словари уже
+    прочитанных сегментов. Остальные сегменты так и не читаются, а при
+    сохранении переписываются только изменённые (segment).
+    """
+
+    def __init__(self, directory: str, manifest: dict):
+        self._directory = directory
+        self._segment_rows = manifest["segment_rows"]
+        self._segments = [dict(segment) for segment in manifest["segments"]]
+        self._loaded: dict[int, list[dict]] = {}
+        self._reindex()
+
+    def _reindex(self) -> None:
+        """Пересчитывает позиции и границы сегментов по их описаниям."""
+        self._starts = list(
+            accumulate((segment["rows"] for segment in self._segments), initial=0)
+        )
+        self._first_ids = [segment["first_id"] for segment in self._segments]
+        self._count = self._starts[-1]
+
+    def _touch(self, index: int) -> None:
+        """Обновляет описание сегмента после изменения его записей."""
+        rows = self._loaded[index]
+        segment = self._segments[index]
+        segment["rows"] = len(rows)
+        # У опустевшего сегмента остаются прежние границы: они лишь
+        # упорядочивают сегменты для бинарного поиска.
+        if rows:
+            segment.update(first_id=rows[0][ID_NAME], last_id=rows[-1][ID_NAME])
+
+    def _indexes_of(self, ids: Iterable[int]) -> list[int]:
+        """Номера (по порядку) сегментов, в границы которых попадают ID."""
+        indexes = {bisect_right(self._first_ids, record_id) - 1 for record_id in ids}
+        indexes.discard(-1)
+        return sorted(indexes)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _rows(self, index: int) -> list[dict]:
+        rows = self._loaded.get(index)
+        if rows is None:
+            path = os.path.join(self._directory, self._segments[index]["file"])
+            rows = self._loaded[index] = _read_segment(path)
+        return rows
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(self._count))]
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        index = bisect_right(self._starts, position) - 1
+        return self._rows(index)[position - self._starts[index]]
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self._segments)):
+            yield from self._rows(index)
+
+    def _covering(self, low=None, high=None) -> range:
+        """Номера сегментов, границы ID которых пересекают [low, high]."""
+        start = 0
+        if low is not None:
+            start = bisect_left(
+                self._segments, low, key=lambda segment: segment["last_id"]
+            )
+        stop = len(self._segments)
+        if high is not None:
+            stop = bisect_right(self._first_ids, high)
+        return range(start, max(start, stop))
+
+    def count_in_range(self, low=None, high=None) -> int:
+        """Число записей в сегментах, пересекающих диапазон ID (по манифесту)."""
+        covering = self._covering(low, high)
+        return sum(self._segments[index]["rows"] for index in covering)
+
+    def rows_in_range(self, low=None, high=None) -> Iterator[dict]:
+        """
+        Записи сегментов, пересекающих диапазон ID [low, high].
+
+        Границы включительные, None — открытый конец. Записи соседних
+        с диапазоном ID из тех же сегментов тоже попадают в выдачу:
+        условие проверяется дальше.
+        """
+        for index in self._covering(low, high):
+            yield from self._rows(index)
+
+    def rows_by_ids(self, ids: Iterable[int]) -> list[dict]:
+        """Возвращает записи с указанными ID в порядке таблицы."""
+        wanted = {record_id for record_id in ids if isinstance(record_id, int)}
+        return [
+            row
+            for index in self._indexes_of(wanted)
+            for row in self._rows(index)
+            if row.get(ID_NAME) in wanted
+        ]
+
+    def segment(self, number: int) -> list[dict]:
+        """Записи сегмента с номером number; пустой список — его нет."""
+        index = bisect_left(self._segments, number, key=lambda item: item["segment"])
+        if index < len(self._segments) and self._segments[index]["segment"] == number:
+            return self._rows(index)
+        return []
+
+    def append(self, record: dict) -> None:
+        """Дописывает запись с ID больше существующих."""
+        self.extend((record,))
+
+    def extend(self, records: Iterable[dict]) -> None:
+        """
+        Дописывает записи с ID больше существующих.
+
+        Читается только последний сегмент, если в его диапазон попадают
+        новые ID; для следующих диапазонов заводятся новые сегменты.
+        """
+        touched = set()
+        for record in records:
+            number = segment_of(record[ID_NAME], self._segment_rows)
+            if not self._segments or self._segments[-1]["segment"] != number:
+                self._segments.append(
+                    {
+                        "segment": number,
+                        "file": None,
+                        "first_id": record[ID_NAME],
+                        "last_id": record[ID_NAME],
+                        "rows": 0,
+                    }
+                )
+                self._loaded[len(self._segments) - 1] = []
+            index = len(self._segments) - 1
+            self._rows(index).append(record)
+            touched.add(index)
+        for index in touched:
+            self._touch(index)
+        self._reindex()
+
+    def remove_ids(self, ids: Iterable[int]) -> None:
+        """Удаляет записи с указанными ID, читая только их сегменты."""
+        wanted = {record_id for record_id in ids if isinstance(record_id, int)}
+        for index in self._indexes_of(wanted):
+            rows = self._rows(index)
+            rows[:] = [row for row in rows if row.get(ID_NAME) not in wanted]
+            self._touch(index)
+        self._reindex()
+
+    def __delitem__(self, position) -> None:
+        records = self[position]
+        if isinstance(records, dict):
+            records = [records]
+        self.remove_ids(record.get(ID_NAME) for record in records)
+
+    def to_rows(self) -> list[dict]:
+        """Разбирает все сегменты в изменяемый список."""
+        return list(self)
+
+
+def read_segments(directory: str, manifest: dict) -> SegmentedTable:
+    """Открывает сегментированную таблицу для ленивого чтения."""
+    return SegmentedTable(directory, manifest)
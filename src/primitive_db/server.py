@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+
+from ..constants import (
+    MSG_SERVER_BAD_REQUEST,
+    MSG_SERVER_LISTENING,
+    MSG_SERVER_STOPPED,
+    MSG_TRANSACTION_IDLE,
+    MSG_UNEXPECTED_ERROR,
+    SERVER_LINE_LIMIT,
+    TRANSACTION_IDLE_TIMEOUT,
+    TRANSACTION_IDLE_TIMEOUT_ENV,
+)
+from .buffer_pool import in_transaction
+from .engine import execute, shutdown
+from .output import collect_rows
+
+# Протокол: по одному JSON-объекту на строку в обе стороны.
+#   запрос:  {"command": "select from users where age > 18", "id": 1}
+#   ответ:   {"ok": true, "id": 1, "messages": [...],
+#             "columns": [...] | null, "rows": [...] | null, "closed": false}
+#   ошибка команды: тот же ответ с "ok": false и "error": "..." (сообщение)
+#   ошибка протокола: {"ok": false, "id": ..., "error": "..."}
+
+_transaction_timeout = float(
+    os.environ.get(TRANSACTION_IDLE_TIMEOUT_ENV, TRANSACTION_IDLE_TIMEOUT)
+)
+
+
+def run_command(command: str) -> dict:
+    """
+    Выполняет команду и собирает её вывод в JSON-ответ.
+
+    Если команда сообщила об ошибке, ответ содержит "ok": false и текст
+    ошибки в "error"; напечатанные строки остаются в messages.
+    """
+    buffer = io.StringIO()
+    errors: list[str] = []
+    with contextlib.redirect_stdout(buffer), collect_rows() as result:
+        alive = execute(command, errors)
+    response = {
+        "ok": not errors,
+        "messages": buffer.getvalue().splitlines(),
+        "columns": result["columns"],
+        "rows": result["rows"],
+        "closed": not alive,
+    }
+    if errors:
+        response["error"] = "\n".join(errors)
+    return response
+
+
+def _encode(response: dict) -> bytes:
+    return json.dumps(response, ensure_ascii=False).encode() + b"\n"
+
+
+def _parse_request(line: bytes) -> tuple[dict, str | None]:
+    """Возвращает запрос и текст команды (None — запрос некорректен)."""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return {}, None
+    if not isinstance(request, dict) or not isinstance(request.get("command"), str):
+        return {}, None
+    return request, request["command"]
+
+
+async def _handle(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    engine_lock: asyncio.Lock,
+) -> None:
+    """
+    Обслуживает одно соединение.
+
+    Команды всех соединений выполняются по очереди под engine_lock.
+    Соединение, открывшее транзакцию, держит его до commit/rollback.
+    При обрыве связи или простое дольше таймаута транзакция отменяется,
+    чтобы остальные соединения не ждали бесконечно.
+    """
+    owns_transaction = False
+    try:
+        while True:
+            timeout = _transaction_timeout if owns_transaction else None
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                message = MSG_TRANSACTION_IDLE.format(seconds=timeout)
+                writer.write(_encode({"ok": False, "error": message, "closed": True}))
+                await writer.drain()
+                break
+            if not line:
+                break
+            request, command = _parse_request(line)
+            if command is None:
+                response = {"ok": False, "error": MSG_SERVER_BAD_REQUEST}
+            else:
+                if not owns_transaction:
+                    await engine_lock.acquire()
+                try:
+                    response = run_command(command)
+                except Exception as error:
+                    response = {
+                        "ok": False,
+                        "error": MSG_UNEXPECTED_ERROR.format(error=error),
+                    }
+                finally:
+                    owns_transaction = in_transaction()
+                    if not owns_transaction:
+                        engine_lock.release()
+            if "id" in request:
+                response["id"] = request["id"]
+            writer.write(_encode(response))
+            await writer.drain()
+            if response.get("closed"):
+                break
+    except ConnectionError:
+        pass
+    finally:
+        if owns_transaction:
+            run_command("rollback")
+            engine_lock.release()
+        writer.close()
+
+
+async def serve(
+    socket_path: str | None = None,
+    host: str | None = None,
+    port: int | None = None,
+) -> None:
+    """Принимает соединения на Unix-сокете или TCP-порту до SIGINT/SIGTERM."""
+    engine_lock = asyncio.Lock()
+
+    async def handler(reader, writer):
+        await _handle(reader, writer, engine_lock)
+
+    if socket_path is not None:
+        server = await asyncio.start_unix_server(
+            handler,
+            path=socket_path,
+            limit=SERVER_LINE_LIMIT,
+        )
+        address = socket_path
+    else:
+        server = await asyncio.start_server(
+            handler,
+            host,
+            port,
+            limit=SERVER_LINE_LIMIT,
+        )
+        address = f"{host}:{port}"
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    print(MSG_SERVER_LISTENING.format(address=address), flush=True)
+    async with server:
+        await stop.wait()
+
+
+def run_server(
+    socket_path: str | None = None,
+    host: str | None = None,
+    port: int | None = None,
+) -> None:
+    """
+    Запускает сервер: таблицы остаются в памяти между запросами.
+
+    При остановке сервер сбрасывает изменения на диск и удаляет сокет.
+    """
+    try:
+        asyncio.run(serve(socket_path, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        print(MSG_SERVER_STOPPED)
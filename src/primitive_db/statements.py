@@ -0,0 +1,216 @@
+import os
+from collections import OrderedDict
+from typing import Iterator, Mapping, NamedTuple
+
+from ..constants import (
+    MSG_PARAMETERS_MISMATCH,
+    MSG_STATEMENT_KIND,
+    MSG_STATEMENT_NOT_FOUND,
+    PLAN_CACHE_SIZE,
+    PLAN_CACHE_SIZE_ENV,
+    STATEMENT_PARAMETER,
+)
+from . import metrics
+from .aggregates import Aggregate
+from .buffer_pool import get_metadata
+from .core import convert_value, get_schema
+from .errors import QueryError
+from .parser import (
+    Parameter,
+    parse_aggregate_tokens,
+    parse_delete_tokens,
+    parse_insert_tokens,
+    parse_select_tokens,
+    parse_update_tokens,
+    parse_where_tree_tokens,
+)
+from .predicates import Condition, make_condition
+
+# Разобранная команда insert/select/update/delete. Разбор дорогой
+# (shlex, разбиение значений, приведение констант условия к типам
+# столбцов), поэтому он хранится:
+#   - в LRU-кэше по нормализованному тексту команды — повтор той же
+#     строки сразу переходит к выполнению;
+#   - под именем после prepare — execute только подставляет параметры.
+# Условие разобрано под схему types; если схема таблицы изменилась
+# (get_schema вернул другой объект), команда разбирается заново.
+
+STATEMENT_COMMANDS = ("insert", "select", "update", "delete")
+
+_plans: OrderedDict[str, "Statement"] = OrderedDict()
+_plan_cache_size = int(os.environ.get(PLAN_CACHE_SIZE_ENV, PLAN_CACHE_SIZE))
+_prepared: dict[str, "Statement"] = {}
+
+
+class Statement(NamedTuple):
+    """Разобранная команда, готовая к выполнению."""
+
+    kind: str  # insert | select | aggregate | update | delete
+    tokens: tuple[str, ...]
+    table: str
+    types: Mapping[str, str]
+    rows: list[list[str]] | None = None
+    values: dict[str, str] | None = None
+    items: list[Aggregate] | None = None
+    group_by: list[str] | None = None
+    where: tuple | None = None
+    condition: Condition | None = None
+    limit: int | None = None
+    offset: int = 0
+    parameters: int = 0
+    prepared: bool = False
+
+
+def set_plan_cache_size(size: int) -> None:
+    """Задаёт число команд в кэше разбора; 0 отключает кэш."""
+    global _plan_cache_size
+    _plan_cache_size = max(0, size)
+    while len(_plans) > _plan_cache_size:
+        _plans.popitem(last=False)
+
+
+def cached_plan(key: str) -> Statement | None:
+    """Возвращает разобранную команду из кэша или None."""
+    statement = _plans.get(key)
+    if statement is not None:
+        _plans.move_to_end(key)
+    return statement
+
+
+def remember_plan(key: str, statement: Statement) -> None:
+    """Кладёт разобранную команду в кэш, вытесняя самую давнюю."""
+    if not _plan_cache_size:
+        return
+    _plans[key] = statement
+    _plans.move_to_end(key)
+    if len(_plans) > _plan_cache_size:
+        _plans.popitem(last=False)
+
+
+def _count_parameters(node) -> int:
+    if isinstance(node, Parameter):
+        return 1
+    if isinstance(node, tuple):
+        return sum(_count_parameters(child) for child in node)
+    return 0
+
+
+@metrics.timed("parse")
+def compile_statement(tokens: list[str], prepared: bool = False) -> Statement:
+    """
+    Разбирает команду insert/select/update/delete в Statement.
+
+    С prepared=True значения "?" становятся параметрами, которые
+    подставляются при выполнении (bind_statement).
+    """
+    command = tokens[0]
+    where_tokens = None
+    fields: dict = {}
+    if command == "insert":
+        table_name, rows = parse_insert_tokens(tokens)
+        fields["rows"] = rows
+    elif command == "select" and len(tokens) > 1 and tokens[1].lower() != "from":
+        command = "aggregate"
+        parsed = parse_aggregate_tokens(tokens)
+        table_name, items, where_tokens, group_by, limit, offset = parsed
+        fields.update(items=items, group_by=group_by, limit=limit, offset=offset)
+    elif command == "select":
+        table_name, where_tokens, limit, offset = parse_select_tokens(tokens)
+        fields.update(limit=limit, offset=offset)
+    elif command == "update":
+        table_name, values, where_tokens = parse_update_tokens(tokens)
+        fields["values"] = values
+    elif command == "delete":
+        table_name, where_tokens = parse_delete_tokens(tokens)
+    else:
+        raise QueryError(MSG_STATEMENT_KIND.format(command=command))
+
+    types = get_schema(get_metadata(), table_name).types
+    parameters = 0
+    if prepared:
+        literals = [*fields.get("values", {}).values()]
+        literals += [value for row in fields.get("rows", ()) for value in row]
+        parameters = literals.count(STATEMENT_PARAMETER)
+    if where_tokens:
+        where = parse_where_tree_tokens(where_tokens, types, prepared)
+        where_parameters = _count_parameters(where) if prepared else 0
+        fields["where"] = where
+        if not where_parameters:
+            fields["condition"] = make_condition(where)
+        parameters += where_parameters
+    return Statement(
+        command,
+        tuple(tokens),
+        table_name,
+        types,
+        parameters=parameters,
+        prepared=prepared,
+        **fields,
+    )
+
+
+def refresh_statement(statement: Statement) -> Statement:
+    """Возвращает команду, разобранную заново, если схема таблицы изменилась."""
+    if get_schema(get_metadata(), statement.table).types is statement.types:
+        return statement
+    return compile_statement(list(statement.tokens), statement.prepared)
+
+
+def _bind_tree(node, supply: Iterator[str]):
+    if isinstance(node, Parameter):
+        return convert_value(next(supply), node.column_type)
+    if isinstance(node, tuple):
+        return tuple(_bind_tree(child, supply) for child in node)
+    return node
+
+
+def _bind_literal(value: str, supply: Iterator[str]) -> str:
+    return next(supply) if value == STATEMENT_PARAMETER else value
+
+
+@metrics.timed("convert")
+def bind_statement(statement: Statement, values: list[str]) -> Statement:
+    """
+    Подставляет значения параметров по порядку их появления в команде.
+
+    Значения insert и set передаются как есть (их приводит к типам
+    запись), значения условия приводятся к типам столбцов здесь.
+    """
+    if len(values) != statement.parameters:
+        raise QueryError(
+            MSG_PARAMETERS_MISMATCH.format(
+                expected=statement.parameters, count=len(values)
+            )
+        )
+    if not statement.parameters:
+        return statement
+
+    supply = iter(values)
+    bound = {}
+    if statement.values is not None:
+        bound["values"] = {
+            column: _bind_literal(value, supply)
+            for column, value in statement.values.items()
+        }
+    if statement.rows is not None:
+        bound["rows"] = [
+            [_bind_literal(value, supply) for value in row] for row in statement.rows
+        ]
+    if statement.where is not None:
+        where = _bind_tree(statement.where, supply)
+        bound.update(where=where, condition=make_condition(where))
+    return statement._replace(parameters=0, **bound)
+
+
+def prepare_statement(name: str, tokens: list[str]) -> Statement:
+    """Разбирает команду с параметрами и сохраняет её под именем name."""
+    statement = _prepared[name] = compile_statement(tokens, prepared=True)
+    return statement
+
+
+def prepared_statement(name: str) -> Statement:
+    """Возвращает подготовленную команду (разобранную под текущую схему)."""
+    if name not in _prepared:
+        raise QueryError(MSG_STATEMENT_NOT_FOUND.format(name=name))
+    statement = _prepared[name] = refresh_statement(_prepared[name])
+    return statement
@@ -0,0 +1,551 @@
+import json
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Callable, Iterable, Iterator, NamedTuple, TextIO
+
+from ..constants import (
+    DATA_PATH,
+    DEFAULT_STORAGE_ENGINE,
+    FSYNC_ENV,
+    ID_NAME,
+    LOG_COMPACT_MIN_BYTES,
+    META_FILE,
+    MSG_UNKNOWN_STORAGE,
+    OP_DELETE,
+    OP_INSERT,
+    OP_UPDATE,
+    SEGMENT_ROWS,
+    SEGMENT_ROWS_ENV,
+    STORAGE_BINARY,
+    STORAGE_ENGINE_ENV,
+    STORAGE_JSON,
+    STORAGE_LOG,
+    STORAGE_SEGMENTS,
+    TABLE_BINARY_TEMPLATE,
+    TABLE_FILE_TEMPLATE,
+    TABLE_INFO_KEY,
+    TABLE_LOG_TEMPLATE,
+    TABLE_MANIFEST_TEMPLATE,
+    TABLE_SEGMENT_TEMPLATE,
+    TEMP_FILE_SUFFIX,
+)
+from .binary import BinaryTable, read_binary, write_binary
+from .segments import SegmentedTable, read_manifest, read_segments, segment_of
+
+_fsync_enabled = os.environ.get(FSYNC_ENV, "1") not in ("", "0")
+_segment_rows = int(os.environ.get(SEGMENT_ROWS_ENV, SEGMENT_ROWS))
+
+
+class StorageEngine(NamedTuple):
+    """Набор функций, через которые движок читает и пишет таблицы."""
+
+    name: str
+    load: Callable[[str], list[dict]]
+    save: Callable[[str, list[dict], list[dict] | None], None]
+    remove: Callable[[str], None]
+    files: Callable[[str], list[str]]
+
+
+def table_path(table_name: str) -> str:
+    """Возвращает путь к файлу-снимку таблицы."""
+    return os.path.join(DATA_PATH, TABLE_FILE_TEMPLATE.format(table=table_name))
+
+
+def log_path(table_name: str) -> str:
+    """Возвращает путь к журналу изменений таблицы."""
+    return os.path.join(DATA_PATH, TABLE_LOG_TEMPLATE.format(table=table_name))
+
+
+def binary_path(table_name: str) -> str:
+    """Возвращает путь к двоичному снимку таблицы."""
+    return os.path.join(DATA_PATH, TABLE_BINARY_TEMPLATE.format(table=table_name))
+
+
+def manifest_path(table_name: str) -> str:
+    """Возвращает путь к манифесту сегментов таблицы."""
+    return os.path.join(DATA_PATH, TABLE_MANIFEST_TEMPLATE.format(table=table_name))
+
+
+def table_files(table_name: str) -> list[str]:
+    """
+    Возвращает файлы, из которых складывается состояние таблицы.
+
+    Файлы сегментов не перечисляются: манифест переписывается при каждом
+    их изменении, поэтому его отпечатка достаточно.
+    """
+    return [
+        table_path(table_name),
+        log_path(table_name),
+        binary_path(table_name),
+        manifest_path(table_name),
+    ]
+
+
+def segment_files(table_name: str) -> list[str]:
+    """Возвращает файлы сегментов из манифеста таблицы (и ждущие удаления)."""
+    manifest = read_manifest(manifest_path(table_name))
+    if manifest is None:
+        return []
+    names = [segment["file"] for segment in manifest["segments"]]
+    names.extend(manifest.get("garbage", []))
+    return [os.path.join(DATA_PATH, name) for name in names]
+
+
+def ensure_directory(path: str) -> None:
+    """
+    Создаёт каталог файла path перед записью.
+
+    Импорт пакета ничего не создаёт: каталог DATA_PATH появляется при
+    первой записи, а команды только для чтения его не требуют.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def set_segment_rows(rows: int) -> None:
+    """Задаёт число записей в сегменте для последующих записей таблиц."""
+    global _segment_rows
+    _segment_rows = max(1, rows)
+
+
+def set_fsync(enabled: bool) -> None:
+    """Включает или отключает fsync при записи файлов."""
+    global _fsync_enabled
+    _fsync_enabled = enabled
+
+
+def sync_file(file: TextIO) -> None:
+    """Сбрасывает буферы файла на диск (если fsync не отключён)."""
+    file.flush()
+    if _fsync_enabled:
+        os.fsync(file.fileno())
+
+
+def _sync_directory(path: str) -> None:
+    """Фиксирует на диске переименование файла в каталоге (только POSIX)."""
+    flags = getattr(os, "O_DIRECTORY", None)
+    if not _fsync_enabled or flags is None:
+        return
+    descriptor = os.open(os.path.dirname(path) or ".", os.O_RDONLY | flags)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def atomic_open(
+    path: str,
+    sync: bool = True,
+    binary: bool = False,
+) -> Iterator[TextIO]:
+    """
+    Открывает файл на запись так, что он заменяется целиком или никак.
+
+    Данные пишутся во временный файл рядом с целевым и после fsync
+    переносятся на место через os.replace. При ошибке временный файл
+    удаляется, а прежнее содержимое остаётся нетронутым.
+    """
+    temp_path = path + TEMP_FILE_SUFFIX
+    ensure_directory(path)
+    try:
+        if binary:
+            file = open(temp_path, "wb")
+        else:
+            file = open(temp_path, "w", encoding="utf-8")
+        with file:
+            yield file
+            if sync:
+                sync_file(file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    if sync:
+        _sync_directory(path)
+
+
+def _write_snapshot(table_name: str, data: list[dict]) -> None:
+    """Атомарно перезаписывает снимок таблицы целиком."""
+    if not isinstance(data, list):
+        data = list(data)
+    with atomic_open(table_path(table_name)) as file:
+        json.dump(data, file, ensure_ascii=False, indent=2)
+
+
+def apply_ops(rows: list[dict], ops: Iterable[dict]) -> list[dict]:
+    """
+    Применяет операции insert/update/delete к записям по порядку.
+
+    Повторное применение тех же операций ничего не меняет: вставка
+    записи с уже существующим ID заменяет её. Поэтому журнал можно
+    доигрывать поверх снимка, который уже частично его содержит.
+    """
+    if not isinstance(rows, list):
+        rows = list(rows)
+    positions = {row.get(ID_NAME): index for index, row in enumerate(rows)}
+    has_deleted = False
+    for op in ops:
+        kind = op.get("op")
+        if kind == OP_INSERT:
+            row = op["row"]
+            index = positions.get(row.get(ID_NAME))
+            if index is None:
+                positions[row.get(ID_NAME)] = len(rows)
+                rows.append(row)
+            else:
+                rows[index] = row
+        elif kind == OP_UPDATE:
+            index = positions.get(op["id"])
+            if index is not None:
+                rows[index].update(op["values"])
+        elif kind == OP_DELETE:
+            index = positions.pop(op["id"], None)
+            if index is not None:
+                rows[index] = None
+                has_deleted = True
+
+    if has_deleted:
+        rows = [row for row in rows if row is not None]
+    return rows
+
+
+def read_json_lines(path: str) -> Iterator[dict]:
+    """
+    Читает JSON-записи по строкам до первой недописанной.
+
+    Строка без завершающего перевода строки или с битым JSON означает
+    аварийное завершение посреди записи; она и всё после неё пропускаются.
+    """
+    try:
+        file = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with file:
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def _replay_log(rows: list[dict], path: str) -> list[dict]:
+    """Применяет к снимку операции из журнала в порядке их записи."""
+    return apply_ops(rows, read_json_lines(path))
+
+
+def _snapshot_path(table_name: str) -> str | None:
+    """
+    Возвращает путь к актуальному снимку: JSON, двоичному или манифесту.
+
+    Каждый движок после записи своего снимка удаляет чужой, поэтому
+    обычно существует только один; если сбой оставил оба, берётся
+    более новый.
+    """
+    existing = [
+        path
+        for path in (
+            table_path(table_name),
+            binary_path(table_name),
+            manifest_path(table_name),
+        )
+        if os.path.exists(path)
+    ]
+    if not existing:
+        return None
+    return max(existing, key=lambda path: os.stat(path).st_mtime_ns)
+
+
+def load_table(table_name: str) -> list[dict]:
+    """
+    Читает снимок таблицы и доигрывает журнал, если он есть.
+
+    Двоичный снимок без журнала возвращается как BinaryTable: записи
+    читаются из отображённого в память файла по мере обращения.
+    Сегментированная таблица возвращается как SegmentedTable: сегменты
+    читаются при обращении к их записям.
+    """
+    snapshot = _snapshot_path(table_name)
+    has_log = os.path.exists(log_path(table_name))
+    if snapshot is None:
+        if not has_log:
+            raise FileNotFoundError(table_path(table_name))
+        rows = []
+    elif snapshot == binary_path(table_name):
+        rows = read_binary(snapshot)
+        if not has_log:
+            return rows
+        rows = rows.to_rows()
+    elif snapshot == manifest_path(table_name):
+        with open(snapshot, "r", encoding="utf-8") as file:
+            rows = read_segments(DATA_PATH, json.load(file))
+        if not has_log:
+            return rows
+        rows = rows.to_rows()
+    else:
+        with open(snapshot, "r", encoding="utf-8") as file:
+            rows = json.load(file)
+    return _replay_log(rows, log_path(table_name))
+
+
+def _remove_files(paths: Iterable[str]) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _remove_segments(table_name: str) -> None:
+    """Удаляет файлы сегментов и манифест таблицы."""
+    _remove_files(segment_files(table_name))
+    _remove_files((manifest_path(table_name),))
+
+
+def remove_table(table_name: str) -> None:
+    """Удаляет снимки, сегменты и журнал таблицы."""
+    _remove_segments(table_name)
+    _remove_files(table_files(table_name))
+
+
+def compact_table(table_name: str, data: list[dict]) -> None:
+    """
+    Сохраняет актуальное состояние в снимок и очищает журнал.
+
+    Если процесс упадёт между заменой снимка и удалением журнала,
+    журнал доиграется поверх нового снимка без последствий (apply_ops).
+    """
+    _write_snapshot(table_name, data)
+    _remove_files((log_path(table_name), binary_path(table_name)))
+    _remove_segments(table_name)
+
+
+def _save_json(table_name: str, data: list[dict], ops=None) -> None:
+    """Классический режим: каждая запись переписывает весь файл."""
+    compact_table(table_name, data)
+
+
+def _save_log(table_name: str, data: list[dict], ops=None) -> None:
+    """Дописывает операции в журнал и при необходимости сжимает его."""
+    if ops is None:
+        compact_table(table_name, data)
+        return
+    if not ops:
+        return
+
+    path = log_path(table_name)
+    ensure_directory(path)
+    lines = [json.dumps(op, ensure_ascii=False) + "\n" for op in ops]
+    with open(path, "a", encoding="utf-8") as file:
+        file.writelines(lines)
+        sync_file(file)
+
+    snapshot = _snapshot_path(table_name)
+    snapshot_size = os.path.getsize(snapshot) if snapshot else 0
+    if os.path.getsize(path) >= max(LOG_COMPACT_MIN_BYTES, snapshot_size):
+        compact_table(table_name, data)
+
+
+def _table_info(table_name: str, data) -> list[str] | None:
+    """Берёт схему таблицы из записанных на диск метаданных."""
+    if isinstance(data, BinaryTable):
+        return data.table_info
+    try:
+        with open(META_FILE, "r", encoding="utf-8") as file:
+            return json.load(file)[table_name][TABLE_INFO_KEY]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_binary(table_name: str, data: list[dict], ops=None) -> None:
+    """
+    Переписывает таблицу целиком в двоичный снимок.
+
+    Схема берётся из метаданных (при сбросе они записываются раньше
+    таблиц), а без них восстанавливается по значениям. JSON-снимок и
+    журнал после этого удаляются.
+    """
+    with atomic_open(binary_path(table_name), binary=True) as file:
+        write_binary(file, data, _table_info(table_name, data))
+    _remove_files((table_path(table_name), log_path(table_name)))
+    _remove_segments(table_name)
+
+
+def _record_id(row: dict) -> int:
+    return row[ID_NAME]
+
+
+def _op_id(op: dict) -> int:
+    return op["row"][ID_NAME] if op["op"] == OP_INSERT else op["id"]
+
+
+def _segment_slice(data: list[dict], segment: int, segment_rows: int) -> list:
+    """
+    Записи сегмента: data упорядочены по ID, границы ищутся бинарно.
+
+    Сегментированная таблица отдаёт сегмент сама, не читая соседние.
+    """
+    if isinstance(data, SegmentedTable):
+        return data.segment(segment)
+    low = segment * segment_rows + 1
+    start = bisect_left(data, low, key=_record_id)
+    stop = bisect_left(data, low + segment_rows, start, key=_record_id)
+    return [data[position] for position in range(start, stop)]
+
+
+def save_segments(table_name: str, data: list[dict], ops=None) -> None:
+    """
+    Переписывает только сегменты, которых касаются операции ops.
+
+    Без ops, при смене размера сегмента или если таблица на диске ещё
+    не разбита на сегменты, переписываются все сегменты. Изменённый
+    сегмент пишется в новый файл, затем атомарно заменяется манифест.
+    Файлы, заменённые предыдущей записью, удаляются только теперь:
+    читатель, открывший прежний манифест, успевает дочитать свои
+    сегменты.
+    """
+    path = manifest_path(table_name)
+    manifest = read_manifest(path)
+    segment_rows = _segment_rows
+    whole = (
+        ops is None
+        or manifest is None
+        or manifest["segment_rows"] != segment_rows
+        or _snapshot_path(table_name) != path
+    )
+    if not whole and not ops:
+        return
+
+    # Сегменты нового манифеста и файлы, которые он заменяет.
+    segments: dict[int, dict] = {}
+    replaced: list[str] = []
+    if whole:
+        if manifest is not None:
+            replaced = [segment["file"] for segment in manifest["segments"]]
+        groups = groupby(data, key=lambda row: segment_of(row[ID_NAME], segment_rows))
+    else:
+        segments = {segment["segment"]: segment for segment in manifest["segments"]}
+        dirty = sorted({segment_of(_op_id(op), segment_rows) for op in ops})
+        groups = (
+            (segment, _segment_slice(data, segment, segment_rows))
+            for segment in dirty
+        )
+
+    version = manifest["version"] + 1 if manifest else 1
+    for segment, rows in groups:
+        rows = list(rows)
+        previous = segments.pop(segment, None)
+        if previous is not None:
+            replaced.append(previous["file"])
+        if not rows:
+            continue
+        name = TABLE_SEGMENT_TEMPLATE.format(
+            table=table_name, segment=segment, version=version
+        )
+        with atomic_open(os.path.join(DATA_PATH, name)) as file:
+            # Без отступов json.dumps кодирует на C, а json.dump — нет.
+            file.write(json.dumps(rows, ensure_ascii=False))
+        segments[segment] = {
+            "segment": segment,
+            "file": name,
+            "first_id": rows[0][ID_NAME],
+            "last_id": rows[-1][ID_NAME],
+            "rows": len(rows),
+        }
+
+    with atomic_open(path) as file:
+        json.dump(
+            {
+                "segment_rows": segment_rows,
+                "version": version,
+                "count": len(data),
+                "segments": [segments[segment] for segment in sorted(segments)],
+                "garbage": replaced,
+            },
+            file,
+            ensure_ascii=False,
+        )
+    if manifest is not None:
+        garbage = manifest.get("garbage", [])
+        _remove_files(os.path.join(DATA_PATH, name) for name in garbage)
+    _remove_files(
+        (table_path(table_name), log_path(table_name), binary_path(table_name))
+    )
+
+
+STORAGE_ENGINES: dict[str, StorageEngine] = {
+    STORAGE_JSON: StorageEngine(
+        STORAGE_JSON,
+        load_table,
+        _save_json,
+        remove_table,
+        table_files,
+    ),
+    STORAGE_LOG: StorageEngine(
+        STORAGE_LOG,
+        load_table,
+        _save_log,
+        remove_table,
+        table_files,
+    ),
+    STORAGE_BINARY: StorageEngine(
+        STORAGE_BINARY,
+        load_table,
+        save_binary,
+        remove_table,
+        table_files,
+    ),
+    STORAGE_SEGMENTS: StorageEngine(
+        STORAGE_SEGMENTS,
+        load_table,
+        save_segments,
+        remove_table,
+        table_files,
+    ),
+}
+
+_engine_override: str | None = None
+
+
+def _engine(name: str) -> StorageEngine:
+    if name not in STORAGE_ENGINES:
+        raise ValueError(
+            MSG_UNKNOWN_STORAGE.format(
+                name=name,
+                available=", ".join(STORAGE_ENGINES),
+            )
+        )
+    return STORAGE_ENGINES[name]
+
+
+def set_storage_engine(name: str | None) -> None:
+    """Явно выбирает движок хранения (None — взять из окружения)."""
+    global _engine_override
+    if name is not None:
+        _engine(name)
+    _engine_override = name
+
+
+def get_storage_engine() -> StorageEngine:
+    """Возвращает активный движок хранения."""
+    return _engine(
+        _engine_override or os.environ.get(STORAGE_ENGINE_ENV, DEFAULT_STORAGE_ENGINE)
+    )
+
+
+def convert_table(table_name: str, storage: str) -> None:
+    """
+    Переписывает файлы таблицы в формате движка storage.
+
+    Записи не меняются: json и log сохраняют JSON-снимок, binary —
+    двоичный, segments — сегменты с манифестом. Дальнейшие изменения
+    пишутся в формате активного движка, а читаются все форматы.
+    """
+    _engine(storage).save(table_name, load_table(table_name), None)
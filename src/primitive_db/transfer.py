@@ -0,0 +1,138 @@
+import csv
+import json
+import os
+from itertools import islice
+from typing import Iterator
+
+from ..constants import (
+    FORMAT_CSV,
+    ID_NAME,
+    IMPORT_BATCH_SIZE,
+    MSG_BAD_FORMAT,
+    MSG_FILE_NOT_FOUND,
+    MSG_IMPORT_MISSING_COLUMNS,
+    MSG_IMPORT_NOT_OBJECT,
+    MSG_IMPORT_ROW_ERROR,
+    OP_INSERT,
+    TABLE_SEQUENCE_KEY,
+    TRANSFER_EXTENSIONS,
+)
+from .core import allocate_ids, clear_cache, get_schema
+from .errors import ConversionError, QueryError, SchemaError
+
+
+def detect_format(path: str) -> str:
+    """Определяет формат файла обмена по расширению."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TRANSFER_EXTENSIONS:
+        raise QueryError(MSG_BAD_FORMAT.format(path=path))
+    return TRANSFER_EXTENSIONS[extension]
+
+
+def _read_rows(file, file_format: str) -> Iterator[tuple[int, dict]]:
+    """Построчно читает записи файла вместе с номерами строк."""
+    if file_format == FORMAT_CSV:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+def import_table(metadata, table_name, path, table_data=None, ops=None) -> int:
+    """
+    Загружает записи из CSV или JSON Lines в конец таблицы.
+
+    Файл читается пачками по IMPORT_BATCH_SIZE строк; ID для пачки
+    выделяются одним шагом. При ошибке в любой строке таблица и счётчик
+    ID возвращаются в исходное состояние. В ops (если передан)
+    дописываются операции вставки загруженных записей. Возвращает число
+    загруженных записей.
+    """
+    file_format = detect_format(path)
+    schema = get_schema(metadata, table_name)
+    columns = [(name, schema.converters[name]) for name in schema.values]
+    if table_data is None:
+        table_data = []
+
+    table_meta = metadata[table_name]
+    initial_length = len(table_data)
+    initial_sequence = table_meta.get(TABLE_SEQUENCE_KEY)
+    line_number = 0
+    if not os.path.isfile(path):
+        raise QueryError(MSG_FILE_NOT_FOUND.format(path=path))
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            rows = _read_rows(file, file_format)
+            while True:
+                batch = []
+                for line_number, row in islice(rows, IMPORT_BATCH_SIZE):
+                    if not isinstance(row, dict):
+                        raise ConversionError(MSG_IMPORT_NOT_OBJECT)
+                    missing = [
+                        name for name, _ in columns if row.get(name) is None
+                    ]
+                    if missing:
+                        raise SchemaError(
+                            MSG_IMPORT_MISSING_COLUMNS.format(
+                                path=path,
+                                columns=", ".join(missing),
+                            )
+                        )
+                    batch.append(
+                        {
+                            name: convert(row[name])
+                            for name, convert in columns
+                        }
+                    )
+                if not batch:
+                    break
+                first_id = allocate_ids(table_meta, table_data, len(batch))
+                table_data.extend(
+                    {ID_NAME: record_id, **values}
+                    for record_id, values in enumerate(batch, start=first_id)
+                )
+    except BaseException as error:
+        # Откатываются и уже добавленные пачки, какой бы ни была ошибка.
+        del table_data[initial_length:]
+        if initial_sequence is None:
+            table_meta.pop(TABLE_SEQUENCE_KEY, None)
+        else:
+            table_meta[TABLE_SEQUENCE_KEY] = initial_sequence
+        if not isinstance(error, ValueError):
+            raise
+        raise ConversionError(
+            MSG_IMPORT_ROW_ERROR.format(line=line_number, path=path, error=error)
+        ) from error
+
+    if ops is not None:
+        ops.extend(
+            {"op": OP_INSERT, "row": record} for record in table_data[initial_length:]
+        )
+    clear_cache(table_name)
+    return len(table_data) - initial_length
+
+
+def export_table(metadata, table_name, path, table_data=None) -> int:
+    """
+    Построчно выгружает записи таблицы в CSV или JSON Lines.
+
+    Возвращает число выгруженных записей.
+    """
+    file_format = detect_format(path)
+    headers = list(get_schema(metadata, table_name).columns)
+    if table_data is None:
+        table_data = []
+
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if file_format == FORMAT_CSV:
+            writer = csv.DictWriter(file, fieldnames=headers, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(table_data)
+        else:
+            for record in table_data:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    return len(table_data)
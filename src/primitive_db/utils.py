@@ -2,15 +2,22 @@ import json
 import os
 
 from ..constants import (
-    DATA_PATH,
     MSG_META_SAVE_ERROR,
     MSG_TABLE_DELETE_ERROR,
     MSG_TABLE_SAVE_ERROR,
     TABLE_FILE_TEMPLATE,
 )
 from ..decorators import handle_db_errors
+from .storage import atomic_open, get_storage_engine
 
-os.makedirs(DATA_PATH, exist_ok=True)
+
+def file_stamp(path) -> tuple[int, int] | None:
+    """Возвращает (mtime_ns, размер) файла или None, если его нет."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 @handle_db_errors(dict)
 def load_metadata(filepath) -> dict:
@@ -18,45 +25,51 @@ def load_metadata(filepath) -> dict:
     with open(filepath, "r", encoding="utf-8") as file:
         return json.load(file)
 
-def save_metadata(filepath, data) -> None:
-    """Сохраняет метаданные в JSON-файл."""
+def save_metadata(filepath, data) -> bool:
+    """Атомарно сохраняет метаданные в JSON-файл; False — при ошибке."""
     try:
-        with open(filepath, "w", encoding="utf-8") as file:
+        with atomic_open(filepath) as file:
             json.dump(data, file)
     except IOError as error:
         print(MSG_META_SAVE_ERROR.format(filepath=filepath, error=error))
+        return False
+    return True
 
 @handle_db_errors(list)
 def load_table_data(table_name) -> list[dict]:
-    """Загружает данные таблицы из JSON-файла."""
-    path = os.path.join(DATA_PATH, TABLE_FILE_TEMPLATE.format(table=table_name))
-    with open(path, "r", encoding="utf-8") as file:
-        return json.load(file)
+    """Загружает данные таблицы через активный движок хранения."""
+    return get_storage_engine().load(table_name)
 
-def save_table_data(table_name, data) -> None:
-    """Сохраняет данные таблицы в JSON-файл."""
-    path = os.path.join(DATA_PATH, TABLE_FILE_TEMPLATE.format(table=table_name))
+def save_table_data(table_name, data, ops=None) -> bool:
+    """
+    Сохраняет данные таблицы через активный движок хранения.
+
+    ops — список операций insert/update/delete, выполненных над data;
+    журналирующий движок дописывает только их. Без ops таблица
+    сохраняется целиком в снимок. Возвращает False при ошибке записи.
+    """
     try:
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, indent=2)
-    except IOError as error:
+        get_storage_engine().save(table_name, data, ops)
+    except (IOError, ValueError) as error:
         print(
             MSG_TABLE_SAVE_ERROR.format(
                 table_file=TABLE_FILE_TEMPLATE.format(table=table_name),
                 error=error,
             )
         )
+        return False
+    return True
 
-def delete_table_file(table_name) -> None:
-    """Удаляет файл данных таблицы, если он существует."""
-    path = os.path.join(DATA_PATH, TABLE_FILE_TEMPLATE.format(table=table_name))
+def delete_table_file(table_name) -> bool:
+    """Удаляет файлы данных таблицы (снимок и журнал), если они существуют."""
     try:
-        if os.path.exists(path):
-            os.remove(path)
-    except OSError as error:
+        get_storage_engine().remove(table_name)
+    except (OSError, ValueError) as error:
         print(
             MSG_TABLE_DELETE_ERROR.format(
                 table_file=TABLE_FILE_TEMPLATE.format(table=table_name),
                 error=error,
             )
         )
+        return False
+    return True
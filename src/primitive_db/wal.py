@@ -0,0 +1,184 @@
+import glob
+import json
+import os
+import time
+from typing import TextIO
+
+from ..constants import (
+    DATA_PATH,
+    LOCK_RETRY_INITIAL,
+    META_FILE,
+    WAL_FILE_TEMPLATE,
+)
+from .indexes import remove_index, remove_pk_map, table_indexes
+from .locks import try_lock
+from .storage import (
+    STORAGE_ENGINES,
+    apply_ops,
+    ensure_directory,
+    read_json_lines,
+    sync_file,
+)
+from .utils import load_metadata, save_metadata
+
+# Запись журнала — одна группа изменений, сбрасываемая на диск вместе:
+#   {"engine": движок, "metadata": метаданные или None,
+#    "drop": [таблица, ...],
+#    "tables": {таблица: {"ops": [...]} или {"rows": [...]}}}
+#
+# Каждый процесс пишет свой журнал data/wal.<pid>.jsonl и держит на нём
+# flock, пока жив. Журнал без блокировки принадлежал упавшему процессу.
+_own: dict[str, TextIO | None] = {"file": None}
+
+
+def wal_path(pid: int | str | None = None) -> str:
+    """Возвращает путь к журналу упреждающей записи процесса."""
+    pid = os.getpid() if pid is None else pid
+    return os.path.join(DATA_PATH, WAL_FILE_TEMPLATE.format(pid=pid))
+
+
+def make_record(
+    engine: str,
+    metadata: dict | None,
+    drops: list[str],
+    tables: dict[str, dict],
+) -> dict:
+    """Собирает запись журнала для одного группового сброса."""
+    return {"engine": engine, "metadata": metadata, "drop": drops, "tables": tables}
+
+
+def _size(file: TextIO) -> int:
+    return os.fstat(file.fileno()).st_size
+
+
+def _own_file() -> TextIO:
+    """Открывает и блокирует журнал процесса при первой записи."""
+    file = _own["file"]
+    if file is not None:
+        return file
+
+    path = wal_path()
+    ensure_directory(path)
+    while True:
+        file = open(path, "a+", encoding="utf-8")
+        # Файл мог держать или удалить процесс, доигрывающий журнал
+        # упавшего предшественника с тем же PID.
+        if try_lock(file) and _same_file(file, path):
+            break
+        file.close()
+        time.sleep(LOCK_RETRY_INITIAL)
+    if _size(file):
+        _replay(path)
+        file.truncate(0)
+    _own["file"] = file
+    return file
+
+
+def append(record: dict) -> None:
+    """
+    Дописывает запись в журнал и дожидается fsync.
+
+    После возврата изменения группы считаются зафиксированными: если
+    процесс упадёт при записи самих файлов, recover доведёт её до конца.
+    """
+    file = _own_file()
+    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sync_file(file)
+
+
+def checkpoint() -> None:
+    """Очищает журнал процесса, когда все его записи применены к файлам."""
+    file = _own["file"]
+    if file is not None:
+        file.truncate(0)
+        sync_file(file)
+
+
+def close() -> None:
+    """Закрывает журнал процесса; пустой файл удаляется."""
+    file = _own["file"]
+    if file is None:
+        return
+    if not _size(file):
+        os.remove(wal_path())
+    file.close()
+    _own["file"] = None
+
+
+def close_inherited() -> None:
+    """Закрывает журнал, унаследованный дочерним процессом после fork."""
+    file = _own["file"]
+    if file is not None:
+        file.close()
+    _own["file"] = None
+
+
+def _apply_record(record: dict) -> None:
+    """Повторно применяет запись журнала к файлам на диске."""
+    if record.get("metadata") is not None:
+        save_metadata(META_FILE, record["metadata"])
+
+    engine = STORAGE_ENGINES[record["engine"]]
+    for table_name in record["drop"]:
+        engine.remove(table_name)
+    for table_name, change in record["tables"].items():
+        if "rows" in change:
+            rows = change["rows"]
+        else:
+            try:
+                rows = engine.load(table_name)
+            except FileNotFoundError:
+                rows = []
+            rows = apply_ops(rows, change["ops"])
+        engine.save(table_name, rows, None)
+
+
+def _replay(path: str) -> int:
+    """Применяет все целиком дописанные записи журнала."""
+    records = list(read_json_lines(path))
+    if not records:
+        return 0
+
+    touched = set()
+    for record in records:
+        _apply_record(record)
+        touched.update(record["drop"], record["tables"])
+
+    metadata = load_metadata(META_FILE)
+    for table_name in touched:
+        remove_pk_map(table_name)
+        for column in table_indexes(metadata, table_name):
+            remove_index(table_name, column)
+    return len(records)
+
+
+def _same_file(file: TextIO, path: str) -> bool:
+    """Проверяет, что путь всё ещё указывает на открытый файл."""
+    try:
+        return os.stat(path).st_ino == os.fstat(file.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def recover() -> int:
+    """
+    Доигрывает журналы упавших процессов.
+
+    Журнал, на котором никто не держит блокировку, принадлежал процессу,
+    который завершился, не успев применить зафиксированные записи. Запись,
+    которую не успели дописать целиком, отбрасывается: её изменения не
+    были подтверждены. Индексы затронутых таблиц удаляются и
+    перестраиваются при первом обращении. Возвращает число записей;
+    сообщить о нём решает вызывающий код.
+    """
+    own_path = wal_path()
+    count = 0
+    for path in glob.glob(wal_path(pid="*")):
+        if path == own_path:
+            continue
+        with open(path, "a+", encoding="utf-8") as file:
+            if not try_lock(file) or not _same_file(file, path):
+                continue
+            count += _replay(path)
+            os.remove(path)
+    return count